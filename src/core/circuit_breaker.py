@@ -0,0 +1,183 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import aiohttp
+import requests
+
+from core.logger import log_info, log_warning
+from core.metrics import metrics
+
+# Consecutive failed requests that open the circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+# First pause after the circuit opens; doubled every time the probe request fails, up to the maximum
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_MAX_OPEN_SECONDS = float(os.getenv("CIRCUIT_MAX_OPEN_SECONDS", "300"))
+# A request that has waited this long for the circuit to close fails with CircuitOpenError
+CIRCUIT_MAX_WAIT = float(os.getenv("CIRCUIT_MAX_WAIT", "1800"))
+
+# Answers that mean the site itself is down, as opposed to throttling (429) or a bad request
+OUTAGE_STATUSES = {500, 502, 503, 504}
+OUTAGE_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                 aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised when a request gave up waiting for the circuit to close (see CIRCUIT_MAX_WAIT)."""
+
+
+class BreakerCall:
+    """Handed to the caller for one request so it can report whether the site answered."""
+
+    def __init__(self, probe=False):
+        self.probe = probe
+        # Seconds spent waiting for the circuit to close
+        self.waited = 0.0
+        self.failed = False
+
+    def record_status(self, status_code):
+        self.failed = status_code in OUTAGE_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Stops every worker from sending requests while hafele.com.tr is down.
+
+    After `failure_threshold` consecutive outage responses (5xx, timeouts, refused
+    connections) the circuit opens and requests wait instead of failing one SKU
+    after another. Once the pause is over a single probe request goes through:
+    if it succeeds the circuit closes and everyone continues, otherwise the pause
+    doubles.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, open_seconds=CIRCUIT_OPEN_SECONDS,
+                 max_open_seconds=CIRCUIT_MAX_OPEN_SECONDS, max_wait=CIRCUIT_MAX_WAIT):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._state_changed = threading.Condition(self._lock)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._open_for = self.open_seconds
+            self._retry_at = 0.0
+            self._probe_in_flight = False
+            self._state_changed.notify_all()
+
+    def _try_enter(self):
+        """Returns (0, BreakerCall) when the request may be sent, otherwise (seconds to wait, None)."""
+        if self.state == CLOSED:
+            return 0.0, BreakerCall()
+        if self.state == OPEN:
+            wait = self._retry_at - time.monotonic()
+            if wait > 0:
+                return wait, None
+            self.state = HALF_OPEN
+        if self._probe_in_flight:
+            return 0.5, None
+        self._probe_in_flight = True
+        return 0.0, BreakerCall(probe=True)
+
+    def _give_up(self, waited):
+        metrics.count("circuit_rejected_total")
+        raise CircuitOpenError(f"hafele.com.tr circuit still open after waiting {waited:.0f}s")
+
+    def _entered(self, call, queued_at):
+        call.waited = time.monotonic() - queued_at
+        if call.waited >= 0.01:
+            metrics.observe("circuit_wait", call.waited)
+        return call
+
+    def _release(self, call):
+        with self._lock:
+            if call.probe:
+                self._probe_in_flight = False
+                if call.failed:
+                    self._open(min(self.max_open_seconds, self._open_for * 2))
+                else:
+                    self._close()
+            elif self.state == CLOSED:
+                self.failures = self.failures + 1 if call.failed else 0
+                if self.failures >= self.failure_threshold:
+                    self._open(self.open_seconds)
+            self._state_changed.notify_all()
+
+    def _open(self, seconds):
+        if self.state == CLOSED:
+            self.opened_at = time.monotonic()
+            metrics.count("circuit_opened_total")
+        self.state = OPEN
+        self._open_for = seconds
+        self._retry_at = time.monotonic() + seconds
+        log_warning(f"🔌 hafele.com.tr looks down; pausing all requests for {seconds:.0f}s.",
+                    consecutive_failures=self.failures)
+
+    def _close(self):
+        outage = time.monotonic() - self.opened_at
+        metrics.observe("circuit_open", outage)
+        log_info(f"🔌 hafele.com.tr is answering again after {outage:.0f}s; resuming requests.")
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._open_for = self.open_seconds
+
+    @contextmanager
+    def request(self):
+        """Blocks while the circuit is open; yields a BreakerCall to record the response status on."""
+        queued_at = time.monotonic()
+        with self._lock:
+            while True:
+                wait, call = self._try_enter()
+                if call is not None:
+                    break
+                waited = time.monotonic() - queued_at
+                if waited >= self.max_wait:
+                    self._give_up(waited)
+                self._state_changed.wait(min(wait, self.max_wait - waited))
+        try:
+            yield self._entered(call, queued_at)
+        except OUTAGE_ERRORS:
+            call.failed = True
+            raise
+        finally:
+            self._release(call)
+
+    @asynccontextmanager
+    async def request_async(self):
+        """Async version of `request`: waits with asyncio.sleep instead of blocking the loop."""
+        queued_at = time.monotonic()
+        while True:
+            with self._lock:
+                wait, call = self._try_enter()
+            if call is not None:
+                break
+            waited = time.monotonic() - queued_at
+            if waited >= self.max_wait:
+                self._give_up(waited)
+            await asyncio.sleep(min(wait, self.max_wait - waited))
+        try:
+            yield self._entered(call, queued_at)
+        except OUTAGE_ERRORS:
+            call.failed = True
+            raise
+        finally:
+            self._release(call)
+
+    def stats(self):
+        with self._lock:
+            return {"circuit": self.state, "consecutive_failures": self.failures}
+
+
+hafele_breaker = CircuitBreaker()
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OUTPUT_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.join(ROOT_DIR, "output"))
+DEAD_LETTER_DB = os.path.join(OUTPUT_DIR, "dead_letters.db")
+# SKUs that failed this many times in a row are left in the queue but no longer reprocessed automatically
+DEAD_LETTER_MAX_FAILURES = int(os.getenv("DEAD_LETTER_MAX_FAILURES", "5"))
+
+
+class DeadLetterQueue:
+    """
+    SKUs whose scrape failed (no data or a HATA row), kept across runs.
+
+    A SKU stays queued until a later scrape gets its data: it is reprocessed at the
+    end of the run that failed it and, if that fails too, again in the next run.
+    """
+
+    def __init__(self, path=DEAD_LETTER_DB, max_failures=DEAD_LETTER_MAX_FAILURES):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                stock_code TEXT PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                failures INTEGER NOT NULL,
+                first_failed_at TEXT NOT NULL,
+                last_failed_at TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+    def add(self, run_id, reasons):
+        """
+        Queues {stock_code: reason}. A SKU that is already queued has its failure count
+        raised, once per run: failing again within the same `run_id` only updates the reason.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO dead_letters (stock_code, run_id, reason, failures, first_failed_at, last_failed_at) "
+                "VALUES (?, ?, ?, 1, ?, ?) ON CONFLICT (stock_code) DO UPDATE SET "
+                "failures = CASE WHEN run_id = excluded.run_id THEN failures ELSE failures + 1 END, "
+                "run_id = excluded.run_id, reason = excluded.reason, last_failed_at = excluded.last_failed_at",
+                [(code, run_id, reason, now, now) for code, reason in reasons.items()],
+            )
+            self._conn.commit()
+
+    def remove(self, codes):
+        with self._lock:
+            self._conn.executemany("DELETE FROM dead_letters WHERE stock_code = ?", [(code,) for code in codes])
+            self._conn.commit()
+
+    def failures(self, codes=None):
+        """Returns {stock_code: failure count} of the queued SKUs, limited to `codes` when given."""
+        with self._lock:
+            rows = self._conn.execute("SELECT stock_code, failures FROM dead_letters").fetchall()
+        if codes is None:
+            return dict(rows)
+        wanted = set(codes)
+        return {code: failures for code, failures in rows if code in wanted}
+
+    def due(self, codes):
+        """The queued SKUs among `codes` (in that order) that are still reprocessed automatically."""
+        failures = self.failures(codes)
+        return [code for code in codes if code in failures and failures[code] < self.max_failures]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
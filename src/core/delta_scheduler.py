@@ -0,0 +1,86 @@
+import os
+import zlib
+from datetime import datetime
+
+from core.logger import log_info
+
+# Delta runs ("--delta") rescrape hot SKUs every run and cold SKUs only when their value gets old.
+DELTA_ENABLED = os.getenv("SCRAPER_DELTA", "0") == "1"
+# SKUs whose price or stock changed in at least this share of their scrapes are hot
+DELTA_HOT_CHANGE_RATE = float(os.getenv("DELTA_HOT_CHANGE_RATE", "0.2"))
+# SKUs with this little stock left are hot, since they are about to run out
+DELTA_LOW_STOCK = int(os.getenv("DELTA_LOW_STOCK", "10"))
+# Cold SKUs are rescraped once their value is between half and all of this old
+DELTA_COLD_MAX_AGE_HOURS = float(os.getenv("DELTA_COLD_MAX_AGE_HOURS", "72"))
+
+
+def change_rate(stats):
+    """Share of scrapes in which the SKU changed, smoothed so one lucky scrape does not make it cold."""
+    return (stats["change_count"] + 1) / (stats["scrape_count"] + 2)
+
+
+def is_hot(stats):
+    if change_rate(stats) >= DELTA_HOT_CHANGE_RATE:
+        return True
+    stock = stats["last_row"].get("stock_amount")
+    return isinstance(stock, int) and stock <= DELTA_LOW_STOCK
+
+
+def age_hours(scraped_at, now):
+    return (now - datetime.fromisoformat(scraped_at)).total_seconds() / 3600
+
+
+def cold_refresh_due(code, stats, now, max_age_hours=DELTA_COLD_MAX_AGE_HOURS):
+    """
+    Each cold SKU gets a fixed due age between half and all of `max_age_hours`,
+    derived from its code, so a catalogue scraped in one full run does not
+    come due all at once but is spread over the following runs.
+    """
+    spread = zlib.crc32(code.encode("utf-8")) / 0xFFFFFFFF
+    return age_hours(stats["last_scraped_at"], now) >= max_age_hours * (0.5 + 0.5 * spread)
+
+
+def plan_delta(codes, stats_by_code, now=None):
+    """
+    Splits `codes` into the SKUs to scrape now and the SKUs whose last value is carried forward.
+
+    :param stats_by_code: Output of `ResultStore.sku_stats`.
+    :return: (to_scrape, carried) where `carried` is a list of (code, stats).
+    """
+    now = now or datetime.now()
+    to_scrape, carried = [], []
+    hot = cold_due = 0
+    for code in codes:
+        stats = stats_by_code.get(code)
+        if stats is None or is_hot(stats):
+            hot += 1
+            to_scrape.append(code)
+        elif cold_refresh_due(code, stats, now):
+            cold_due += 1
+            to_scrape.append(code)
+        else:
+            carried.append((code, stats))
+    log_info(f"🧊 Delta plan: {hot} hot, {cold_due} cold but due, {len(carried)} carried forward.")
+    return to_scrape, carried
+
+
+def carried_row(stats):
+    """The last scraped row of a SKU, marked with when it was scraped."""
+    return {**stats["last_row"], "veri_tarihi": stats["last_scraped_at"]}
+
+
+def mark_age(rows, saved_times, now=None):
+    """
+    Adds `veri_tarihi` (when the value was scraped) and `veri_yasi_saat` (its age in
+    hours) to export rows. Fresh rows use their save time; carried rows already have one.
+    """
+    now = now or datetime.now()
+    marked = []
+    for row in rows:
+        scraped_at = row.get("veri_tarihi") or saved_times.get(row["stock_code"])
+        marked.append({
+            **row,
+            "veri_tarihi": scraped_at,
+            "veri_yasi_saat": round(age_hours(scraped_at, now), 1) if scraped_at else None,
+        })
+    return marked
@@ -1,82 +1,257 @@
 import os
+import queue
+import threading
 import time
-from typing import List
+from contextlib import contextmanager
+from typing import List, Optional
 import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-def create_session_from_cookies(cookies: List[dict]) -> requests.Session:
-    """Creates a requests.Session with Selenium cookies."""
-    session = requests.Session()
-    for cookie in cookies:
+from core.logger import log_warning
+
+# Number of long-lived browser sessions kept open against the Selenium grid
+SELENIUM_POOL_SIZE = int(os.getenv("SELENIUM_POOL_SIZE", "2"))
+# How often a worker waiting for a busy pool checks whether a discarded session freed a slot
+POOL_POLL_SECONDS = 1.0
+HAFELE_HOME_URL = "https://www.hafele.com.tr/"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept-Language": "en-GB,en;q=0.9,tr;q=0.5",
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Sec-Ch-Ua": '"Chromium";v="136", "Google Chrome";v="136", "Not.A/Brand";v="99"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"macOS"'
+}
+
+
+def build_cookie_jar(cookies) -> requests.cookies.RequestsCookieJar:
+    """Builds a cookie jar from a Selenium cookie list or a name -> value dict."""
+    jar = requests.cookies.RequestsCookieJar()
+    if isinstance(cookies, dict):
+        cookies = [{"name": name, "value": value} for name, value in cookies.items()]
+    for cookie in cookies or []:
         try:
-            session.cookies.set(cookie["name"], cookie["value"])
+            jar.set(cookie["name"], cookie["value"])
         except Exception as e:
-            print(f"⚠️ Skipping malformed cookie: {cookie} - Reason: {e}")
-
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Accept-Language": "en-GB,en;q=0.9",
-        "Cache-Control": "no-cache",
-        "Pragma": "no-cache",
-        "Upgrade-Insecure-Requests": "1",
-        "Sec-Fetch-Mode": "navigate",
-        "Sec-Fetch-Site": "none",
-        "Sec-Fetch-User": "?1"
-    })
-    return session
+            log_warning(f"⚠️ Skipping malformed cookie: {e}", cookie=cookie)
+    return jar
 
 
-def fetch_product_page_selenium(url: str, cookies: List[dict]) -> str:
+def create_session_from_cookies(cookies: List[dict], pool_connections: int = 10, pool_maxsize: int = 10) -> requests.Session:
     """
-    Load the product page using Selenium and inject cookies properly.
+    Creates a requests.Session with Selenium cookies.
+
+    :param cookies: Selenium cookie list.
+    :param pool_connections: Number of per-host connection pools to keep.
+    :param pool_maxsize: Maximum number of keep-alive connections per pool.
+    :return: Session that reuses its TCP/TLS connections between requests.
     """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.cookies = build_cookie_jar(cookies)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def inject_cookies(driver, cookies: List[dict]) -> None:
+    """Adds Selenium cookies to the driver; it must already be on a hafele.com.tr page."""
+    for cookie in cookies or []:
+        try:
+            name = cookie.get("name")
+            value = cookie.get("value")
+
+            # Skip malformed or empty cookies
+            if not name or not value:
+                continue
+
+            sanitized_cookie = {
+                "name": name,
+                "value": value,
+                "path": "/",
+                "secure": True
+            }
+
+            # Don't set domain for __Host- cookies (they must be host-only)
+            if not name.startswith("__Host-"):
+                sanitized_cookie["domain"] = ".hafele.com.tr"
+
+            driver.add_cookie(sanitized_cookie)
+
+        except Exception as e:
+            log_warning(f"⚠️ Cookie error: {e}", cookie=cookie.get("name"))
+
+
+def create_remote_driver():
     options = Options()
     options.add_argument("--headless")
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
 
-    driver = webdriver.Remote(
+    return webdriver.Remote(
         command_executor=os.getenv("GRID_URL", "http://selenium-hub:4444/wd/hub"),
         options=options
     )
 
-    try:
-        # Navigate to domain to allow cookie injection
-        driver.get("https://www.hafele.com.tr/")
+
+class PooledDriver:
+    """A grid session plus the cookie snapshot that was injected into it."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.cookies = None
+
+
+class WebDriverPool:
+    """
+    Pool of long-lived Remote WebDriver sessions.
+
+    Sessions are created lazily up to `size`; the grid places each new session on
+    the least busy node, and idle sessions are reused first-in first-out so work
+    rotates across all of them. Cookies are injected once per session (again only
+    when the cookie snapshot changes) and every session is health-checked before
+    it is handed out; dead sessions are discarded and replaced.
+    """
+
+    def __init__(self, size: int = SELENIUM_POOL_SIZE, driver_factory=create_remote_driver):
+        self.size = max(1, size)
+        self.driver_factory = driver_factory
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> PooledDriver:
+        driver = self.driver_factory()
+        try:
+            # Navigate to domain to allow cookie injection
+            driver.get(HAFELE_HOME_URL)
+        except Exception:
+            # The grid session already exists; without quit() it stays open until the grid times it out
+            driver.quit()
+            raise
         time.sleep(2)
+        return PooledDriver(driver)
 
-        for cookie in cookies:
-            try:
-                name = cookie.get("name")
-                value = cookie.get("value")
+    @staticmethod
+    def _is_healthy(pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script("return document.readyState")
+            return True
+        except WebDriverException:
+            return False
+
+    def _discard(self, pooled: PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
 
-                # Skip malformed or empty cookies
-                if not name or not value:
+    def _acquire(self) -> PooledDriver:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self._new_session()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    pooled = self._idle.get(timeout=POOL_POLL_SECONDS)
+                except queue.Empty:
                     continue
 
-                sanitized_cookie = {
-                    "name": name,
-                    "value": value,
-                    "path": "/",
-                    "secure": True
-                }
+            if self._is_healthy(pooled):
+                return pooled
+            log_warning("⚠️ Discarding unhealthy Selenium session.")
+            self._discard(pooled)
+
+    @contextmanager
+    def session(self, cookies: Optional[List[dict]] = None):
+        """Yields a ready WebDriver carrying `cookies`, and returns it to the pool afterwards."""
+        pooled = self._acquire()
+        healthy = True
+        try:
+            if cookies is not None and pooled.cookies is not cookies:
+                if pooled.cookies is not None:
+                    pooled.driver.delete_all_cookies()
+                inject_cookies(pooled.driver, cookies)
+                pooled.cookies = cookies
+            yield pooled.driver
+        except TimeoutException:
+            # The page was slow, the session itself is fine
+            raise
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                self._idle.put(pooled)
+            else:
+                self._discard(pooled)
+
+    def close(self) -> None:
+        """Quits every idle session."""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+
 
-                # Don't set domain for __Host- cookies (they must be host-only)
-                if not name.startswith("__Host-"):
-                    sanitized_cookie["domain"] = ".hafele.com.tr"
+_webdriver_pool = None
+_webdriver_pool_lock = threading.Lock()
 
-                driver.add_cookie(sanitized_cookie)
 
-            except Exception as e:
-                print(f"⚠️ Cookie error [{cookie.get('name')}]: {e}")
+def get_webdriver_pool() -> WebDriverPool:
+    """Returns the process-wide WebDriver pool, created on first use."""
+    global _webdriver_pool
+    with _webdriver_pool_lock:
+        if _webdriver_pool is None:
+            _webdriver_pool = WebDriverPool()
+        return _webdriver_pool
 
+
+def close_webdriver_pool() -> None:
+    """Quits the pooled browser sessions, if any were ever opened."""
+    with _webdriver_pool_lock:
+        pool = _webdriver_pool
+    if pool is not None:
+        pool.close()
+
+
+def fetch_product_page_selenium(url: str, cookies: List[dict], pool: Optional[WebDriverPool] = None) -> str:
+    """
+    Load the product page using a pooled Selenium session with the cookies injected.
+    """
+    pool = pool or get_webdriver_pool()
+    with pool.session(cookies) as driver:
         # Navigate to target page with cookies set
         driver.get(url)
         WebDriverWait(driver, 15).until(
@@ -84,5 +259,3 @@ def fetch_product_page_selenium(url: str, cookies: List[dict]) -> str:
         )
 
         return driver.page_source
-    finally:
-        driver.quit()
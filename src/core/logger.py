@@ -1,34 +1,141 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import sys
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
 
 # Ensure output directory exists
-LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src/output"))
+LOG_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src/output")))
 os.makedirs(LOG_DIR, exist_ok=True)
 
 LOG_FILE = os.path.join(LOG_DIR, "scraper.log")
+# DEBUG adds the per-SKU request and parsing details
+LOG_LEVEL = os.getenv("SCRAPER_LOG_LEVEL", "INFO").upper()
+# "json" writes one JSON object per line, "text" is easier to read in a terminal
+LOG_FORMAT = os.getenv("SCRAPER_LOG_FORMAT", "json")
+
+_context = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    Adds `fields` (e.g. sku=code) to every log line written inside the block by
+    this thread or asyncio task.
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Captures the message and log context in the calling thread, then hands the record to the queue."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.context = _context.get()
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "message": record.msg,
+            **getattr(record, "context", {}),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = {**getattr(record, "context", {}), **getattr(record, "fields", {})}
+        line = f"{datetime.fromtimestamp(record.created).strftime('%H:%M:%S')} {record.levelname:<7} {record.msg}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text.rstrip()
+        return line
 
-# Configure logger
-logging.basicConfig(
-    filename=LOG_FILE,
-    filemode='a',
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 
 logger = logging.getLogger("hafele_scraper")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+_listener = None
+
+
+def start_logging(log_file=LOG_FILE, log_format=LOG_FORMAT):
+    """
+    Routes `logger` through an in-memory queue to a background thread that does
+    the formatting and the console/file writes, so workers never block on I/O.
+    """
+    global _listener
+    stop_logging()
+    formatter = JsonFormatter() if log_format == "json" else TextFormatter()
+    handlers = [logging.StreamHandler(sys.stdout), logging.FileHandler(log_file, encoding="utf-8")]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    records = queue.SimpleQueue()
+    logger.handlers = [ContextQueueHandler(records)]
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Writes out everything still queued and stops the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def _restart_after_fork():
+    # A forked worker process inherits the queue but not the thread draining it
+    global _listener
+    _listener = None
+    start_logging()
+
+
+start_logging()
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def log_debug(message: str, **fields):
+    logger.debug(message, extra={"fields": fields})
 
 
-def log_info(message: str):
-    logger.info(message)
+def log_info(message: str, **fields):
+    logger.info(message, extra={"fields": fields})
 
 
-def log_warning(message: str):
-    logger.warning(message)
+def log_warning(message: str, **fields):
+    logger.warning(message, extra={"fields": fields})
 
 
-def log_error(message: str):
-    logger.error(message)
+def log_error(message: str, **fields):
+    logger.error(message, extra={"fields": fields})
 
 
-def log_exception(message: str):
-    logger.exception(message)  # Logs full stack trace
+def log_exception(message: str, **fields):
+    logger.exception(message, extra={"fields": fields})  # Logs full stack trace
@@ -1,13 +1,15 @@
 import os
 import sys
+import argparse
 import pickle
-import pandas as pd
 from dotenv import load_dotenv
 import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+import asyncio
 import time
-
-from exceptiongroup import catch
+from functools import partial
 
 # Add src to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
@@ -16,102 +18,570 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 load_dotenv()
 
 # Import project functions
-from scraper.scraping_functions import retrieve_product_data
+from scraper.product_record import ERROR_STATUS, FAILED_STATUSES, NOT_FOUND_TEXT, ProductRecord
+from scraper.scraping_functions import build_product_url, empty_result, retrieve_product_attempt
+from scraper.async_scraping_functions import AsyncHafeleClient, retrieve_product_attempt_async
 from scraper.send_mail import send_mail_without_excel, send_mail_with_excel
 from hafele_login.handle_login import handle_login
-import random
+from core.fetcher import close_webdriver_pool
+from core.session_manager import close_http_sessions, cookie_state
+from core.logger import log_context, log_debug, log_error, log_exception, log_info, log_warning
+from core.metrics import metrics, start_metrics_server, write_run_summary
+from core.result_store import ResultStore
+from core.dead_letters import DeadLetterQueue
+from core.retry import REQUEST_ERRORS, DeferredRetryExecutor, RetryLater, RetryPolicy, retry_budget
+from core.price_history import CHANGE_REPORT_FILE, PriceHistory, write_change_report
+from core.rate_limiter import hafele_limiter
+from core.result_files import read_frame, result_path, to_typed_frame, write_excel_attachment, write_frame
+from core.delta_scheduler import DELTA_ENABLED, carried_row, mark_age, plan_delta
+from input.sku_index import SKU_INDEX_DB, SkuIndex
+from input.sku_queue import SkuQueue, run_start_cutoff, stream_batch, wait_for_batch
+from core.sharding import PROCESS_COUNT, SHARD_COUNT, SHARD_INDEX, shard_codes, split_into_shards
 
 # Constants
 BASE_DIR = os.path.dirname(__file__)
 ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
-INPUT_FILE = os.path.join(ROOT_DIR, "input", "product_codes.xlsx")
-OUTPUT_FILE = os.path.join(ROOT_DIR, "output", "product_data_results.xlsx")
+# Databases, results and reports; SCRAPER_OUTPUT_DIR points a run (e.g. the benchmark) elsewhere
+OUTPUT_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.join(ROOT_DIR, "output"))
+INPUT_FILE = os.getenv("SCRAPER_INPUT_FILE", os.path.join(ROOT_DIR, "input", "product_codes.csv"))
+# Primary, typed results file (.parquet or .csv, see core.result_files.RESULT_FORMAT)
+RESULT_FILE = result_path(os.path.join(OUTPUT_DIR, "product_data_results"))
+# Only generated to be attached to the result mails
+MAIL_EXCEL_FILE = os.path.join(OUTPUT_DIR, "product_data_results.xlsx")
 COOKIE_FILE = os.path.join(ROOT_DIR, "shared", "cookies.pkl")
-BASE_PRODUCT_URL = "https://www.hafele.com.tr/prod-live/web/WFS/Haefele-HTR-Site/tr_TR/-/TRY/ViewProduct-GetPriceAndAvailabilityInformationPDS"
 
-# Global state
-cookies = None
-cookie_lock = threading.Lock()
+# Number of products scraped in parallel
+MAX_WORKERS = int(os.getenv("SCRAPER_WORKERS", "8"))
+# Whole products are retried with backoff, within the run's retry budget
+product_retry_policy = RetryPolicy()
+# Print the rate limiter state every this many products
+STATS_INTERVAL = 100
+# "threads" runs the blocking requests pipeline in a thread pool, "async" runs the aiohttp pipeline
+SCRAPER_BACKEND = os.getenv("SCRAPER_BACKEND", "threads")
+# Read SKUs from the IdeaSoft export queue while it is still running instead of from INPUT_FILE
+STREAM_ENABLED = os.getenv("SCRAPER_STREAM", "0") == "1"
+# "index" reads the SKU list kept by the incremental IdeaSoft sync (falls back to INPUT_FILE), "excel" reads INPUT_FILE
+SKU_SOURCE = os.getenv("SCRAPER_SKU_SOURCE", "index")
+
+
+def get_cookie_snapshot():
+    """Returns the current cookie list without blocking on a running refresh."""
+    return cookie_state.snapshot()
+
+
+def login_and_save_cookies():
+    """Logs in with Selenium and stores the new cookies in COOKIE_FILE."""
+    driver = handle_login()
+    try:
+        new_cookies = driver.get_cookies()
+    finally:
+        driver.quit()
+    os.makedirs(os.path.dirname(COOKIE_FILE), exist_ok=True)
+    with open(COOKIE_FILE, "wb") as f:
+        pickle.dump(new_cookies, f)
+    return new_cookies
 
 
 def refresh_cookies():
-    global cookies
+    """
+    Background refresh loop. The login runs without holding any lock that workers
+    need: they keep using the current cookies until the new set is swapped in.
+    """
     while True:
-        print(f"🔁 [{datetime.now().strftime('%H:%M:%S')}] Refreshing cookies...")
-        with cookie_lock:
-            try:
-                driver = handle_login()
-                cookies = driver.get_cookies()
-                driver.quit()
-                with open(COOKIE_FILE, "wb") as f:
-                    pickle.dump(cookies, f)
-                print(f"✅ Cookies refreshed at {datetime.now().strftime('%H:%M:%S')}")
-            except Exception as e:
-                print(f"❌ Failed to refresh cookies: {e}")
-        time.sleep(480)  # 8 minutes
+        reason = cookie_state.wait_until_refresh_due()
+        log_info(f"🔁 Refreshing cookies ({reason})...")
+        try:
+            cookie_state.swap(login_and_save_cookies())
+            log_info("✅ Cookies refreshed")
+        except Exception as e:
+            log_error(f"❌ Failed to refresh cookies: {e}")
+            time.sleep(30)
 
 
 def load_initial_cookies():
-    global cookies
     if os.path.exists(COOKIE_FILE):
         with open(COOKIE_FILE, "rb") as f:
-            cookies = pickle.load(f)
-            print("✅ Initial cookies loaded from file.")
+            cookie_state.swap(pickle.load(f), loaded_at=os.path.getmtime(COOKIE_FILE))
+            log_info("✅ Initial cookies loaded from file.")
     else:
-        print("⚠️ No cookie file found. Logging in initially...")
-        driver = handle_login()
-        cookies = driver.get_cookies()
-        driver.quit()
-        os.makedirs(os.path.dirname(COOKIE_FILE), exist_ok=True)
-        with open(COOKIE_FILE, "wb") as f:
-            pickle.dump(cookies, f)
-        print("✅ Initial cookies fetched and saved.")
+        log_warning("⚠️ No cookie file found. Logging in initially...")
+        cookie_state.swap(login_and_save_cookies())
+        log_info("✅ Initial cookies fetched and saved.")
 
-def parse_price(price_str):
-    if price_str is None:
-        return None
+def watch_cookie_file(interval=30):
+    """Reloads COOKIE_FILE whenever another process rewrites it (used by worker processes)."""
+    last_mtime = os.path.getmtime(COOKIE_FILE) if os.path.exists(COOKIE_FILE) else 0
+    while True:
+        time.sleep(interval)
+        try:
+            mtime = os.path.getmtime(COOKIE_FILE)
+            if mtime > last_mtime:
+                with open(COOKIE_FILE, "rb") as f:
+                    cookie_state.swap(pickle.load(f), loaded_at=mtime)
+                last_mtime = mtime
+                log_info("✅ Worker process picked up refreshed cookies.")
+        except Exception as e:
+            log_warning(f"⚠️ Could not reload cookies: {e}")
+
+
+def product_outcome(stok_durumu):
+    """ok, not_found, failed (no data) or error (raised), by the row's `stok_durumu`."""
+    if stok_durumu == ERROR_STATUS:
+        return "error"
+    if stok_durumu is None:
+        return "failed"
+    if stok_durumu == NOT_FOUND_TEXT:
+        return "not_found"
+    return "ok"
+
+
+def count_product(record):
+    """Counts the product under its outcome (see `product_outcome`)."""
+    metrics.count("products_total", outcome=product_outcome(record.stok_durumu))
+    return record
+
+
+def failed_record(code, error):
+    """Request errors leave the product without data; anything else (e.g. a parsing bug) is a HATA row."""
+    if isinstance(error, REQUEST_ERRORS):
+        log_error(f"❌ Giving up on product: {error}")
+        return ProductRecord.from_result(code, empty_result())
+    log_error(f"❌ Error processing product: {error}")
+    return ProductRecord.error(code)
+
+
+def unexpected_failure(code, error):
+    """Row for a product whose task raised past `process_product`'s own error handling."""
+    with log_context(sku=code):
+        return count_product(failed_record(code, error))
+
+
+def process_product(code, attempt=0):
+    """
+    One attempt at `code`. A transient failure raises RetryLater, so the worker thread
+    is free for other products until the retry is due (see DeferredRetryExecutor).
+    """
+    with log_context(sku=code), metrics.span("product"):
+        retry_budget.record_call()
+        try:
+            data = retrieve_product_attempt(build_product_url(code), code, get_cookie_snapshot())
+            return count_product(ProductRecord.from_result(code, data))
+        except Exception as e:
+            product_retry_policy.defer(e, attempt, "product_page")
+            return count_product(failed_record(code, e))
+
+
+async def process_product_async(client, code, attempt=0):
+    """Async counterpart of `process_product`; the caller waits out RetryLater without holding a product slot."""
+    with log_context(sku=code), metrics.span("product"):
+        retry_budget.record_call()
+        try:
+            data = await retrieve_product_attempt_async(client, build_product_url(code), code)
+            return count_product(ProductRecord.from_result(code, data))
+        except Exception as e:
+            product_retry_policy.defer(e, attempt, "product_page")
+            return count_product(failed_record(code, e))
+
+
+def report_progress(done, total, code):
+    """Logs every product at debug level and a progress line with the rate limiter state every STATS_INTERVAL."""
+    log_debug(f"➡️ [{done}/{total}] Processed", sku=code)
+    if done % STATS_INTERVAL == 0 or done == total:
+        log_info(f"➡️ [{done}/{total}] products processed", **hafele_limiter.stats())
+
+
+def scrape_products(codes, max_workers=MAX_WORKERS, backend=SCRAPER_BACKEND, on_row=None):
+    """
+    Scrapes the given product codes with a bounded pool of worker threads,
+    or with the asyncio pipeline when `backend` is "async".
+
+    :param codes: Product codes to scrape.
+    :param max_workers: Maximum number of products processed at the same time.
+    :param backend: "threads" or "async".
+    :param on_row: Optional callback(index, record) called as soon as each product is finished.
+    :return: ProductRecords in the same order as `codes`.
+    """
+    if backend == "async":
+        return asyncio.run(scrape_products_async(codes, max_workers, on_row))
+
+    rows = [None] * len(codes)
+    done = 0
+    progress_lock = threading.Lock()
+
+    def finish(i, record):
+        nonlocal done
+        rows[i] = record
+        if on_row:
+            on_row(i, record)
+        with progress_lock:
+            done += 1
+            report_progress(done, len(codes), codes[i])
+
+    with DeferredRetryExecutor(max_workers) as executor:
+        for i, code in enumerate(codes):
+            executor.submit(process_product, code, partial(finish, i), on_error=unexpected_failure)
 
-    # Clean the string
-    cleaned = price_str.replace(".", "").replace(",", ".")
+    return rows
 
-    # Check if it's a valid float
+
+async def scrape_products_async(codes, max_products=MAX_WORKERS, on_row=None):
+    """
+    Scrapes the given product codes on one event loop, keeping at most
+    `max_products` products in flight. Returns rows in the order of `codes`.
+    """
+    product_slots = asyncio.Semaphore(max(1, max_products))
+    done = 0
+
+    async with AsyncHafeleClient(get_cookie_snapshot) as client:
+        async def run(i, code):
+            nonlocal done
+            attempt = 0
+            while True:
+                try:
+                    async with product_slots:
+                        row = await process_product_async(client, code, attempt)
+                    break
+                except RetryLater as retry:
+                    attempt = retry.attempt
+                    await asyncio.sleep(retry.delay)
+            if on_row:
+                on_row(i, row)
+            done += 1
+            report_progress(done, len(codes), code)
+            return row
+
+        return await asyncio.gather(*[run(i, code) for i, code in enumerate(codes)])
+
+
+def _init_shard_process(cookies, refresh_requested, process_count):
+    """Process pool initializer: seeds the cookies and links auth failures back to the parent."""
+    cookie_state.swap(cookies)
+    cookie_state.add_refresh_listener(lambda reason: refresh_requested.set())
+    hafele_limiter.scale(1 / process_count)
+    threading.Thread(target=watch_cookie_file, daemon=True).start()
+
+
+def scrape_shard(store_path, run_id, items, max_workers=MAX_WORKERS, backend=SCRAPER_BACKEND):
+    """
+    Process pool entry point: scrapes one shard into the shared result store.
+
+    :param items: (position, code) pairs; positions keep the merged export in input order.
+    :return: (number of products scraped, metrics snapshot for the parent to merge).
+    """
+    # Pool processes are reused, so only report (and budget) what this shard does
+    metrics.reset()
+    retry_budget.reset()
+    store = ResultStore(store_path)
     try:
-        return float(cleaned)
-    except ValueError:
+        codes = [code for _, code in items]
+        scrape_products(codes, max_workers, backend, on_row=lambda i, record: store.save_row(run_id, items[i][0], record.as_row()))
+    finally:
+        close_http_sessions()
+        close_webdriver_pool()
+        store.close()
+    return len(items), metrics.snapshot()
+
+
+def forward_refresh_requests(refresh_requested):
+    """Turns auth failures seen by worker processes into refreshes in this (parent) process."""
+    while True:
+        refresh_requested.wait()
+        refresh_requested.clear()
+        cookie_state.request_refresh("auth failure in a worker process")
+
+
+def scrape_with_processes(store, run_id, positions, pending, processes, max_workers=MAX_WORKERS, backend=SCRAPER_BACKEND):
+    """
+    Splits `pending` into SKU-hash shards and scrapes each one in its own process,
+    so HTML parsing uses every core instead of sharing one GIL. Rows land in the
+    shared result store and are merged by the normal export.
+    """
+    refresh_requested = multiprocessing.Event()
+    threading.Thread(target=forward_refresh_requests, args=(refresh_requested,), daemon=True).start()
+
+    shards = [shard for shard in split_into_shards(pending, processes) if shard]
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_shard_process,
+                             initargs=(get_cookie_snapshot(), refresh_requested, processes)) as executor:
+        futures = [
+            executor.submit(scrape_shard, store.path, run_id, [(positions[code], code) for code in shard],
+                            max_workers, backend)
+            for shard in shards
+        ]
+        for future in as_completed(futures):
+            product_count, shard_metrics = future.result()
+            metrics.merge(shard_metrics)
+            log_info(f"🧩 Worker process finished a shard of {product_count} products.")
+
+
+def report_throughput(product_count, elapsed_seconds, workers=MAX_WORKERS):
+    """Prints how many products per second the run achieved."""
+    rate = product_count / elapsed_seconds if elapsed_seconds > 0 else 0.0
+    log_info(f"📈 Throughput: {product_count} products in {round(elapsed_seconds, 2)}s "
+             f"({rate:.2f} products/s, {workers} workers)")
+    log_info("🚦 Rate limiter", **hafele_limiter.stats())
+    return rate
+
+
+def export_results(store, run_id, codes, output_file=RESULT_FILE, mark_ages=False, history=None):
+    """
+    Writes the stored rows of `run_id` to `output_file` (Parquet, CSV or Excel by
+    extension) with typed columns, in the order of `codes`.
+
+    :param mark_ages: Add when each value was scraped and how old it is (delta runs).
+    :param history: PriceHistory to also record the run in.
+    """
+    rows_by_code = store.load_rows(run_id)
+    rows = [rows_by_code[code] for code in codes if code in rows_by_code]
+    if mark_ages:
+        rows = mark_age(rows, store.saved_times(run_id))
+    with metrics.span("export"):
+        frame = to_typed_frame(rows)
+        write_frame(frame, output_file)
+    if history is not None:
+        history.append_run(run_id, frame)
+    return len(rows)
+
+
+def resolve_run_id(store, resume=False, run_id=None):
+    """Picks the run to write to: the given ID, the last unfinished run when resuming, or a new one."""
+    if run_id:
+        return run_id
+    if resume:
+        unfinished = store.latest_unfinished_run()
+        if unfinished:
+            return unfinished
+        log_warning("⚠️ No unfinished run found to resume. Starting a new run.")
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def sharded_run_id(store, run_id=None):
+    """
+    The run ID every container of a sharded run agrees on without talking to the
+    others: `run_id` (default: today's date) with the first numeric suffix whose run
+    has not finished yet, so a second run on the same day starts a fresh run
+    instead of finding the first one done.
+    """
+    base = run_id or f"{datetime.now().strftime('%Y%m%d')}_sharded"
+    candidate, number = base, 1
+    while store.is_finished(candidate):
+        number += 1
+        candidate = f"{base}_{number}"
+    if candidate != base:
+        log_info(f"🧩 Run {base} already finished; starting run {candidate}.")
+    return candidate
+
+
+def prepare_run(store, run_id, codes):
+    """Registers the run and returns the codes that still need scraping."""
+    store.start_run(run_id)
+    completed = store.completed_codes(run_id)
+    pending = [code for code in codes if code not in completed]
+    if completed:
+        log_info(f"⏩ Resuming run {run_id}: {len(codes) - len(pending)} products already scraped.")
+    log_info(f"🔁 Scraping {len(pending)} products (run {run_id})...")
+    return pending
+
+
+def carry_forward_unchanged(store, run_id, positions, pending, dead_letters=None):
+    """
+    Delta runs: stores the last known row of every SKU the scheduler leaves out,
+    and returns the SKUs that still need a fresh scrape.
+
+    :param positions: {stock_code: position in the export}.
+    :param dead_letters: DeadLetterQueue; its SKUs are always scraped again.
+    """
+    queued = dead_letters.failures(pending) if dead_letters is not None else {}
+    to_scrape, carried = plan_delta([code for code in pending if code not in queued], store.sku_stats(pending))
+    for code, stats in carried:
+        store.save_row(run_id, positions[code], carried_row(stats), track_changes=False)
+    scrape_now = set(to_scrape) | set(queued)
+    return [code for code in pending if code in scrape_now]
+
+
+def scrape_into_store(store, run_id, codes, pending, max_workers=MAX_WORKERS, backend=SCRAPER_BACKEND, processes=1):
+    """Scrapes `pending`, persisting each row as it finishes (in worker processes when `processes` > 1)."""
+    positions = {code: i for i, code in enumerate(codes)}
+    scrape_st = time.time()
+    if processes > 1:
+        scrape_with_processes(store, run_id, positions, pending, processes, max_workers, backend)
+    else:
+        scrape_products(pending, max_workers, backend,
+                        on_row=lambda i, record: store.save_row(run_id, positions[pending[i]], record.as_row()))
+    report_throughput(len(pending), time.time() - scrape_st, max_workers * processes)
+    close_http_sessions()
+    close_webdriver_pool()
+
+
+def scrape_stream(store, run_id, arrivals, shard_count=1, shard_index=0, max_workers=MAX_WORKERS, delta=False,
+                  dead_letters=None):
+    """
+    Scrapes SKUs while the IdeaSoft export is still delivering them: every SKU is
+    handed to the worker pool as soon as it arrives and its row is persisted when done.
+
+    :param arrivals: Iterable of [(position, stock_code), ...] lists (see `input.sku_queue.stream_batch`).
+    :return: (codes, scraped): every SKU received in catalogue order, and how many were scraped.
+    """
+    store.start_run(run_id)
+    completed = store.completed_codes(run_id)
+    positions = {}
+    scraped = 0
+    scrape_st = time.time()
+
+    def save(code, record):
+        store.save_row(run_id, positions[code], record.as_row())
+
+    with DeferredRetryExecutor(max_workers) as executor:
+        for arrived in arrivals:
+            new_codes = []
+            for position, code in arrived:
+                if code not in positions:
+                    positions[code] = position
+                    new_codes.append(code)
+            pending = [code for code in shard_codes(new_codes, shard_count, shard_index) if code not in completed]
+            if delta:
+                pending = carry_forward_unchanged(store, run_id, positions, pending, dead_letters)
+            for code in pending:
+                executor.submit(process_product, code, partial(save, code), on_error=unexpected_failure)
+            scraped += len(pending)
+            log_info(f"📥 {len(positions)} SKUs received so far, {scraped} handed to the scraper.")
+
+    report_throughput(scraped, time.time() - scrape_st, max_workers)
+    close_http_sessions()
+    close_webdriver_pool()
+    return sorted(positions, key=positions.get), scraped
+
+
+def update_dead_letters(dead_letters, run_id, rows, codes):
+    """
+    Queues the SKUs among `codes` whose row in `rows` failed and takes the ones
+    that now have data out of the queue.
+
+    :return: The failed SKUs, in the order of `codes`.
+    """
+    queued = dead_letters.failures(codes)
+    failed = {code: product_outcome(rows[code].get("stok_durumu"))
+              for code in codes if code in rows and rows[code].get("stok_durumu") in FAILED_STATUSES}
+    dead_letters.add(run_id, failed)
+    dead_letters.remove([code for code in queued if code in rows and code not in failed])
+    return [code for code in codes if code in failed]
+
+
+def retry_dead_letters(store, dead_letters, run_id, codes, own_codes, max_workers=MAX_WORKERS,
+                       backend=SCRAPER_BACKEND):
+    """
+    End of a run: moves the failed SKUs of `own_codes` into the dead-letter queue,
+    then scrapes the queued ones once more (including SKUs left over from earlier
+    runs) and overwrites their rows. Whatever still fails stays queued for the next run.
+
+    :param codes: Every SKU of the run, for the row positions.
+    :param own_codes: The SKUs this process scraped (its shard).
+    :return: Number of SKUs that got their data on the second pass.
+    """
+    update_dead_letters(dead_letters, run_id, store.load_rows(run_id), own_codes)
+    due = dead_letters.due(own_codes)
+    if not due:
+        return 0
+    log_info(f"📮 Reprocessing {len(due)} dead-lettered products...", dead_letters=len(dead_letters))
+    positions = {code: i for i, code in enumerate(codes)}
+    # The outage that failed them has usually used up the first pass' budget
+    retry_budget.reset()
+    with metrics.span("dead_letter_retry"):
+        records = scrape_products(due, max_workers, backend,
+                                  on_row=lambda i, record: store.save_row(run_id, positions[due[i]], record.as_row()))
+    close_http_sessions()
+    close_webdriver_pool()
+    still_failed = update_dead_letters(dead_letters, run_id, {record.stock_code: record.as_row() for record in records}, due)
+    recovered = len(due) - len(still_failed)
+    metrics.count("dead_letters_recovered_total", recovered)
+    log_info(f"📮 Recovered {recovered} of {len(due)} dead-lettered products; {len(dead_letters)} still queued.")
+    return recovered
+
+
+def run_pipeline(store, run_id, codes, output_file=RESULT_FILE, max_workers=MAX_WORKERS, backend=SCRAPER_BACKEND,
+                 processes=1, delta=False, dead_letters=None, history=None, shard_count=1, shard_index=0,
+                 on_start=None):
+    """
+    Scrapes this shard's share of `codes` that the run does not have yet (carrying
+    unchanged SKUs forward on delta runs), persisting each row as it finishes, then
+    finishes the run with `complete_run`.
+
+    :param on_start: Called with the SKUs about to be scraped, before scraping starts.
+    :return: Number of rows written to `output_file`, or None when other shards are still running.
+    """
+    shard = shard_codes(codes, shard_count, shard_index)
+    if shard_count > 1:
+        log_info(f"🧩 Shard {shard_index + 1}/{shard_count}: {len(shard)} of {len(codes)} products.")
+    pending = prepare_run(store, run_id, shard)
+    if delta:
+        pending = carry_forward_unchanged(store, run_id, {code: i for i, code in enumerate(codes)}, pending,
+                                          dead_letters)
+    if on_start:
+        on_start(pending)
+    scrape_into_store(store, run_id, codes, pending, max_workers, backend, processes)
+    return complete_run(store, run_id, codes, shard, output_file, max_workers, backend, delta, dead_letters,
+                        history, shard_count, shard_index)
+
+
+def complete_run(store, run_id, codes, shard, output_file=RESULT_FILE, max_workers=MAX_WORKERS,
+                 backend=SCRAPER_BACKEND, delta=False, dead_letters=None, history=None, shard_count=1, shard_index=0):
+    """
+    End of a run: reprocesses the dead letters of `shard`, then, once every shard is
+    done, exports every row of the run (in the order of `codes`) to `output_file`.
+
+    :return: Number of rows written to `output_file`, or None when other shards are still running.
+    """
+    if dead_letters is not None:
+        retry_dead_letters(store, dead_letters, run_id, codes, shard, max_workers, backend)
+    if shard_count > 1 and not store.finish_shard(run_id, shard_index, shard_count):
+        log_info(f"✅ Shard {shard_index + 1}/{shard_count} done. The last shard to finish exports the results.")
         return None
 
-def process_product(code):
-    global cookies
-    url = f"{BASE_PRODUCT_URL}?SKU={code.replace('.', '')}&ProductQuantity=20000"
-    with cookie_lock:
+    row_count = export_results(store, run_id, codes, output_file, mark_ages=delta, history=history)
+    store.finish_run(run_id)
+    log_info(f"✅ Done. Saved {row_count} results to {output_file}")
+    return row_count
+
+
+def mark_batch_consumed(batch_id):
+    sku_queue = SkuQueue()
+    try:
+        sku_queue.mark_consumed(batch_id)
+    finally:
+        sku_queue.close()
+
+
+def read_input_codes(input_file=INPUT_FILE, source=SKU_SOURCE, index_path=SKU_INDEX_DB):
+    """Reads the SKUs to scrape from the synced IdeaSoft SKU index, or from `input_file` (CSV, Parquet or Excel)."""
+    if source == "index" and os.path.exists(index_path):
+        index = SkuIndex(index_path)
         try:
-            data = retrieve_product_data(url, code, cookies)
-            return {
-                "stock_code": code,
-                "kdv_haric_tavsiye_edilen_perakende_fiyat": data.get("kdv_haric_tavsiye_edilen_perakende_fiyat"),
-                "kdv_haric_net_fiyat": data.get("kdv_haric_net_fiyat"),
-                "kdv_haric_satis_fiyati": data.get("kdv_haric_satis_fiyati"),
-                "stok_durumu": data.get("stok_durumu"),
-                "stock_amount": data.get("stock_amount"),
-                "minimum_alis_fiyati": data.get("minimum_alis_fiyati"),
-                "minimum_alis_carpi_kdv_haric_satis": parse_price(data.get("kdv_haric_satis_fiyati")) * int(data.get("minimum_alis_fiyati")),
-            }
-        except Exception as e:
-            print(f"❌ Error processing product {code}: {e}")
-            return {
-                "stock_code": code,
-                "kdv_haric_tavsiye_edilen_perakende_fiyat": None,
-                "kdv_haric_net_fiyat": None,
-                "kdv_haric_satis_fiyati": None,
-                "stok_durumu": "HATA",
-                "stock_amount": None,
-                "minimum_alis_fiyati": None,
-                "minimum_alis_carpi_kdv_haric_satis": None,
-            }
-
-
-def main():
+            codes = index.active_skus()
+        finally:
+            index.close()
+        if codes:
+            log_info(f"📥 Read {len(codes)} product codes from the SKU index {index_path}")
+            return codes
+        log_warning("⚠️ The SKU index is empty; falling back to the input file.")
+    log_info(f"📥 Reading product codes from {input_file}")
+    df_input = read_frame(input_file)
+    return df_input.iloc[:, 0].dropna().astype(str).tolist()
+
+
+def main(resume=False, run_id=None, processes=PROCESS_COUNT, shard_count=SHARD_COUNT, shard_index=SHARD_INDEX,
+         delta=DELTA_ENABLED, stream=STREAM_ENABLED):
     informal_mail = os.getenv("gmail_receiver_email_3")
+    # A resumed run keeps streaming its own (older) batch; a new run only takes an export started with it
+    batch_cutoff = None if resume else run_start_cutoff()
+    sharded = shard_count > 1
+    # Only one container of a sharded run sends the start mail
+    is_lead_shard = not sharded or shard_index == 0
+    store = ResultStore()
+    dead_letters = DeadLetterQueue()
+    history = PriceHistory()
+    if sharded:
+        run_id = sharded_run_id(store, run_id)
+    run_id = resolve_run_id(store, resume, run_id)
+    start_metrics_server()
     try:
         st = time.time()
         load_initial_cookies()
@@ -119,31 +589,88 @@ def main():
         # Start background thread for refreshing cookies
         threading.Thread(target=refresh_cookies, daemon=True).start()
 
-        print(f"📥 Reading product codes from {INPUT_FILE}")
-        df_input = pd.read_excel(INPUT_FILE)
-        codes = df_input.iloc[:, 0].dropna().astype(str).tolist()
-        print(f"🔁 Scraping {len(codes)} products...")
-        
-        send_mail_without_excel(informal_mail, content=f"{len(codes)} urunun web kazima islemi baslatildi.")
-
-        rows = []
-        for i, code in enumerate(codes, 1):
-            print(f"\n➡️ [{i}/{len(codes)}] Processing: {code}")
-            row = process_product(code)
-            rows.append(row)
-
-        df_out = pd.DataFrame(rows)
-        df_out.to_excel(OUTPUT_FILE, index=False)
-        print(f"\n✅ Done. Saved results to {OUTPUT_FILE}")
-        send_mail_with_excel(os.getenv("gmail_receiver_email"), OUTPUT_FILE)
-        send_mail_with_excel(os.getenv("gmail_receiver_email_2"), OUTPUT_FILE)
+        batch_id = None
+        scraped = 0
+
+        def announce_start(pending):
+            nonlocal scraped
+            scraped = len(pending)
+            if is_lead_shard:
+                send_mail_without_excel(informal_mail, content=f"{len(pending)} urunun web kazima islemi baslatildi.")
+
+        if stream:
+            if processes > 1:
+                log_warning("⚠️ --processes is not used in stream mode; SKUs are scraped by one process as they arrive.")
+            sku_queue = SkuQueue()
+            try:
+                batch_id = wait_for_batch(sku_queue, batch_cutoff)
+                log_info(f"📡 Streaming SKUs from IdeaSoft export batch {batch_id} (run {run_id})...")
+                if is_lead_shard:
+                    send_mail_without_excel(informal_mail, content="Web kazima islemi IdeaSoft urun aktarimiyla birlikte baslatildi.")
+                codes, scraped = scrape_stream(store, run_id, stream_batch(sku_queue, batch_id),
+                                               shard_count, shard_index, delta=delta, dead_letters=dead_letters)
+            finally:
+                sku_queue.close()
+            row_count = complete_run(store, run_id, codes, shard_codes(codes, shard_count, shard_index), RESULT_FILE,
+                                     delta=delta, dead_letters=dead_letters, history=history,
+                                     shard_count=shard_count, shard_index=shard_index)
+        else:
+            codes = read_input_codes(INPUT_FILE, SKU_SOURCE)
+            row_count = run_pipeline(store, run_id, codes, RESULT_FILE, processes=processes, delta=delta,
+                                     dead_letters=dead_letters, history=history, shard_count=shard_count,
+                                     shard_index=shard_index, on_start=announce_start)
+        if row_count is None:
+            return
+        change_report, change_summary = write_change_report(history, run_id, CHANGE_REPORT_FILE)
+        if batch_id:
+            mark_batch_consumed(batch_id)
+
+        with metrics.span("excel_attachment"):
+            write_excel_attachment(RESULT_FILE, MAIL_EXCEL_FILE)
+        send_mail_with_excel(os.getenv("gmail_receiver_email"), MAIL_EXCEL_FILE, change_report, change_summary)
+        send_mail_with_excel(os.getenv("gmail_receiver_email_2"), MAIL_EXCEL_FILE, change_report, change_summary)
         send_mail_without_excel(informal_mail, content=f"{len(codes)} urunun web kazima islemi basariyla tamamlandi.")
 
         et = time.time()
-        print(f"Time took to scrape {len(codes)} products: {round((et - st)/60, 2)} minutes.")
+        log_info(f"Time took to scrape {scraped} products: {round((et - st)/60, 2)} minutes.")
 
     except Exception as e:
-        send_mail_without_excel(informal_mail, content=f"Web kazima islemi hata verdi. Hicbir urunun verisi edinelemedi. Hata: {e}")
+        log_exception(f"❌ Run {run_id} failed")
+        send_mail_without_excel(
+            informal_mail,
+            content=f"Web kazima islemi hata verdi. Hata: {e}. "
+                    f"Tamamlanan urunler kaydedildi, '--resume' ile {run_id} calismasina devam edilebilir.",
+        )
+    finally:
+        store.close()
+        dead_letters.close()
+        history.close()
+        write_run_summary(run_id, shard_index if sharded else None)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape Hafele prices and stock for the product codes in the input file.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last unfinished run, skipping products that already have results.")
+    parser.add_argument("--run-id", help="Run ID to write to (or resume). Defaults to a new timestamp-based ID, or to today's "
+                             "date for sharded runs (with a suffix once that run has finished).")
+    parser.add_argument("--processes", type=int, default=PROCESS_COUNT,
+                        help="Worker processes to split the products across (default: SCRAPER_PROCESSES or 1).")
+    parser.add_argument("--shard-count", type=int, default=SHARD_COUNT,
+                        help="Number of containers sharing the run (default: SCRAPER_SHARD_COUNT or 1).")
+    parser.add_argument("--shard-index", type=int, default=SHARD_INDEX,
+                        help="Which shard this container scrapes, 0-based (default: SCRAPER_SHARD_INDEX or 0).")
+    parser.add_argument("--delta", action="store_true", default=DELTA_ENABLED,
+                        help="Only rescrape SKUs likely to have changed and carry the rest forward "
+                             "(default: SCRAPER_DELTA=1).")
+    parser.add_argument("--stream", action="store_true", default=STREAM_ENABLED,
+                        help="Scrape SKUs as the IdeaSoft export delivers them through the SKU queue "
+                             "instead of reading the input file (default: SCRAPER_STREAM=1).")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(resume=args.resume, run_id=args.run_id, processes=args.processes,
+         shard_count=args.shard_count, shard_index=args.shard_index, delta=args.delta,
+         stream=args.stream)
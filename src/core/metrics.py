@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from core.logger import log_info
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OUTPUT_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.join(ROOT_DIR, "output"))
+METRICS_DIR = os.path.join(OUTPUT_DIR, "metrics")
+# Port of the Prometheus text endpoint (GET /metrics); 0 turns it off
+METRICS_PORT = int(os.getenv("SCRAPER_METRICS_PORT", "0"))
+METRIC_PREFIX = "scraper"
+
+
+def endpoint_label(url):
+    """Last path segment of a hafele.com.tr URL, e.g. "ViewParametricSearch-SimpleOfferSearch"."""
+    return urlparse(str(url)).path.rstrip("/").rsplit("/", 1)[-1] or "/"
+
+
+class Metrics:
+    """
+    In-process timing spans and counters for one run.
+
+    Spans keep count, total and maximum duration per stage, counters are summed
+    per (name, labels). Both are cheap enough for the per-request hot path.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._spans = {}
+        self.started_at = time.time()
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            span = self._spans.get(stage)
+            if span is None:
+                self._spans[stage] = [1, seconds, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+                span[2] = max(span[2], seconds)
+
+    @contextmanager
+    def span(self, stage):
+        """Times the block as one occurrence of `stage` (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def snapshot(self):
+        """Picklable copy of the raw values, e.g. to send from a worker process to the parent."""
+        with self._lock:
+            return {"counters": dict(self._counters), "spans": {stage: list(span) for stage, span in self._spans.items()}}
+
+    def merge(self, snapshot):
+        """Adds a `snapshot()` taken in another process."""
+        with self._lock:
+            for key, value in snapshot["counters"].items():
+                self._counters[key] += value
+            for stage, (count, total, longest) in snapshot["spans"].items():
+                span = self._spans.setdefault(stage, [0, 0.0, 0.0])
+                span[0] += count
+                span[1] += total
+                span[2] = max(span[2], longest)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._spans.clear()
+            self.started_at = time.time()
+
+    def summary(self):
+        """Stages sorted by total time, then counters; JSON-serialisable."""
+        snapshot = self.snapshot()
+        stages = {
+            stage: {
+                "count": count,
+                "total_seconds": round(total, 3),
+                "avg_ms": round(total / count * 1000, 2),
+                "max_ms": round(longest * 1000, 2),
+            }
+            for stage, (count, total, longest) in sorted(snapshot["spans"].items(), key=lambda item: -item[1][1])
+        }
+        counters = defaultdict(dict)
+        for (name, labels), value in sorted(snapshot["counters"].items()):
+            label_text = ",".join(f"{key}={label}" for key, label in labels) or "total"
+            counters[name][label_text] = int(value) if value == int(value) else value
+        return {"elapsed_seconds": round(time.time() - self.started_at, 3), "stages": stages, "counters": dict(counters)}
+
+    def prometheus_text(self):
+        """The current values in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {METRIC_PREFIX}_stage_seconds summary"]
+        for stage, (count, total, _) in sorted(snapshot["spans"].items()):
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {count}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_seconds_max gauge")
+        for stage, (_, _, longest) in sorted(snapshot["spans"].items()):
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_max{{stage="{stage}"}} {longest:.6f}')
+
+        typed = set()
+        for (name, labels), value in sorted(snapshot["counters"].items()):
+            if name not in typed:
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+                typed.add(name)
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+            lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def write_run_summary(run_id, shard_index=None, metrics_dir=METRICS_DIR, registry=metrics):
+    """Writes the run's spans and counters to output/metrics/<run_id>[_shard<i>].json."""
+    os.makedirs(metrics_dir, exist_ok=True)
+    suffix = "" if shard_index is None else f"_shard{shard_index}"
+    path = os.path.join(metrics_dir, f"{run_id}{suffix}.json")
+    summary = {"run_id": run_id, "written_at": datetime.now().isoformat(timespec="seconds"), **registry.summary()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    log_info(f"⏱️ Metrics summary saved to {path}")
+    return path
+
+
+def start_metrics_server(port=METRICS_PORT, registry=metrics):
+    """Serves `registry` at http://0.0.0.0:<port>/metrics from a daemon thread. Returns the server, or None when off."""
+    if not port:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log_info(f"📡 Metrics endpoint listening on :{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,218 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from core.logger import log_info
+from core.result_files import INT_COLUMNS, PRICE_COLUMNS, write_frame
+from scraper.product_record import FAILED_STATUSES, NOT_FOUND_TEXT
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OUTPUT_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.join(ROOT_DIR, "output"))
+PRICE_HISTORY_DB = os.path.join(OUTPUT_DIR, "price_history.db")
+CHANGE_REPORT_FILE = os.path.join(OUTPUT_DIR, "product_changes.xlsx")
+
+HISTORY_COLUMNS = PRICE_COLUMNS + ["stok_durumu"] + INT_COLUMNS
+# Price the up/down changes are reported on
+REPORT_PRICE_COLUMN = "kdv_haric_satis_fiyati"
+
+PRICE_UP = "fiyat artisi"
+PRICE_DOWN = "fiyat dususu"
+STOCK_OUT = "stok tukendi"
+BACK_IN_STOCK = "stoga girdi"
+NEW_PRODUCT = "yeni urun"
+REMOVED_PRODUCT = "kaldirilan urun"
+CHANGE_TYPES = (PRICE_UP, PRICE_DOWN, STOCK_OUT, BACK_IN_STOCK, NEW_PRODUCT, REMOVED_PRODUCT)
+REPORT_COLUMNS = ["stock_code", "degisiklik", "eski_fiyat", "yeni_fiyat", "fiyat_degisimi_yuzde", "eski_stok", "yeni_stok"]
+
+
+def _sql_value(value):
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+class PriceHistory:
+    """
+    Time series of every finished run's typed results, keyed by (SKU, run time).
+
+    Unlike the result store, which keeps raw rows per run for resuming, this only
+    keeps the typed price and stock columns, so two runs can be compared cheaply.
+    """
+
+    def __init__(self, path=PRICE_HISTORY_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS history_runs (
+                run_id TEXT PRIMARY KEY,
+                run_at TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS history (
+                stock_code TEXT NOT NULL,
+                run_at TEXT NOT NULL,
+                {", ".join(f"{column} {'TEXT' if column == 'stok_durumu' else 'NUMERIC'}" for column in HISTORY_COLUMNS)},
+                PRIMARY KEY (stock_code, run_at)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS history_by_run ON history (run_at);
+        """)
+        self._conn.commit()
+
+    def append_run(self, run_id, frame, run_at=None):
+        """
+        Records the typed results of `run_id` (see `to_typed_frame`). Recording a run
+        again (e.g. after a resumed export) replaces its rows.
+        """
+        columns = [column for column in HISTORY_COLUMNS if column in frame]
+        with self._lock:
+            known = self._conn.execute("SELECT run_at FROM history_runs WHERE run_id = ?", (run_id,)).fetchone()
+            run_at = known[0] if known else (run_at or datetime.now()).isoformat(timespec="seconds")
+            self._conn.execute("INSERT OR IGNORE INTO history_runs (run_id, run_at) VALUES (?, ?)", (run_id, run_at))
+            self._conn.execute("DELETE FROM history WHERE run_at = ?", (run_at,))
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO history (stock_code, run_at, {', '.join(columns)}) "
+                f"VALUES (?, ?, {', '.join('?' for _ in columns)})",
+                [
+                    (code, run_at, *(_sql_value(value) for value in values))
+                    for code, *values in frame[["stock_code"] + columns].itertuples(index=False, name=None)
+                ],
+            )
+            self._conn.commit()
+        return run_at
+
+    def runs(self):
+        """Returns [(run_id, run_at)] oldest first."""
+        with self._lock:
+            return self._conn.execute("SELECT run_id, run_at FROM history_runs ORDER BY run_at").fetchall()
+
+    def previous_run(self, run_id):
+        """The run recorded right before `run_id`, or None."""
+        run_ids = [known for known, _ in self.runs()]
+        if run_id not in run_ids or run_ids.index(run_id) == 0:
+            return None
+        return run_ids[run_ids.index(run_id) - 1]
+
+    def snapshot(self, run_id):
+        """The typed results recorded for `run_id`, one row per SKU."""
+        with self._lock:
+            frame = pd.read_sql_query(
+                f"SELECT h.stock_code, {', '.join('h.' + column for column in HISTORY_COLUMNS)} FROM history h "
+                "JOIN history_runs r ON r.run_at = h.run_at WHERE r.run_id = ?",
+                self._conn, params=(run_id,),
+            )
+        for column in PRICE_COLUMNS:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+        for column in INT_COLUMNS:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("Int64")
+        return frame
+
+    def changes_since(self, since_run_id, run_id=None):
+        """
+        What changed between `since_run_id` and `run_id` (default: the latest run),
+        as a report table (see `diff_snapshots`).
+        """
+        if run_id is None:
+            run_id = self.runs()[-1][0]
+        return diff_snapshots(self.snapshot(since_run_id), self.snapshot(run_id))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def diff_snapshots(old, new):
+    """
+    Compares two snapshots column-wise and returns one report row per change:
+    price up/down, stock-outs, restocks, new and removed products. SKUs whose scrape
+    failed in either run are left out, since their values are unknown.
+    """
+    merged = old.merge(new, on="stock_code", how="outer", suffixes=("_old", "_new"), indicator=True)
+    status_old, status_new = merged["stok_durumu_old"], merged["stok_durumu_new"]
+    known = ~(status_old.isin(FAILED_STATUSES) & (merged["_merge"] != "right_only")) & \
+            ~(status_new.isin(FAILED_STATUSES) & (merged["_merge"] != "left_only"))
+    listed_old = (merged["_merge"] != "right_only") & (status_old != NOT_FOUND_TEXT)
+    listed_new = (merged["_merge"] != "left_only") & (status_new != NOT_FOUND_TEXT)
+    both = known & listed_old & listed_new
+
+    price_old, price_new = merged[f"{REPORT_PRICE_COLUMN}_old"], merged[f"{REPORT_PRICE_COLUMN}_new"]
+    stock_old = merged["stock_amount_old"].fillna(0)
+    stock_new = merged["stock_amount_new"].fillna(0)
+    masks = {
+        PRICE_UP: both & (price_new > price_old),
+        PRICE_DOWN: both & (price_new < price_old),
+        STOCK_OUT: both & (stock_old > 0) & (stock_new == 0),
+        BACK_IN_STOCK: both & (stock_old == 0) & (stock_new > 0),
+        NEW_PRODUCT: known & ~listed_old & listed_new,
+        REMOVED_PRODUCT: known & listed_old & ~listed_new,
+    }
+
+    report = pd.concat(
+        [merged[mask.fillna(False).astype(bool)].assign(degisiklik=change) for change, mask in masks.items()],
+        ignore_index=True,
+    )
+    report = pd.DataFrame({
+        "stock_code": report["stock_code"],
+        "degisiklik": report["degisiklik"],
+        "eski_fiyat": report[f"{REPORT_PRICE_COLUMN}_old"],
+        "yeni_fiyat": report[f"{REPORT_PRICE_COLUMN}_new"],
+        "fiyat_degisimi_yuzde": ((report[f"{REPORT_PRICE_COLUMN}_new"] / report[f"{REPORT_PRICE_COLUMN}_old"] - 1) * 100).round(2),
+        "eski_stok": report["stock_amount_old"],
+        "yeni_stok": report["stock_amount_new"],
+    }, columns=REPORT_COLUMNS)
+    return report.sort_values(["degisiklik", "stock_code"], key=_change_order).reset_index(drop=True)
+
+
+def _change_order(column):
+    return column.map(CHANGE_TYPES.index) if column.name == "degisiklik" else column
+
+
+def change_summary(changes):
+    """One line for the result mail, e.g. "3 fiyat artisi, 1 stok tukendi"."""
+    counts = changes["degisiklik"].value_counts()
+    parts = [f"{counts[change]} {change}" for change in CHANGE_TYPES if counts.get(change)]
+    return ", ".join(parts) if parts else "degisiklik yok"
+
+
+def write_change_report(history, run_id, report_file=CHANGE_REPORT_FILE):
+    """
+    Writes what changed since the previous recorded run to `report_file`.
+
+    :return: (report_file, summary line), or (None, None) for the first recorded run.
+    """
+    previous = history.previous_run(run_id)
+    if previous is None:
+        return None, None
+    changes = history.changes_since(previous, run_id)
+    write_frame(changes, report_file)
+    summary = change_summary(changes)
+    log_info(f"📊 Changes since run {previous}: {summary}")
+    return report_file, summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report price and stock changes between two recorded runs.")
+    parser.add_argument("since", help="Run ID to compare against.")
+    parser.add_argument("--run-id", help="Run ID to compare (default: the latest recorded run).")
+    parser.add_argument("--output", default=CHANGE_REPORT_FILE,
+                        help="Report file, .xlsx, .csv or .parquet (default: output/product_changes.xlsx).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    history = PriceHistory()
+    try:
+        changes = history.changes_since(args.since, args.run_id)
+        write_frame(changes, args.output)
+        log_info(f"📊 {change_summary(changes)} -> {args.output}")
+    finally:
+        history.close()
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+# Tuning for the limiter shared by every hafele.com.tr request
+MAX_RPS = float(os.getenv("HAFELE_MAX_RPS", "10"))
+MIN_RPS = float(os.getenv("HAFELE_MIN_RPS", "0.5"))
+MAX_CONCURRENCY = int(os.getenv("HAFELE_MAX_CONCURRENCY", "16"))
+MIN_CONCURRENCY = int(os.getenv("HAFELE_MIN_CONCURRENCY", "1"))
+# Responses slower than this (seconds) count as a sign of an overloaded site
+TARGET_LATENCY = float(os.getenv("HAFELE_TARGET_LATENCY", "2.0"))
+
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self):
+        """Takes a token if one is available. Returns 0, or the seconds until the next token."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def set_rate(self, rate):
+        self._refill()
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class RequestSlot:
+    """Handed to the caller for one request so it can report how the request went."""
+
+    def __init__(self, waited=0.0):
+        self.started_at = time.monotonic()
+        # Seconds spent queueing for the slot
+        self.waited = waited
+        self.outcome = None
+
+    def record_status(self, status_code):
+        self.outcome = "throttled" if status_code in THROTTLE_STATUSES else "ok"
+
+    def record_timeout(self):
+        self.outcome = "throttled"
+
+
+class AdaptiveLimiter:
+    """
+    Token-bucket rate limit plus an AIMD concurrency limit.
+
+    Healthy, fast responses slowly raise both the request rate and the number of
+    requests allowed in flight. A 429/5xx or a timeout halves both immediately.
+    """
+
+    def __init__(self, max_rps=MAX_RPS, min_rps=MIN_RPS, max_concurrency=MAX_CONCURRENCY,
+                 min_concurrency=MIN_CONCURRENCY, target_latency=TARGET_LATENCY):
+        self.max_rps = max_rps
+        self.min_rps = min_rps
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+
+        self.bucket = TokenBucket(max(min_rps, max_rps / 2))
+        self.concurrency = max(min_concurrency, max_concurrency // 2)
+        self.in_flight = 0
+        self._successes = 0
+        self._completed = deque()
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+
+    def _try_acquire(self):
+        """Returns 0 when a slot and a token were taken, otherwise how long to wait."""
+        if self.in_flight >= self.concurrency:
+            return 0.05
+        wait = self.bucket.try_take()
+        if wait == 0:
+            self.in_flight += 1
+        return wait
+
+    def _release(self, slot):
+        latency = time.monotonic() - slot.started_at
+        with self._lock:
+            self.in_flight -= 1
+            self._completed.append(time.monotonic())
+            if slot.outcome == "throttled":
+                self._back_off()
+            elif slot.outcome == "ok":
+                self._on_success(latency)
+            self._slot_freed.notify_all()
+
+    def _back_off(self):
+        self._successes = 0
+        self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+        self.bucket.set_rate(max(self.min_rps, self.bucket.rate / 2))
+
+    def _on_success(self, latency):
+        if latency > self.target_latency:
+            self._successes = 0
+            self.concurrency = max(self.min_concurrency, self.concurrency - 1)
+            return
+        self._successes += 1
+        # One step up per "window" of healthy responses
+        if self._successes >= self.concurrency:
+            self._successes = 0
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.bucket.set_rate(min(self.max_rps, self.bucket.rate * 1.1))
+
+    def scale(self, share):
+        """Shrinks the limits to `share` of their value, for when several processes split one budget."""
+        with self._lock:
+            self.max_rps = max(self.min_rps, self.max_rps * share)
+            self.max_concurrency = max(self.min_concurrency, int(self.max_concurrency * share))
+            self.concurrency = min(self.concurrency, self.max_concurrency)
+            self.bucket.set_rate(min(self.bucket.rate, self.max_rps))
+
+    @contextmanager
+    def request(self):
+        """Blocks until the request may be sent; yields a RequestSlot to record the outcome on."""
+        queued_at = time.monotonic()
+        with self._lock:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    break
+                self._slot_freed.wait(wait)
+        slot = RequestSlot(time.monotonic() - queued_at)
+        try:
+            yield slot
+        finally:
+            self._release(slot)
+
+    @asynccontextmanager
+    async def request_async(self):
+        """Async version of `request`: waits with asyncio.sleep instead of blocking the loop."""
+        queued_at = time.monotonic()
+        while True:
+            with self._lock:
+                wait = self._try_acquire()
+            if wait == 0:
+                break
+            await asyncio.sleep(wait)
+        slot = RequestSlot(time.monotonic() - queued_at)
+        try:
+            yield slot
+        finally:
+            self._release(slot)
+
+    def stats(self):
+        """Current limits and the request rate observed over the last 10 seconds."""
+        with self._lock:
+            now = time.monotonic()
+            while self._completed and self._completed[0] < now - 10:
+                self._completed.popleft()
+            return {
+                "rps": round(len(self._completed) / 10, 2),
+                "rate_limit": round(self.bucket.rate, 2),
+                "concurrency": self.concurrency,
+                "in_flight": self.in_flight,
+            }
+
+
+hafele_limiter = AdaptiveLimiter()
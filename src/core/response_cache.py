@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+
+from core.logger import log_info
+from core.metrics import metrics
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OUTPUT_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.join(ROOT_DIR, "output"))
+RESPONSE_CACHE_DB = os.path.join(OUTPUT_DIR, "http_cache.db")
+
+# "0" turns the cache off: every request downloads the full page again
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE", "1") == "1"
+# Responses younger than this (seconds) are reused without asking hafele.com.tr at all,
+# e.g. when a crashed run is restarted; older ones are revalidated with a conditional request
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "3600"))
+# Compressed bodies beyond this are evicted, least recently used first
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "256"))
+# A hit only records its use time when the stored one is older than this (seconds),
+# so most reads do not take the SQLite write lock; eviction order is this coarse
+HTTP_CACHE_TOUCH_INTERVAL = float(os.getenv("HTTP_CACHE_TOUCH_INTERVAL", "300"))
+
+
+def content_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CachedResponse:
+    """A stored 200 response and the validators to revalidate it with."""
+
+    def __init__(self, url, text, etag, last_modified, body_hash, stored_at, ttl):
+        self.url = url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.stored_at = stored_at
+        self.fresh = time.time() - stored_at < ttl
+
+    def validators(self):
+        """Headers that turn the next request for this URL into a conditional one."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def as_response(self):
+        """The cached body as a 200 requests.Response, for callers of `hafele_get`."""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response._content = self.text.encode("utf-8")
+        response.encoding = "utf-8"
+        return response
+
+
+class ResponseCache:
+    """
+    On-disk cache of hafele.com.tr responses, keyed by URL.
+
+    Fresh entries (see HTTP_CACHE_TTL) are served without a request. Stale ones are
+    revalidated with If-None-Match / If-Modified-Since when the server sent an ETag or
+    Last-Modified, so an unchanged page costs a 304 instead of the full body. Next to
+    each body the cache keeps its content hash and what the scraper parsed out of
+    it, so a page that comes back byte-identical is not parsed again either.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_DB, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024,
+                 touch_interval=HTTP_CACHE_TOUCH_INTERVAL):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT NOT NULL,
+                parse_kind TEXT,
+                parsed TEXT,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_by_use ON responses (used_at);
+        """)
+        self._conn.commit()
+        self._bytes = self._total_size()
+
+    def _total_size(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url):
+        """Returns the CachedResponse for `url` (fresh or not), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, body_hash, stored_at, used_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[5] >= self.touch_interval:
+                self._conn.execute("UPDATE responses SET used_at = ? WHERE url = ?", (now, url))
+                self._conn.commit()
+        body, etag, last_modified, body_hash, stored_at, _ = row
+        text = zlib.decompress(body).decode("utf-8")
+        return CachedResponse(url, text, etag, last_modified, body_hash, stored_at, self.ttl)
+
+    def put(self, url, text, etag=None, last_modified=None):
+        """
+        Stores the decoded body of a 200 response. What was parsed from the previous
+        body is kept when the new one is identical.
+        """
+        body_hash = content_hash(text)
+        compressed = zlib.compress(text.encode("utf-8"), 1)
+        now = time.time()
+        with self._lock:
+            # Read the size being replaced in the same transaction, so an overwrite only adds the difference
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+                self._conn.execute(
+                    "INSERT INTO responses (url, body, etag, last_modified, body_hash, size, stored_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET "
+                    "body = excluded.body, etag = excluded.etag, "
+                    "last_modified = excluded.last_modified, size = excluded.size, stored_at = excluded.stored_at, "
+                    "used_at = excluded.used_at, "
+                    "parse_kind = CASE WHEN body_hash = excluded.body_hash THEN parse_kind END, "
+                    "parsed = CASE WHEN body_hash = excluded.body_hash THEN parsed END, "
+                    "body_hash = excluded.body_hash",
+                    (url, compressed, etag, last_modified, body_hash, len(compressed), now, now),
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self._bytes += len(compressed) - (previous[0] if previous else 0)
+            if self._bytes > self.max_bytes:
+                self._evict()
+        return body_hash
+
+    def refresh(self, url):
+        """Marks `url` as fresh again after the server answered 304 Not Modified."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE responses SET stored_at = ?, used_at = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+
+    def discard(self, url):
+        """Drops the entry for `url`, e.g. a 200 page the scraper could not use (a bot challenge)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            if row is not None:
+                self._bytes -= row[0]
+
+    def _evict(self):
+        # Other processes write to the same file, so recount before deciding what to drop
+        self._bytes = self._total_size()
+        target = self.max_bytes * 0.9
+        evicted = []
+        for url, size in self._conn.execute("SELECT url, size FROM responses ORDER BY used_at"):
+            if self._bytes <= target:
+                break
+            evicted.append((url,))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", evicted)
+        self._conn.commit()
+        metrics.count("http_cache_evictions_total", len(evicted))
+        log_info(f"🗄️ Evicted {len(evicted)} cached responses", cache_mb=round(self._bytes / 1024 / 1024, 1))
+
+    def parsed(self, url, text, kind, parse):
+        """
+        `parse(text)`, or the value stored for `url` when `text` has the same content
+        hash as the cached body and was already parsed as `kind`. The value must be
+        JSON-serialisable.
+        """
+        body_hash = content_hash(text)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT parse_kind, parsed FROM responses WHERE url = ? AND body_hash = ?", (url, body_hash)
+            ).fetchone()
+        if row is not None and row[0] == kind and row[1] is not None:
+            metrics.count("parse_cache_total", kind=kind, result="hit")
+            return json.loads(row[1])
+        metrics.count("parse_cache_total", kind=kind, result="miss")
+        value = parse(text)
+        if row is not None:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE responses SET parse_kind = ?, parsed = ? WHERE url = ? AND body_hash = ?",
+                    (kind, json.dumps(value, ensure_ascii=False), url, body_hash),
+                )
+                self._conn.commit()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Returns the process-wide response cache (opening it on first use), or None when HTTP_CACHE=0."""
+    global _response_cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+def parse_cached(url, text, kind, parse):
+    """`parse(text)`, skipped when `text` is the unchanged body already parsed for `url` (see `ResponseCache.parsed`)."""
+    cache = get_response_cache()
+    if cache is None:
+        return parse(text)
+    return cache.parsed(url, text, kind, parse)
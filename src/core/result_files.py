@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    DEFAULT_FORMAT = "parquet"
+except ImportError:
+    DEFAULT_FORMAT = "csv"
+
+# Primary on-disk format of the results: "parquet" (typed, compact, fast) or "csv"
+RESULT_FORMAT = os.getenv("RESULT_FORMAT", DEFAULT_FORMAT)
+
+PRICE_COLUMNS = [
+    "kdv_haric_tavsiye_edilen_perakende_fiyat",
+    "kdv_haric_net_fiyat",
+    "kdv_haric_satis_fiyati",
+]
+INT_COLUMNS = ["stock_amount", "minimum_alis_fiyati"]
+FLOAT_COLUMNS = ["veri_yasi_saat"]
+DERIVED_COLUMN = "minimum_alis_carpi_kdv_haric_satis"
+# SKU columns of the result files and of the IdeaSoft export; read as text so leading zeros survive
+SKU_COLUMNS = {"stock_code": str, "stockCode": str}
+
+
+def parse_prices(values):
+    """Turkish-formatted prices ("1.234,56") to floats; anything unparseable becomes NaN."""
+    text = pd.Series(values, dtype="object").astype("string")
+    cleaned = text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors="coerce").astype("float64")
+
+
+def to_typed_frame(rows):
+    """
+    Builds the results table with typed columns: prices as float, stock and
+    minimum quantity as nullable ints. Text such as the "not found" marker in a
+    numeric column becomes a missing value; `stok_durumu` keeps the text.
+    Derived columns are computed for the whole table at once.
+    """
+    frame = pd.DataFrame(rows)
+    # Recomputed below; rows stored before it was derived in bulk still carry it
+    frame = frame.drop(columns=[DERIVED_COLUMN], errors="ignore")
+    for column in PRICE_COLUMNS:
+        if column in frame:
+            frame[column] = parse_prices(frame[column])
+    for column in INT_COLUMNS:
+        if column in frame:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").round().astype("Int64")
+    for column in FLOAT_COLUMNS:
+        if column in frame:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+    if "kdv_haric_satis_fiyati" in frame and "minimum_alis_fiyati" in frame:
+        # Sale price of one minimum order; missing when either side is missing
+        derived = frame["kdv_haric_satis_fiyati"] * frame["minimum_alis_fiyati"].astype("float64")
+        frame.insert(frame.columns.get_loc("minimum_alis_fiyati") + 1, DERIVED_COLUMN, derived)
+    return frame
+
+
+def result_path(base_path, fmt=RESULT_FORMAT):
+    """`base_path` with the extension of `fmt`, e.g. output/product_data_results.parquet."""
+    return f"{os.path.splitext(base_path)[0]}.{fmt}"
+
+
+def write_frame(frame, path):
+    """Writes a table as Parquet, CSV or Excel, picked by the file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        frame.to_parquet(path, index=False)
+    elif extension == ".csv":
+        frame.to_csv(path, index=False)
+    elif extension == ".xlsx":
+        frame.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unsupported table format: {path}")
+    return path
+
+
+def read_frame(path):
+    """Reads a table written by `write_frame` (or any CSV / Parquet / Excel file)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        return pd.read_parquet(path)
+    if extension == ".csv":
+        return pd.read_csv(path, dtype=SKU_COLUMNS)
+    if extension in (".xlsx", ".xls"):
+        return pd.read_excel(path, dtype=SKU_COLUMNS)
+    raise ValueError(f"Unsupported table format: {path}")
+
+
+def write_excel_attachment(result_file, attachment_file):
+    """Converts the primary result file to the .xlsx sent by mail."""
+    return write_frame(read_frame(result_file), attachment_file)
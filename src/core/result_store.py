@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from scraper.product_record import FAILED_STATUSES
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OUTPUT_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.join(ROOT_DIR, "output"))
+RESULT_DB = os.path.join(OUTPUT_DIR, "scrape_results.db")
+# Codes looked up per query; older SQLite builds allow at most 999 bound parameters
+STATS_QUERY_CHUNK = 500
+
+# A SKU counts as changed between two scrapes when any of these differ
+CHANGE_FIELDS = (
+    "kdv_haric_tavsiye_edilen_perakende_fiyat",
+    "kdv_haric_net_fiyat",
+    "kdv_haric_satis_fiyati",
+    "stok_durumu",
+    "stock_amount",
+)
+
+
+def has_changed(previous, row):
+    return any(previous.get(field) != row.get(field) for field in CHANGE_FIELDS)
+
+
+class ResultStore:
+    """
+    Durable, append-as-you-go storage for scrape results.
+
+    Every finished row is committed to SQLite immediately, so a crashed run can be
+    resumed from where it stopped and the Excel export can be rebuilt at any time.
+    """
+
+    def __init__(self, path=RESULT_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                started_at TEXT NOT NULL,
+                finished_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                run_id TEXT NOT NULL,
+                stock_code TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                saved_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, stock_code)
+            );
+            CREATE TABLE IF NOT EXISTS run_shards (
+                run_id TEXT NOT NULL,
+                shard_index INTEGER NOT NULL,
+                finished_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, shard_index)
+            );
+            CREATE TABLE IF NOT EXISTS sku_stats (
+                stock_code TEXT PRIMARY KEY,
+                last_row TEXT NOT NULL,
+                last_scraped_at TEXT NOT NULL,
+                last_changed_at TEXT,
+                scrape_count INTEGER NOT NULL,
+                change_count INTEGER NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def start_run(self, run_id):
+        """Registers a run; starting an already known run ID is a no-op."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, started_at) VALUES (?, ?)",
+                (run_id, datetime.now().isoformat(timespec="seconds")),
+            )
+            self._conn.commit()
+
+    def finish_run(self, run_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                (datetime.now().isoformat(timespec="seconds"), run_id),
+            )
+            self._conn.commit()
+
+    def finish_shard(self, run_id, shard_index, shard_count):
+        """
+        Marks one shard of a sharded run as done.
+
+        The check runs in an IMMEDIATE transaction so that, with several containers
+        sharing the database, exactly one of them sees itself as the last shard.
+
+        :return: True if this call completed the run (the caller should merge and export).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                already_finished = self._conn.execute(
+                    "SELECT 1 FROM run_shards WHERE run_id = ? AND shard_index = ?", (run_id, shard_index)
+                ).fetchone()
+                finished_before = self._conn.execute(
+                    "SELECT COUNT(*) FROM run_shards WHERE run_id = ? AND shard_index < ?", (run_id, shard_count)
+                ).fetchone()[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO run_shards (run_id, shard_index, finished_at) VALUES (?, ?, ?)",
+                    (run_id, shard_index, datetime.now().isoformat(timespec="seconds")),
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return not already_finished and finished_before + 1 >= shard_count
+
+    def is_finished(self, run_id):
+        """True if `run_id` was started and has finished."""
+        with self._lock:
+            row = self._conn.execute("SELECT finished_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return row is not None and row[0] is not None
+
+    def latest_unfinished_run(self):
+        """Returns the ID of the most recently started run that never finished, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                # rowid breaks ties between runs started within the same second
+                "SELECT run_id FROM runs WHERE finished_at IS NULL ORDER BY started_at DESC, rowid DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_row(self, run_id, position, row, track_changes=True):
+        """
+        Commits one finished result row.
+
+        :param track_changes: Also fold the row into the SKU's change history (used by
+            delta runs). Off for rows carried forward from an earlier scrape.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (run_id, stock_code, position, data, saved_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, row["stock_code"], position, json.dumps(row, ensure_ascii=False), now),
+            )
+            if track_changes and row.get("stok_durumu") not in FAILED_STATUSES:
+                self._track_change(row, now)
+            self._conn.commit()
+
+    def _track_change(self, row, now):
+        previous = self._conn.execute(
+            "SELECT last_row, last_changed_at, scrape_count, change_count FROM sku_stats WHERE stock_code = ?",
+            (row["stock_code"],),
+        ).fetchone()
+        if previous is None:
+            last_changed_at, scrape_count, change_count = now, 1, 0
+        else:
+            last_row, last_changed_at, scrape_count, change_count = previous
+            scrape_count += 1
+            if has_changed(json.loads(last_row), row):
+                last_changed_at, change_count = now, change_count + 1
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sku_stats "
+            "(stock_code, last_row, last_scraped_at, last_changed_at, scrape_count, change_count) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (row["stock_code"], json.dumps(row, ensure_ascii=False), now, last_changed_at, scrape_count, change_count),
+        )
+
+    def sku_stats(self, codes):
+        """Returns {stock_code: stats dict} for the codes in `codes` that were ever scraped successfully."""
+        codes = list(dict.fromkeys(codes))
+        rows = []
+        with self._lock:
+            for start in range(0, len(codes), STATS_QUERY_CHUNK):
+                chunk = codes[start:start + STATS_QUERY_CHUNK]
+                rows += self._conn.execute(
+                    "SELECT stock_code, last_row, last_scraped_at, last_changed_at, scrape_count, change_count "
+                    f"FROM sku_stats WHERE stock_code IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+        return {
+            code: {
+                "last_row": json.loads(last_row),
+                "last_scraped_at": last_scraped_at,
+                "last_changed_at": last_changed_at,
+                "scrape_count": scrape_count,
+                "change_count": change_count,
+            }
+            for code, last_row, last_scraped_at, last_changed_at, scrape_count, change_count in rows
+        }
+
+    def completed_codes(self, run_id):
+        """Returns the set of stock codes that already have a result in `run_id`."""
+        with self._lock:
+            rows = self._conn.execute("SELECT stock_code FROM results WHERE run_id = ?", (run_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def load_rows(self, run_id):
+        """Returns {stock_code: row} for `run_id`, in input order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stock_code, data FROM results WHERE run_id = ? ORDER BY position", (run_id,)
+            ).fetchall()
+        return {code: json.loads(data) for code, data in rows}
+
+    def saved_times(self, run_id):
+        """Returns {stock_code: saved_at} for `run_id`."""
+        with self._lock:
+            rows = self._conn.execute("SELECT stock_code, saved_at FROM results WHERE run_id = ?", (run_id,)).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,33 +1,309 @@
-import time
+import asyncio
 import functools
+import heapq
+import itertools
+import os
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import requests
+
+from core.circuit_breaker import CircuitOpenError
+from core.logger import log_exception, log_warning
+from core.metrics import metrics
+from core.session_manager import AuthExpiredError
+
+# Attempts per call, including the first one
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+# After an auth failure, wait at least this long so the cookie refresh can finish
+RETRY_AUTH_DELAY = float(os.getenv("RETRY_AUTH_DELAY", "10"))
+# A run may retry at most RETRY_BUDGET_MIN calls plus this share of all calls made
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN = int(os.getenv("RETRY_BUDGET_MIN", "20"))
+
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Errors raised by the HTTP clients themselves (as opposed to bugs in the parsing code)
+REQUEST_ERRORS = (requests.exceptions.RequestException, aiohttp.ClientError, asyncio.TimeoutError)
+
+RETRY = "retry"
+REFRESH = "auth_refresh"
+FAIL = "fail"
+
+
+class HttpStatusError(requests.exceptions.RequestException):
+    """An unexpected status code; retried when it is one of RETRY_STATUSES."""
+
+    def __init__(self, status_code, url):
+        super().__init__(f"HTTP {status_code} for {url}")
+        self.status_code = status_code
+
+
+class RetryLater(Exception):
+    """
+    Raised by a task to hand its worker back: `DeferredRetryExecutor` runs it again
+    as attempt `attempt` once `delay` seconds have passed.
+    """
+
+    def __init__(self, delay, attempt, error):
+        super().__init__(f"retry #{attempt} in {delay:.2f}s after: {error}")
+        self.delay = delay
+        self.attempt = attempt
+        self.error = error
+
+
+def classify(error):
+    """RETRY for transient failures, REFRESH for expired cookies, FAIL for everything else."""
+    if isinstance(error, AuthExpiredError):
+        return REFRESH
+    if isinstance(error, CircuitOpenError):
+        # The site has been down for CIRCUIT_MAX_WAIT already; the dead-letter queue picks it up
+        return FAIL
+    if isinstance(error, HttpStatusError):
+        return RETRY if error.status_code in RETRY_STATUSES else FAIL
+    if isinstance(error, aiohttp.ClientResponseError):
+        return RETRY if error.status in RETRY_STATUSES else FAIL
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                          asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return RETRY
+    if isinstance(error, requests.exceptions.RequestException):
+        # E.g. the browser tier failing to load the page
+        return RETRY
+    return FAIL
+
+
+class RetryBudget:
+    """
+    Caps the retries of a whole run at `min_retries` plus `ratio` of the calls made,
+    so an outage turns into fast failures instead of every SKU backing off in turn.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_retries=RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.denied = 0
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def try_spend(self):
+        with self._lock:
+            if self.retries < self.min_retries + self.ratio * self.calls:
+                self.retries += 1
+                return True
+            self.denied += 1
+            first_denial = self.denied == 1
+        if first_denial:
+            log_warning("⚠️ Retry budget exhausted; failing calls are no longer retried.", **self.stats())
+        return False
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.retries = self.denied = 0
+
+    def stats(self):
+        return {"calls": self.calls, "retries": self.retries, "denied": self.denied}
+
+
+retry_budget = RetryBudget()
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed call is tried again: exponential backoff
+    with jitter, error classification and the shared per-run retry budget.
+    """
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 backoff=2, jitter=True, budget=None, auth_delay=RETRY_AUTH_DELAY):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.budget = budget or retry_budget
+        self.auth_delay = auth_delay
+
+    def delay(self, attempt):
+        """Seconds to wait before attempt `attempt + 1` (0-based `attempt` just failed)."""
+        delay = min(self.max_delay, self.base_delay * self.backoff ** attempt)
+        return delay * random.uniform(0.5, 1.0) if self.jitter else delay
+
+    def decide(self, error, attempt, stage):
+        """
+        Called after attempt `attempt` (0-based) failed with `error`.
+
+        :return: Seconds to wait before the next attempt, or None to give up.
+        """
+        kind = classify(error)
+        if kind == FAIL or attempt + 1 >= self.attempts or not self.budget.try_spend():
+            return None
+        metrics.count("retries_total", stage=stage, reason=kind)
+        delay = self.delay(attempt)
+        return max(delay, self.auth_delay) if kind == REFRESH else delay
+
+    def call(self, func, *args, stage=None, **kwargs):
+        """Runs `func` with retries, sleeping in between. For callers without a scheduler to defer to."""
+        stage = stage or func.__name__
+        for attempt in itertools.count():
+            self.budget.record_call()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self.decide(e, attempt, stage)
+                if delay is None:
+                    raise
+                log_warning(f"⚠️ {stage} failed: {e}. Retrying in {delay:.2f}s", attempt=attempt + 1)
+                time.sleep(delay)
+
+    async def call_async(self, func, *args, stage=None, **kwargs):
+        """Async `call`: the wait is an asyncio.sleep, so other tasks keep running."""
+        stage = stage or func.__name__
+        for attempt in itertools.count():
+            self.budget.record_call()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self.decide(e, attempt, stage)
+                if delay is None:
+                    raise
+                log_warning(f"⚠️ {stage} failed: {e}. Retrying in {delay:.2f}s", attempt=attempt + 1)
+                await asyncio.sleep(delay)
+
+    def defer(self, error, attempt, stage):
+        """Raises RetryLater for `DeferredRetryExecutor` when `error` is worth retrying; returns otherwise."""
+        delay = self.decide(error, attempt, stage)
+        if delay is not None:
+            log_warning(f"⚠️ {stage} failed: {error}. Retrying in {delay:.2f}s", attempt=attempt + 1)
+            raise RetryLater(delay, attempt + 1, error)
+
+
+class DeferredRetryExecutor:
+    """
+    Thread pool for `fn(arg, attempt)` tasks that may raise RetryLater. A retried
+    task goes back into the pool once its delay is over; until then its worker
+    thread runs other tasks instead of sleeping.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix=""):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=thread_name_prefix)
+        self._condition = threading.Condition()
+        self._timers = []
+        self._sequence = itertools.count()
+        self._pending = 0
+        self._closed = False
+        self._error = None
+        self._timer_thread = threading.Thread(target=self._run_timers, daemon=True)
+        self._timer_thread.start()
+
+    def submit(self, fn, arg, callback, on_error=None):
+        """
+        Runs `fn(arg, attempt)` until it does not raise RetryLater, then calls `callback(result)` in the worker.
+        If `fn` raises anything else, `callback(on_error(arg, error))` is called instead; without `on_error`
+        (or if the callback itself raises) the first such error is re-raised by `shutdown()`.
+        """
+        with self._condition:
+            self._pending += 1
+        self._executor.submit(self._run, fn, arg, 0, callback, on_error)
+
+    def _run(self, fn, arg, attempt, callback, on_error):
+        finished = True
+        try:
+            try:
+                result = fn(arg, attempt)
+            except RetryLater:
+                raise
+            except Exception as e:
+                if on_error is None:
+                    raise
+                log_exception(f"❌ Task for {arg} failed: {e}")
+                result = on_error(arg, e)
+            callback(result)
+        except RetryLater as retry:
+            finished = False
+            with self._condition:
+                heapq.heappush(self._timers, (time.monotonic() + retry.delay, next(self._sequence),
+                                              (fn, arg, retry.attempt, callback, on_error)))
+                self._condition.notify_all()
+        except Exception as e:
+            log_exception(f"❌ Task for {arg} failed: {e}")
+            with self._condition:
+                if self._error is None:
+                    self._error = e
+        finally:
+            if finished:
+                with self._condition:
+                    self._pending -= 1
+                    self._condition.notify_all()
+
+    def _run_timers(self):
+        with self._condition:
+            while not self._closed:
+                if not self._timers:
+                    self._condition.wait()
+                    continue
+                wait = self._timers[0][0] - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                _, _, task = heapq.heappop(self._timers)
+                self._executor.submit(self._run, *task)
+
+    def wait(self):
+        """Blocks until every submitted task (including its retries) has finished."""
+        with self._condition:
+            while self._pending:
+                self._condition.wait()
+
+    def shutdown(self):
+        """Waits for every task, stops the pool and re-raises the first error no `on_error` handled."""
+        self.wait()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._timer_thread.join()
+        self._executor.shutdown()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
 
 
 def retry_on_exception(max_retries=3, base_delay=1, max_delay=10, backoff=2, jitter=True):
     """
-    Retry decorator with exponential backoff.
+    Retry decorator with exponential backoff, for sync and async functions.
+    Only errors `classify` considers transient are retried.
 
-    :param max_retries: Number of retries before failing.
+    :param max_retries: Number of attempts before failing.
     :param base_delay: Initial wait time.
     :param max_delay: Maximum wait time.
     :param backoff: Multiplier for exponential delay.
-    :param jitter: If True, adds random jitter to delay.
+    :param jitter: If True, randomises each delay between half and all of it.
     :return: Wrapped function with retry behavior.
     """
+    policy = RetryPolicy(max_retries, base_delay, max_delay, backoff, jitter)
+
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await policy.call_async(func, *args, **kwargs)
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            delay = base_delay
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        raise
-                    sleep_time = delay + random.uniform(0, 1) if jitter else delay
-                    sleep_time = min(sleep_time, max_delay)
-                    print(f"⚠️ Retry {attempt + 1}/{max_retries} after error: {e}. Retrying in {sleep_time:.2f}s")
-                    time.sleep(sleep_time)
-                    delay *= backoff
+            return policy.call(func, *args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
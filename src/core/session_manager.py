@@ -1,10 +1,204 @@
 import os
 import pickle
+import threading
+import time
+import requests
+from core.circuit_breaker import hafele_breaker
+from core.fetcher import build_cookie_jar, create_session_from_cookies
+from core.logger import log_warning
+from core.metrics import endpoint_label, metrics
+from core.rate_limiter import hafele_limiter
+from core.response_cache import get_response_cache
 from hafele_login.handle_login import handle_login
 
 # Absolute path to cookies.pkl relative to project root
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 COOKIE_PATH = os.path.join(PROJECT_ROOT, "shared", "cookies.pkl")
+
+# Connection pool tuning for the per-worker HTTP sessions
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+
+# Refresh this many seconds before the earliest session cookie expires
+COOKIE_REFRESH_MARGIN = int(os.getenv("COOKIE_REFRESH_MARGIN", "120"))
+# Upper bound between refreshes when no cookie carries an expiry
+COOKIE_MAX_AGE = int(os.getenv("COOKIE_MAX_AGE", "3600"))
+# Lower bound between refreshes, so a burst of auth failures cannot cause a login loop
+COOKIE_MIN_REFRESH_INTERVAL = int(os.getenv("COOKIE_MIN_REFRESH_INTERVAL", "60"))
+# Cookies issued with a shorter lifetime (seconds) than this are analytics/tracking
+# cookies, not the session, and do not decide when to log in again
+COOKIE_MIN_LIFETIME = int(os.getenv("COOKIE_MIN_LIFETIME", "300"))
+
+
+class AuthExpiredError(requests.exceptions.RequestException):
+    """Raised when hafele.com.tr rejects the session (401/403 or a redirect to the login page)."""
+
+
+class CookieState:
+    """
+    Double-buffered cookie holder.
+
+    Readers take `snapshot()` without locking. A refresh builds the new cookie list
+    on the side (a full Selenium login) and publishes it with `swap()`, so requests
+    keep using the old cookies until the new ones are ready.
+    """
+
+    def __init__(self):
+        self._cookies = None
+        self._loaded_at = 0.0
+        self._swap_lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._refresh_reason = None
+        self._refresh_listeners = []
+
+    def snapshot(self):
+        return self._cookies
+
+    def swap(self, cookies, loaded_at=None):
+        """Publishes a new cookie list. `loaded_at` defaults to now (pass a file's mtime for saved cookies)."""
+        with self._swap_lock:
+            self._cookies = cookies
+            self._loaded_at = loaded_at or time.time()
+            self._refresh_requested.clear()
+            self._refresh_reason = None
+
+    def request_refresh(self, reason):
+        """Asks the refresh thread to log in again now (e.g. after an auth failure)."""
+        if not self._refresh_requested.is_set():
+            self._refresh_reason = reason
+            self._refresh_requested.set()
+            log_warning(f"🔐 Cookie refresh requested: {reason}")
+            for listener in self._refresh_listeners:
+                listener(reason)
+
+    def add_refresh_listener(self, listener):
+        """Calls `listener(reason)` whenever a refresh is requested (used by processes without a refresh thread)."""
+        self._refresh_listeners.append(listener)
+
+    def seconds_until_refresh(self):
+        """
+        Time left until the earliest session cookie expiry (minus a margin), or until
+        COOKIE_MAX_AGE. Cookies that lived less than COOKIE_MIN_LIFETIME are ignored.
+        """
+        due_at = self._loaded_at + COOKIE_MAX_AGE
+        expiries = [
+            cookie["expiry"] for cookie in self._cookies or []
+            if isinstance(cookie, dict) and cookie.get("expiry")
+            and cookie["expiry"] - self._loaded_at >= COOKIE_MIN_LIFETIME
+        ]
+        if expiries:
+            due_at = min(due_at, min(expiries) - COOKIE_REFRESH_MARGIN)
+        return max(0.0, due_at - time.time())
+
+    def wait_until_refresh_due(self):
+        """
+        Blocks until the cookies are about to expire or a refresh was requested.
+
+        :return: The reason the refresh is due.
+        """
+        self._refresh_requested.wait(self.seconds_until_refresh())
+        elapsed = time.time() - self._loaded_at
+        if elapsed < COOKIE_MIN_REFRESH_INTERVAL:
+            time.sleep(COOKIE_MIN_REFRESH_INTERVAL - elapsed)
+        return self._refresh_reason or "cookie expiry"
+
+
+cookie_state = CookieState()
+
+
+def is_auth_failure(status_code, url, redirected):
+    """A 401/403, or being redirected to a login page, means the cookies are no longer valid."""
+    return status_code in (401, 403) or (redirected and "login" in str(url).lower())
+
+
+_local = threading.local()
+_sessions = []
+_sessions_lock = threading.Lock()
+# Bumped by close_http_sessions; a thread whose session is from an older generation opens a new one
+_session_generation = 0
+
+
+def get_http_session(cookies) -> requests.Session:
+    """
+    Returns the calling worker thread's pooled session.
+
+    Each thread keeps one session for its whole life so keep-alive connections are
+    reused across requests. When `cookies` is a different snapshot than the one the
+    session was built with, a fresh cookie jar is swapped in as a single assignment.
+
+    :param cookies: Selenium cookie list (or name -> value dict) to send.
+    :return: requests.Session ready to call hafele.com.tr.
+    """
+    session = getattr(_local, "session", None)
+    if session is None or _local.generation != _session_generation:
+        session = create_session_from_cookies(cookies, POOL_CONNECTIONS, POOL_MAXSIZE)
+        _local.session = session
+        _local.cookie_source = cookies
+        with _sessions_lock:
+            _local.generation = _session_generation
+            _sessions.append(session)
+    elif _local.cookie_source is not cookies:
+        session.cookies = build_cookie_jar(cookies)
+        _local.cookie_source = cookies
+    return session
+
+
+def hafele_get(url, cookies, timeout=60) -> requests.Response:
+    """
+    GETs a hafele.com.tr URL with the worker's pooled session, going through the
+    circuit breaker and the shared adaptive rate limiter and reporting the outcome back to both.
+
+    Fresh cached pages are returned without a request and stale ones are revalidated
+    with a conditional request (see `core.response_cache`).
+    """
+    session = get_http_session(cookies)
+    endpoint = endpoint_label(url)
+    cache = get_response_cache()
+    cached = cache.get(url) if cache is not None else None
+    if cached is not None and cached.fresh:
+        metrics.count("http_cache_total", endpoint=endpoint, result="hit")
+        return cached.as_response()
+
+    with hafele_breaker.request() as call, hafele_limiter.request() as slot:
+        metrics.observe("rate_limit_wait", slot.waited)
+        try:
+            with metrics.span("http_request"):
+                response = session.get(url, timeout=timeout, headers=cached.validators() if cached is not None else None)
+        except requests.exceptions.Timeout:
+            slot.record_timeout()
+            metrics.count("http_timeouts_total", endpoint=endpoint)
+            raise
+        slot.record_status(response.status_code)
+        call.record_status(response.status_code)
+    metrics.count("http_requests_total", endpoint=endpoint, status=response.status_code)
+    metrics.count("http_response_bytes_total", len(response.content), endpoint=endpoint)
+
+    if is_auth_failure(response.status_code, response.url, bool(response.history)):
+        cookie_state.request_refresh(f"HTTP {response.status_code} for {url}")
+        raise AuthExpiredError(f"Session rejected with status {response.status_code} for {url}")
+    if response.status_code == 304 and cached is not None:
+        cache.refresh(url)
+        metrics.count("http_cache_total", endpoint=endpoint, result="not_modified")
+        return cached.as_response()
+    if response.status_code == 200 and cache is not None:
+        cache.put(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        metrics.count("http_cache_total", endpoint=endpoint, result="miss")
+    return response
+
+
+def close_http_sessions():
+    """
+    Closes every pooled session created so far (call once the run is over). Threads
+    that outlive the run open a new, tracked session on their next request.
+    """
+    global _session_generation
+    with _sessions_lock:
+        _session_generation += 1
+        for session in _sessions:
+            session.close()
+        _sessions.clear()
+
+
 def get_cookies(force_refresh: bool = False) -> list:
     """
     Load cookies from file or refresh them via login.
@@ -17,7 +211,7 @@ def get_cookies(force_refresh: bool = False) -> list:
             with open(COOKIE_PATH, "rb") as f:
                 return pickle.load(f)
         except Exception as e:
-            print(f"⚠️ Failed to load cookies, refreshing... ({e})")
+            log_warning(f"⚠️ Failed to load cookies, refreshing... ({e})")
 
     # Refresh cookies by logging in via Selenium
     driver = handle_login()
@@ -0,0 +1,32 @@
+import os
+import zlib
+
+# Split the SKU list across this many containers; each container scrapes shard SCRAPER_SHARD_INDEX
+SHARD_COUNT = int(os.getenv("SCRAPER_SHARD_COUNT", "1"))
+SHARD_INDEX = int(os.getenv("SCRAPER_SHARD_INDEX", "0"))
+# Worker processes started by a single container (each with its own thread pool)
+PROCESS_COUNT = int(os.getenv("SCRAPER_PROCESSES", "1"))
+
+
+def shard_of(code, shard_count):
+    """
+    Deterministic shard number for a SKU.
+
+    crc32 is stable across processes and Python versions (unlike hash()), so every
+    container computes the same split of the SKU list without coordination.
+    """
+    return zlib.crc32(str(code).encode("utf-8")) % shard_count
+
+
+def shard_codes(codes, shard_count, shard_index):
+    """Returns the codes belonging to `shard_index`, keeping their input order."""
+    if shard_count <= 1:
+        return list(codes)
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index {shard_index} is out of range for {shard_count} shards")
+    return [code for code in codes if shard_of(code, shard_count) == shard_index]
+
+
+def split_into_shards(codes, shard_count):
+    """Splits codes into `shard_count` lists (some may be empty)."""
+    return [shard_codes(codes, shard_count, i) for i in range(shard_count)]
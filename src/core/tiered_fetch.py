@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from selenium.common.exceptions import WebDriverException
+
+from core.fetcher import fetch_product_page_selenium
+from core.logger import log_info
+from core.response_cache import get_response_cache
+from core.session_manager import hafele_get
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OUTPUT_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.join(ROOT_DIR, "output"))
+FETCH_TIER_DB = os.path.join(OUTPUT_DIR, "fetch_tiers.db")
+
+HTTP_TIER = "http"
+BROWSER_TIER = "browser"
+
+# SKUs remembered as browser-only are tried over plain HTTP again after this many days
+FETCH_TIER_RECHECK_DAYS = float(os.getenv("FETCH_TIER_RECHECK_DAYS", "7"))
+
+# Text found on bot-protection interstitials instead of the real page
+CHALLENGE_MARKERS = (
+    "challenge-platform",
+    "cf-browser-verification",
+    "g-recaptcha",
+    "h-captcha",
+    "just a moment...",
+)
+PRICE_BLOCK_MISSING = "#productPriceInformation missing"
+
+
+class BrowserFetchError(requests.exceptions.RequestException):
+    """Raised when the browser tier could not load the page either."""
+
+
+class PageFetch:
+    """The body of a product page and the tier it came from."""
+
+    def __init__(self, status_code, text, tier, escalation_reason=None):
+        self.status_code = status_code
+        self.text = text
+        self.tier = tier
+        # Set when the HTTP response showed the page needs a real browser
+        self.escalation_reason = escalation_reason
+
+    @property
+    def needs_browser(self):
+        return self.escalation_reason is not None
+
+
+def browser_reason(status_code, html):
+    """
+    Returns why a plain HTTP response is not usable without a browser, or None if it
+    looks fine. The price block is checked later, on the parsed page (see `check_price_block`).
+    """
+    if status_code != 200:
+        return None
+    lowered = html.lower()
+    if any(marker in lowered for marker in CHALLENGE_MARKERS):
+        return "bot challenge"
+    return None
+
+
+def check_price_block(page, summary):
+    """
+    Flags an HTTP page for the browser when its parsed summary (see
+    `summarize_product_page`) has no price block, so the page is only parsed once.
+    """
+    if page.tier == HTTP_TIER and not page.needs_browser and not summary.get("price_block", True):
+        page.escalation_reason = PRICE_BLOCK_MISSING
+    return page.needs_browser
+
+
+class FetchTierMemory:
+    """
+    Remembers per SKU which tier last produced a usable page, so the next run
+    sends browser-only SKUs straight to the browser. SKUs that never needed a
+    browser are not stored at all: HTTP is the default. Browser entries older than
+    `recheck_days` get one HTTP attempt again in case the site stopped requiring it.
+    """
+
+    def __init__(self, path=FETCH_TIER_DB, recheck_days=FETCH_TIER_RECHECK_DAYS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.recheck = recheck_days * 24 * 60 * 60
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fetch_tiers (
+                stock_code TEXT PRIMARY KEY,
+                tier TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, code):
+        """Returns (tier, fresh) for `code`, or (None, False) if it was never stored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tier, updated_at FROM fetch_tiers WHERE stock_code = ?", (code,)
+            ).fetchone()
+        if row is None:
+            return None, False
+        return row[0], time.time() - row[1] <= self.recheck
+
+    def put(self, code, tier):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fetch_tiers (stock_code, tier, updated_at) VALUES (?, ?, ?)",
+                (code, tier, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_fetch_tier_memory = None
+_fetch_tier_memory_lock = threading.Lock()
+
+
+def get_fetch_tier_memory():
+    """Returns the process-wide tier memory, opening the database on first use."""
+    global _fetch_tier_memory
+    with _fetch_tier_memory_lock:
+        if _fetch_tier_memory is None:
+            _fetch_tier_memory = FetchTierMemory()
+        return _fetch_tier_memory
+
+
+def fetch_over_http(url, cookies):
+    """
+    Cheap tier: a pooled requests GET. A bot challenge comes back with
+    `escalation_reason` set. A rejected session raises
+    AuthExpiredError: the cookies need refreshing, which a browser would not fix.
+    """
+    response = hafele_get(url, cookies)
+    return PageFetch(response.status_code, response.text, HTTP_TIER, browser_reason(response.status_code, response.text))
+
+
+def fetch_with_browser(url, cookies):
+    """Expensive tier: loads the page in a pooled Selenium session."""
+    try:
+        html = fetch_product_page_selenium(url, cookies)
+    except WebDriverException as e:
+        raise BrowserFetchError(f"Browser could not load {url}: {e}")
+    return PageFetch(200, html, BROWSER_TIER)
+
+
+def fetch_product_page(url, code, cookies):
+    """
+    Starts at the tier remembered for `code`. HTTP pages that turn out to need a
+    browser are returned unescalated (see `PageFetch.needs_browser`) so the caller
+    can rule out products that do not exist before paying for a browser session.
+    """
+    memory = get_fetch_tier_memory()
+    tier, fresh = memory.get(code)
+    if tier == BROWSER_TIER and fresh:
+        # Not stored again: the entry keeps its age, so HTTP is rechecked once it goes stale
+        return fetch_with_browser(url, cookies)
+
+    page = fetch_over_http(url, cookies)
+    if tier == BROWSER_TIER and page.status_code == 200 and not page.needs_browser:
+        memory.put(code, HTTP_TIER)
+    return page
+
+
+def escalate_to_browser(page, url, code, cookies):
+    """
+    Re-fetches a page that plain HTTP could not serve and remembers that `code` needs
+    the browser. The unusable HTTP response is dropped from the response cache, so a
+    later attempt asks the site again instead of replaying it as a fresh hit.
+    """
+    log_info(f"🧭 Escalating to the browser ({page.escalation_reason})", sku=code)
+    cache = get_response_cache()
+    if cache is not None:
+        cache.discard(url)
+    page = fetch_with_browser(url, cookies)
+    get_fetch_tier_memory().put(code, BROWSER_TIER)
+    return page
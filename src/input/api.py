@@ -1,82 +1,333 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
 import requests
+from requests.adapters import HTTPAdapter
 from token_manager import get_access_token
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from token_manager import refresh_access_token
 
+# src dizinini path'e ekle (core.rate_limiter ve sku_queue'nun kullandığı core.logger için)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
-def get_total_pages(brand_id, access_token):
-    url = "https://evan.myideasoft.com/admin-api/products"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    params = {"brand": brand_id, "limit": 100, "page": 1}
+from sku_queue import SkuQueue
+from sku_index import SkuIndex
+from core.logger import log_warning
+from core.rate_limiter import AdaptiveLimiter
 
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code != 200:
-        print(f"❌ Hata: {response.status_code}, {response.text}")
-        return 0
+PRODUCTS_URL = os.getenv("IDEASOFT_PRODUCTS_URL", "https://evan.myideasoft.com/admin-api/products")
+PAGE_SIZE = 100
+# Scraper'ın okuduğu SKU listesi (bu dosyanın yanında, docker volume'ü ile paylaşılır)
+CODES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "product_codes.csv")
+# Virgülle ayrılmış marka ID'leri, tek seferde hepsi aktarılır
+BRAND_IDS = [int(brand_id) for brand_id in os.getenv("IDEASOFT_BRAND_IDS", "38").split(",") if brand_id.strip()]
 
+# IdeaSoft'a paralel istek sayısı ve saniyedeki istek sınırı
+IDEASOFT_WORKERS = int(os.getenv("IDEASOFT_WORKERS", "8"))
+IDEASOFT_MAX_RPS = float(os.getenv("IDEASOFT_MAX_RPS", "5"))
+# Bir sayfa için deneme sayısı (429 / 5xx / bağlantı hataları)
+IDEASOFT_RETRIES = int(os.getenv("IDEASOFT_RETRIES", "5"))
+# Başarısız sayfalar için ikinci tur öncesi bekleme (saniye)
+REFETCH_DELAY = float(os.getenv("IDEASOFT_REFETCH_DELAY", "10"))
+REQUEST_TIMEOUT = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# "incremental": yerel SKU indeksini yalnızca değişen ürünlerle güncelle, "full": her seferinde tüm katalog
+SYNC_MODE = os.getenv("IDEASOFT_SYNC_MODE", "incremental")
+# Güncellenme tarihi filtresinin sorgu parametresi ve tarih biçimi
+UPDATED_SINCE_PARAM = os.getenv("IDEASOFT_UPDATED_SINCE_PARAM", "updatedAtStart")
+UPDATED_SINCE_FORMAT = os.getenv("IDEASOFT_UPDATED_SINCE_FORMAT", "%Y-%m-%d %H:%M:%S")
+# Silinen ürünleri bulmak için bu kadar günde bir tam senkronizasyon yapılır
+FULL_SYNC_DAYS = float(os.getenv("IDEASOFT_FULL_SYNC_DAYS", "7"))
+SYNC_OVERLAP_MINUTES = 10
+
+# 429 / 5xx gördükçe hızı yarıya indirir, sorunsuz yanıtlarda yavaşça artırır
+ideasoft_limiter = AdaptiveLimiter(max_rps=IDEASOFT_MAX_RPS, min_rps=0.2, max_concurrency=IDEASOFT_WORKERS,
+                                   target_latency=10.0)
+
+
+class IdeaSoftExportError(Exception):
+    """Aktarım eksik kaldığında (bazı sayfalar hiç alınamadığında) fırlatılır."""
+
+
+class IdeaSoftClient:
+    """
+    IdeaSoft admin API için havuzlu (keep-alive) oturum.
+    İstekler ortak hız sınırlayıcıdan geçer; 429'da Retry-After başlığına uyulur,
+    401'de access token yenilenir (başarılı bir yanıt gelene kadar yalnızca bir kez).
+    """
+
+    def __init__(self, access_token, workers=IDEASOFT_WORKERS, limiter=None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {access_token}"
+        self.limiter = limiter or ideasoft_limiter
+        # Yenilenen token da 401 alırsa tekrar yenilenmez; başarılı bir yanıt bayrağı sıfırlar
+        self._token_refreshed = False
+        self._token_lock = threading.Lock()
+
+    def get_products(self, brand_id, page, retries=IDEASOFT_RETRIES, filters=None):
+        """Bir ürün sayfasını getirir; geçici hatalarda tekrar dener. Başarısız olursa hata fırlatır."""
+        params = {"brand": brand_id, "limit": PAGE_SIZE, "page": page, **(filters or {})}
+        last_error = None
+        for attempt in range(retries):
+            wait = 2 ** attempt
+            try:
+                sent_authorization = self.session.headers["Authorization"]
+                with self.limiter.request() as slot:
+                    try:
+                        response = self.session.get(PRODUCTS_URL, params=params, timeout=REQUEST_TIMEOUT)
+                    except requests.exceptions.Timeout:
+                        slot.record_timeout()
+                        raise
+                    slot.record_status(response.status_code)
+
+                if response.status_code == 200:
+                    self._token_refreshed = False
+                    return response
+                if response.status_code == 401 and self._refresh_token(sent_authorization):
+                    continue
+                if response.status_code not in RETRY_STATUSES:
+                    raise IdeaSoftExportError(f"Sayfa {page}: {response.status_code}, {response.text[:200]}")
+                wait = retry_after_seconds(response, wait)
+                last_error = f"HTTP {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                last_error = str(e)
+
+            print(f"⏳ Sayfa {page} (marka {brand_id}) tekrar denenecek ({last_error}), {wait}s bekleniyor...")
+            time.sleep(wait)
+
+        raise IdeaSoftExportError(f"Sayfa {page} (marka {brand_id}) {retries} denemede alınamadı: {last_error}")
+
+    def _refresh_token(self, sent_authorization):
+        """
+        401 sonrası token'ı yeniler. Başka bir thread token'ı zaten yenilediyse yalnızca
+        tekrar denenir. Yenilenmiş token da reddedildiyse False döner.
+        """
+        with self._token_lock:
+            if self.session.headers["Authorization"] != sent_authorization:
+                return True
+            if self._token_refreshed:
+                return False
+            self._token_refreshed = True
+            print("🔁 IdeaSoft 401 döndü, access token yenileniyor...")
+            new_token = refresh_access_token()
+            if not new_token:
+                return False
+            self.session.headers["Authorization"] = f"Bearer {new_token}"
+            return True
+
+    def close(self):
+        self.session.close()
+
+
+def retry_after_seconds(response, default):
+    """Retry-After başlığındaki süreyi (saniye) döndürür, yoksa `default`."""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", default)))
+    except ValueError:
+        return default
+
+
+def parse_total_count(response):
     total_count = response.headers.get("total_count")
     if total_count is None:
-        print("❌ 'total_count' başlığı bulunamadı.")
-        return 0
-
+        raise IdeaSoftExportError("'total_count' başlığı bulunamadı.")
     try:
-        total_count = int(total_count)
-        total_pages = (total_count // 100) + (1 if total_count % 100 else 0)
-        return total_pages
+        return int(total_count)
     except ValueError:
-        print("❌ 'total_count' değeri sayıya çevrilemedi:", total_count)
-        return 0
+        raise IdeaSoftExportError(f"'total_count' değeri sayıya çevrilemedi: {total_count}")
 
 
-def fetch_page(brand_id, page, access_token):
-    url = "https://evan.myideasoft.com/admin-api/products"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    params = {"brand": brand_id, "limit": 100, "page": page}
+def page_count(total_count):
+    return (total_count // PAGE_SIZE) + (1 if total_count % PAGE_SIZE else 0)
 
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code != 200:
-        print(f"❌ Hata (sayfa {page}): {response.status_code}, {response.text}")
-        return []
 
-    data = response.json()
-    skus = [item["sku"] for item in data if "sku" in item]
-    print(f"📦 Sayfa {page} yüklendi. Ürün Sayısı: {len(skus)}")
-    return skus
+def extract_items(response):
+    """SKU'su olan ürün kayıtlarını döndürür."""
+    return [item for item in response.json() if "sku" in item]
+
+
+def fetch_pages(client, tasks, workers=IDEASOFT_WORKERS, on_page=None, filters=None):
+    """
+    (marka, sayfa) listesini paralel çeker.
+
+    :return: ({(marka, sayfa): ürünler}, [başarısız (marka, sayfa)])
+    """
+    fetched = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        future_to_task = {
+            executor.submit(client.get_products, brand_id, page, filters=filters): (brand_id, page)
+            for brand_id, page in tasks
+        }
+        for future in as_completed(future_to_task):
+            brand_id, page = future_to_task[future]
+            try:
+                items = extract_items(future.result())
+            except Exception as e:
+                print(f"⚠️ Hata (marka {brand_id}, sayfa {page}): {e}")
+                failed.append((brand_id, page))
+                continue
+            fetched[(brand_id, page)] = items
+            print(f"📦 Marka {brand_id} sayfa {page} yüklendi. Ürün Sayısı: {len(items)}")
+            if on_page:
+                on_page(brand_id, page, items)
+    return fetched, sorted(failed)
+
+
+def fetch_catalogue(client, brand_ids, filters=None, on_page=None, workers=IDEASOFT_WORKERS,
+                    refetch_delay=REFETCH_DELAY, on_incomplete=None):
+    """
+    Markaların tüm sayfalarını çeker. Başarısız sayfalar bir kez daha çekilir;
+    yine alınamayan sayfa kalırsa IdeaSoftExportError fırlatılır.
+
+    :param filters: Ek sorgu parametreleri (ör. güncellenme tarihi filtresi).
+    :param on_page: İsteğe bağlı callback(position, skus); her sayfa geldiği anda çağrılır.
+    :param on_incomplete: İsteğe bağlı callback(brand_id, total_count, received); total_count'tan
+        az ürün gelen markalar için çağrılır (aktarım eksik kalmış olabilir).
+    :return: {marka: ürün kayıtları (sayfa sırasıyla)}
+    """
+    # İlk sayfa hem toplam ürün sayısını hem de ilk ürünleri verir
+    totals = {}
+    fetched = {}
+    offsets = {}
+    offset = 0
+    for brand_id in brand_ids:
+        first_page = client.get_products(brand_id, 1, filters=filters)
+        totals[brand_id] = parse_total_count(first_page)
+        fetched[(brand_id, 1)] = extract_items(first_page)
+        offsets[brand_id] = offset
+        offset += page_count(totals[brand_id]) * PAGE_SIZE
+        print(f"🔢 Marka {brand_id}: {totals[brand_id]} ürün, {page_count(totals[brand_id])} sayfa.")
+
+    def report(brand_id, page, items):
+        if on_page:
+            on_page(offsets[brand_id] + (page - 1) * PAGE_SIZE, [item["sku"] for item in items])
+
+    for brand_id in brand_ids:
+        report(brand_id, 1, fetched[(brand_id, 1)])
+
+    tasks = [(brand_id, page) for brand_id in brand_ids for page in range(2, page_count(totals[brand_id]) + 1)]
+    pages, failed = fetch_pages(client, tasks, workers, report, filters)
+    fetched.update(pages)
+
+    if failed:
+        print(f"🔁 {len(failed)} sayfa alınamadı, {refetch_delay}s sonra tekrar denenecek...")
+        time.sleep(refetch_delay)
+        pages, failed = fetch_pages(client, failed, 1, report, filters)
+        fetched.update(pages)
+    if failed:
+        raise IdeaSoftExportError(f"{len(failed)} sayfa alınamadı: {failed}")
 
-def get_all_products(brand_id):
-    """Belirtilen marka ID'ye göre tüm ürünleri getirir (multithreaded sayfalandırma ile)."""
+    catalogue = {}
+    for brand_id in brand_ids:
+        catalogue[brand_id] = [
+            item for page in range(1, page_count(totals[brand_id]) + 1) for item in fetched[(brand_id, page)]
+        ]
+        received = len({item["sku"] for item in catalogue[brand_id]})
+        if received < totals[brand_id]:
+            # Aktarım sırasında silinen ürünler sayfaları kaydırıp başka ürünleri atlatmış olabilir
+            log_warning(f"⚠️ Marka {brand_id}: total_count {totals[brand_id]}, alınan ürün {received}; aktarım eksik.",
+                        brand=brand_id, total_count=totals[brand_id], received=received)
+            if on_incomplete:
+                on_incomplete(brand_id, totals[brand_id], received)
+    return catalogue
+
+
+def open_client(workers=IDEASOFT_WORKERS):
     access_token = get_access_token()
     if not access_token:
         print("❌ API çağrısı yapılamadı: Geçerli access token bulunamadı.")
         return None
+    return IdeaSoftClient(access_token, workers)
 
-    total_pages = get_total_pages(brand_id, access_token)
-    if total_pages == 0:
-        return []
 
-    all_skus = []
-    with ThreadPoolExecutor(max_workers=50) as executor:
-        future_to_page = {
-            executor.submit(fetch_page, brand_id, page, access_token): page
-            for page in range(1, total_pages + 1)
-        }
+def get_all_products(brand_ids, on_page=None, client=None, workers=IDEASOFT_WORKERS, refetch_delay=REFETCH_DELAY,
+                     on_incomplete=None):
+    """
+    Belirtilen marka ID('ler)ine göre tüm ürünleri getirir (multithreaded sayfalandırma ile).
+    SKU'lar marka ve sayfa sırasıyla, tekrarsız döner.
 
-        for future in as_completed(future_to_page):
-            page = future_to_page[future]
-            try:
-                skus = future.result()
-                all_skus.extend(skus)
-            except Exception as e:
-                print(f"⚠️ Hata (sayfa {page}): {e}")
+    :param brand_ids: Tek marka ID'si ya da ID listesi.
+    :param on_page: İsteğe bağlı callback(position, skus); her sayfa geldiği anda, SKU'ların
+        listedeki başlangıç sırasıyla çağrılır (SKU kuyruğuna yazmak için).
+    :param on_incomplete: Bkz. `fetch_catalogue`.
+    """
+    if isinstance(brand_ids, int):
+        brand_ids = [brand_ids]
+
+    own_client = client is None
+    if own_client:
+        client = open_client(workers)
+        if client is None:
+            return None
+
+    try:
+        catalogue = fetch_catalogue(client, brand_ids, None, on_page, workers, refetch_delay, on_incomplete)
+    finally:
+        if own_client:
+            client.close()
+
+    all_skus = []
+    seen = set()
+    for brand_id in brand_ids:
+        for item in catalogue[brand_id]:
+            if item["sku"] not in seen:
+                seen.add(item["sku"])
+                all_skus.append(item["sku"])
 
     print(f"✅ Tüm ürünler çekildi. Toplam SKU: {len(all_skus)}")
     return all_skus
 
-def write_to_excel(skus, file_name="product_codes.xlsx"):
-    """SKU bilgilerini Excel dosyasına kaydeder."""
+
+def sync_sku_index(brand_ids, index, client, full=False, now=None, on_incomplete=None):
+    """
+    SKU indeksini günceller. Normalde yalnızca son senkronizasyondan (watermark) beri
+    değişen ürünler istenir; ilk çalıştırmada, IDEASOFT_FULL_SYNC_DAYS dolduğunda ya da
+    `full` ile tüm katalog çekilir ve artık listelenmeyen SKU'lar silinmiş sayılır.
+    Eksik kalan tam senkronizasyonda hiçbir SKU silinmez ve bir sonraki çalıştırma yine tam yapılır.
+
+    :return: İndeksteki aktif SKU'lar.
+    """
+    for brand_id in brand_ids:
+        started = now or datetime.now()
+        watermark, last_full_sync = index.sync_state(brand_id)
+        full_due = full or watermark is None or last_full_sync is None or \
+            started - last_full_sync >= timedelta(days=FULL_SYNC_DAYS)
+
+        filters = None if full_due else {UPDATED_SINCE_PARAM: watermark.strftime(UPDATED_SINCE_FORMAT)}
+        print(f"🔄 Marka {brand_id}: {'tam' if full_due else 'artımlı'} senkronizasyon"
+              f"{'' if full_due else f' ({watermark} sonrası değişenler)'}...")
+        incomplete = []
+
+        def record_incomplete(*details):
+            incomplete.append(details)
+            if on_incomplete:
+                on_incomplete(*details)
+
+        items = fetch_catalogue(client, [brand_id], filters, on_incomplete=record_incomplete)[brand_id]
+
+        seen_at = started.isoformat(timespec="seconds")
+        added = index.upsert(brand_id, [item["sku"] for item in items], seen_at)
+        completed_full_sync = full_due and not incomplete
+        removed = index.remove_unseen(brand_id, seen_at) if completed_full_sync else []
+        # Saat farkları yüzünden değişiklik kaçmasın diye watermark biraz geride tutulur
+        index.save_sync_state(brand_id, started - timedelta(minutes=SYNC_OVERLAP_MINUTES),
+                              started if completed_full_sync else last_full_sync)
+        print(f"✅ Marka {brand_id}: {len(items)} ürün alındı, {len(added)} yeni, {len(removed)} silinen SKU.")
+
+    return index.active_skus(brand_ids)
+
+def write_codes_file(skus, file_name=CODES_FILE):
+    """SKU bilgilerini CSV dosyasına kaydeder (scraper'ın Excel'den çok daha hızlı okuduğu biçim)."""
     df = pd.DataFrame(skus, columns=["stockCode"])  # SKU'ları DataFrame'e çevir
-    df.to_excel(file_name, index=False)  # Excel dosyasına yaz
+    df.to_csv(file_name, index=False)  # CSV dosyasına yaz
     print(f"✅ SKU'lar {file_name} dosyasına kaydedildi.")
 
 def refresh_token_on_start():
@@ -94,11 +345,48 @@ def refresh_token_on_start():
     print("✅ Başarılı bir şekilde yenilendi ve kullanılmaya hazır.")
 
 
-# **Marka ID'sini girerek API'den tüm ürünleri çek ve Excel'e yaz!**
+def export_to_queue(brand_ids, sku_queue, sync_mode=SYNC_MODE):
+    """
+    SKU'ları kuyruğa yazar; scraper (--stream) ilk SKU'lar gelir gelmez çalışmaya başlar.
+    Artımlı modda SKU indeksi güncellenir ve indeksteki SKU'lar tek seferde yazılır,
+    tam modda her sayfa geldiği anda yazılır. SKU listesi (CSV) de eskisi gibi en sonda yazılır.
+    """
+    batch_id = sku_queue.open_batch()
+    print(f"📤 SKU'lar {batch_id} kuyruğuna yazılıyor...")
+    skus = None
+    incomplete = []
+    try:
+        if sync_mode == "incremental":
+            client = open_client()
+            if client is None:
+                return None
+            index = SkuIndex()
+            try:
+                skus = sync_sku_index(brand_ids, index, client, on_incomplete=lambda *details: incomplete.append(details))
+            finally:
+                index.close()
+                client.close()
+            sku_queue.put(batch_id, skus)
+        else:
+            skus = get_all_products(
+                brand_ids,
+                on_page=lambda position, page_skus: sku_queue.put(batch_id, page_skus, position),
+                on_incomplete=lambda *details: incomplete.append(details),
+            )
+    finally:
+        # Eksik aktarım da işaretlenir: scraper gelen SKU'ları işler ama uyarı verir
+        sku_queue.close_batch(batch_id, failed=not skus or bool(incomplete))
+    return skus
+
+
+# **Marka ID'lerini (IDEASOFT_BRAND_IDS) girerek API'den tüm ürünleri çek ve CSV'ye yaz!**
 if __name__ == "__main__":
     refresh_token_on_start()
-    brand_id = 38  # İlgili markanın ID'si
-    skus = get_all_products(brand_id)
+    sku_queue = SkuQueue()
+    try:
+        skus = export_to_queue(BRAND_IDS, sku_queue)
+    finally:
+        sku_queue.close()
 
     if skus:
-        write_to_excel(skus)
+        write_codes_file(skus)
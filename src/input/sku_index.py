@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SKU_INDEX_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sku_index.db")
+
+
+class SkuIndex:
+    """
+    Local copy of the IdeaSoft SKU list per brand, kept current by incremental syncs
+    (see `api.sync_sku_index`). Additions and removals are logged in `sku_changes`.
+    """
+
+    def __init__(self, path=SKU_INDEX_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS skus (
+                stock_code TEXT PRIMARY KEY,
+                brand_id INTEGER NOT NULL,
+                first_seen_at TEXT NOT NULL,
+                last_seen_at TEXT NOT NULL,
+                removed_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                brand_id INTEGER PRIMARY KEY,
+                watermark TEXT NOT NULL,
+                last_full_sync_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sku_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stock_code TEXT NOT NULL,
+                brand_id INTEGER NOT NULL,
+                change TEXT NOT NULL,
+                changed_at TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def sync_state(self, brand_id):
+        """Returns (watermark, last_full_sync_at) as datetimes; (None, None) before the first sync."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark, last_full_sync_at FROM sync_state WHERE brand_id = ?", (brand_id,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        return datetime.fromisoformat(row[0]), datetime.fromisoformat(row[1]) if row[1] else None
+
+    def save_sync_state(self, brand_id, watermark, last_full_sync_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (brand_id, watermark, last_full_sync_at) VALUES (?, ?, ?)",
+                (brand_id, watermark.isoformat(timespec="seconds"),
+                 last_full_sync_at.isoformat(timespec="seconds") if last_full_sync_at else None),
+            )
+            self._conn.commit()
+
+    def upsert(self, brand_id, skus, seen_at):
+        """Records `skus` as listed at `seen_at`. Returns the SKUs that are new (or came back)."""
+        with self._lock:
+            known = {
+                code: removed_at
+                for code, removed_at in self._conn.execute("SELECT stock_code, removed_at FROM skus").fetchall()
+            }
+            added = [sku for sku in dict.fromkeys(skus) if sku not in known or known[sku] is not None]
+            self._conn.executemany(
+                "INSERT INTO skus (stock_code, brand_id, first_seen_at, last_seen_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (stock_code) DO UPDATE SET brand_id = excluded.brand_id, "
+                "last_seen_at = excluded.last_seen_at, removed_at = NULL",
+                [(sku, brand_id, seen_at, seen_at) for sku in skus],
+            )
+            self._log(brand_id, added, "added", seen_at)
+            self._conn.commit()
+        return added
+
+    def remove_unseen(self, brand_id, seen_at):
+        """After a full sync: marks the brand's SKUs that were not listed at `seen_at` as removed."""
+        with self._lock:
+            removed = [row[0] for row in self._conn.execute(
+                "SELECT stock_code FROM skus WHERE brand_id = ? AND removed_at IS NULL AND last_seen_at < ?",
+                (brand_id, seen_at),
+            ).fetchall()]
+            self._conn.executemany(
+                "UPDATE skus SET removed_at = ? WHERE stock_code = ?", [(seen_at, sku) for sku in removed]
+            )
+            self._log(brand_id, removed, "removed", seen_at)
+            self._conn.commit()
+        return removed
+
+    def _log(self, brand_id, skus, change, changed_at):
+        self._conn.executemany(
+            "INSERT INTO sku_changes (stock_code, brand_id, change, changed_at) VALUES (?, ?, ?, ?)",
+            [(sku, brand_id, change, changed_at) for sku in skus],
+        )
+
+    def active_skus(self, brand_ids=None):
+        """SKUs currently listed, brand by brand in first-seen order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stock_code, brand_id FROM skus WHERE removed_at IS NULL ORDER BY first_seen_at, rowid"
+            ).fetchall()
+        if brand_ids is None:
+            return [code for code, _ in rows]
+        return [code for brand_id in brand_ids for code, row_brand in rows if row_brand == brand_id]
+
+    def changes_since(self, since):
+        """Returns [(stock_code, brand_id, change, changed_at)] logged at or after `since` (ISO string)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT stock_code, brand_id, change, changed_at FROM sku_changes WHERE changed_at >= ? ORDER BY id",
+                (since,),
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
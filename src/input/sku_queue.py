@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from core.logger import log_warning
+
+SKU_QUEUE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sku_queue.db")
+
+# How often the scraper checks the queue for new SKUs (seconds)
+SKU_QUEUE_POLL_INTERVAL = float(os.getenv("SKU_QUEUE_POLL_INTERVAL", "2"))
+# Give up when no batch shows up, or an open batch gets no new SKUs, for this long (seconds)
+SKU_QUEUE_TIMEOUT = float(os.getenv("SKU_QUEUE_TIMEOUT", "1800"))
+# Unconsumed batches older than this are leftovers of an old export and are ignored
+SKU_QUEUE_STALE_HOURS = float(os.getenv("SKU_QUEUE_STALE_HOURS", "12"))
+# The export starts alongside the scraper, so a batch opened up to this long (seconds) before the
+# scraper started still belongs to this run; anything older is a previous run's leftover
+SKU_QUEUE_START_GRACE = float(os.getenv("SKU_QUEUE_START_GRACE", "600"))
+
+
+class SkuQueue:
+    """
+    SQLite handoff between the IdeaSoft export (producer) and the Hafele scraper
+    (consumer). The exporter appends each page of SKUs to a batch as soon as it
+    arrives; the scraper polls the batch and starts on new SKUs right away,
+    until the exporter closes the batch.
+    """
+
+    def __init__(self, path=SKU_QUEUE_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                started_at TEXT NOT NULL,
+                closed_at TEXT,
+                failed INTEGER NOT NULL DEFAULT 0,
+                consumed_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS skus (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                stock_code TEXT NOT NULL,
+                UNIQUE (batch_id, stock_code)
+            );
+        """)
+        self._conn.commit()
+
+    def open_batch(self, batch_id=None):
+        """Starts a new batch and returns its ID."""
+        batch_id = batch_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO batches (batch_id, started_at) VALUES (?, ?)",
+                (batch_id, datetime.now().isoformat(timespec="seconds")),
+            )
+            self._conn.commit()
+        return batch_id
+
+    def put(self, batch_id, skus, start_position=0):
+        """Appends SKUs to a batch; `start_position` keeps the catalogue order when pages arrive out of order."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO skus (batch_id, position, stock_code) VALUES (?, ?, ?)",
+                [(batch_id, start_position + i, str(sku)) for i, sku in enumerate(skus)],
+            )
+            self._conn.commit()
+
+    def close_batch(self, batch_id, failed=False):
+        """Tells the consumer that no more SKUs will be added."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE batches SET closed_at = ?, failed = ? WHERE batch_id = ?",
+                (datetime.now().isoformat(timespec="seconds"), int(failed), batch_id),
+            )
+            self._conn.commit()
+
+    def mark_consumed(self, batch_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE batches SET consumed_at = ? WHERE batch_id = ?",
+                (datetime.now().isoformat(timespec="seconds"), batch_id),
+            )
+            self._conn.commit()
+
+    def find_batch(self, not_before=None):
+        """
+        Returns the newest batch that is neither consumed nor stale, or None.
+
+        :param not_before: Only consider batches started at or after this datetime.
+        """
+        cutoff = datetime.now() - timedelta(hours=SKU_QUEUE_STALE_HOURS)
+        if not_before is not None:
+            cutoff = max(cutoff, not_before)
+        cutoff = cutoff.isoformat(timespec="seconds")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT batch_id FROM batches WHERE consumed_at IS NULL AND started_at >= ? "
+                "ORDER BY started_at DESC LIMIT 1",
+                (cutoff,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def read_new(self, batch_id, after_id=0):
+        """
+        Returns (rows, closed, failed): the SKUs added after queue ID `after_id` as
+        (id, position, stock_code) tuples, and the batch state read before them,
+        so a closed batch is never reported closed with SKUs still unread.
+        """
+        with self._lock:
+            closed, failed = self._conn.execute(
+                "SELECT closed_at IS NOT NULL, failed FROM batches WHERE batch_id = ?", (batch_id,)
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT id, position, stock_code FROM skus WHERE batch_id = ? AND id > ? ORDER BY id",
+                (batch_id, after_id),
+            ).fetchall()
+        return rows, bool(closed), bool(failed)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def wait_for_batch(queue, not_before=None, timeout=SKU_QUEUE_TIMEOUT, poll_interval=SKU_QUEUE_POLL_INTERVAL):
+    """
+    Blocks until the exporter opens a batch and returns its ID.
+
+    :param not_before: Ignore batches started before this datetime (see `run_start_cutoff`).
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        batch_id = queue.find_batch(not_before)
+        if batch_id:
+            return batch_id
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"No SKU batch appeared in the queue within {timeout}s")
+        time.sleep(poll_interval)
+
+
+def run_start_cutoff(started_at=None):
+    """The earliest batch start that can belong to a scraper run started at `started_at` (default: now)."""
+    return (started_at or datetime.now()) - timedelta(seconds=SKU_QUEUE_START_GRACE)
+
+
+def stream_batch(queue, batch_id, timeout=SKU_QUEUE_TIMEOUT, poll_interval=SKU_QUEUE_POLL_INTERVAL):
+    """
+    Yields lists of (position, stock_code) as they are added to `batch_id`,
+    and returns once the batch is closed and fully read.
+    """
+    last_id = 0
+    last_arrival = time.monotonic()
+    while True:
+        rows, closed, failed = queue.read_new(batch_id, last_id)
+        if rows:
+            last_id = rows[-1][0]
+            last_arrival = time.monotonic()
+            yield [(position, code) for _, position, code in rows]
+        if closed:
+            if failed:
+                log_warning(f"⚠️ SKU export {batch_id} failed part way; scraping the SKUs it delivered.")
+            return
+        if time.monotonic() - last_arrival > timeout:
+            raise TimeoutError(f"SKU batch {batch_id} got no new SKUs for {timeout}s and was never closed")
+        if not rows:
+            time.sleep(poll_interval)
@@ -0,0 +1,267 @@
+import asyncio
+import os
+from urllib.parse import urlparse
+
+import aiohttp
+
+from core.circuit_breaker import hafele_breaker
+from core.logger import log_debug, log_error, log_warning
+from core.metrics import endpoint_label, metrics
+from core.rate_limiter import hafele_limiter
+from core.response_cache import get_response_cache, parse_cached
+from core.retry import FAIL, REQUEST_ERRORS, RETRY_ATTEMPTS, HttpStatusError, RetryPolicy, classify
+from core.session_manager import AuthExpiredError, cookie_state, is_auth_failure
+from core.tiered_fetch import (
+    BROWSER_TIER,
+    HTTP_TIER,
+    PageFetch,
+    browser_reason,
+    check_price_block,
+    escalate_to_browser,
+    fetch_with_browser,
+    get_fetch_tier_memory,
+)
+from scraper.stock_cache import stock_cache
+from scraper.existence_cache import get_existence_cache
+from scraper.scraping_functions import (
+    build_group_result,
+    build_search_url,
+    build_sub_product_url,
+    empty_result,
+    get_random_headers,
+    not_found_result,
+    parse_singular_stock,
+    stock_for_cache,
+    summarize_product_page,
+    summarize_search_page,
+)
+
+# Maximum number of requests in flight against a single host
+HOST_CONCURRENCY = int(os.getenv("ASYNC_HOST_CONCURRENCY", "32"))
+# Maximum number of open connections across all hosts
+CONNECTION_LIMIT = int(os.getenv("ASYNC_CONNECTION_LIMIT", "100"))
+REQUEST_TIMEOUT = 60
+
+
+class AsyncHafeleClient:
+    """
+    Shares one aiohttp session (keep-alive connection pool) between every request
+    and caps the number of in-flight requests per host.
+
+    `cookie_source` is called before each request so a cookie refresh done by
+    another thread is picked up without recreating the session.
+    """
+
+    def __init__(self, cookie_source, host_concurrency=HOST_CONCURRENCY, connection_limit=CONNECTION_LIMIT):
+        self.cookie_source = cookie_source
+        self.host_concurrency = host_concurrency
+        self.connection_limit = connection_limit
+        self.session = None
+        self._host_semaphores = {}
+        self._cookie_snapshot = None
+        self._cookie_dict = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.connection_limit, limit_per_host=self.host_concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=get_random_headers(),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    def _cookies(self):
+        snapshot = self.cookie_source()
+        if snapshot is not self._cookie_snapshot:
+            if isinstance(snapshot, list):
+                self._cookie_dict = {cookie["name"]: cookie["value"] for cookie in snapshot}
+            else:
+                self._cookie_dict = dict(snapshot or {})
+            self._cookie_snapshot = snapshot
+        return self._cookie_dict
+
+    def _semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.host_concurrency)
+        return self._host_semaphores[host]
+
+    async def get_text(self, url):
+        """
+        Returns (status, body) for a GET request, paced by the circuit breaker and the
+        shared adaptive rate limiter. Uses the response cache like `hafele_get`.
+        """
+        endpoint = endpoint_label(url)
+        cache = get_response_cache()
+        # The cache is SQLite, so it is read and written from a worker thread to keep the loop free
+        cached = await asyncio.to_thread(cache.get, url) if cache is not None else None
+        if cached is not None and cached.fresh:
+            metrics.count("http_cache_total", endpoint=endpoint, result="hit")
+            return 200, cached.text
+
+        headers = cached.validators() if cached is not None else None
+        async with hafele_breaker.request_async() as call, self._semaphore(url), hafele_limiter.request_async() as slot:
+            metrics.observe("rate_limit_wait", slot.waited)
+            try:
+                with metrics.span("http_request"):
+                    async with self.session.get(url, cookies=self._cookies(), headers=headers) as response:
+                        slot.record_status(response.status)
+                        call.record_status(response.status)
+                        metrics.count("http_requests_total", endpoint=endpoint, status=response.status)
+                        if is_auth_failure(response.status, response.url, bool(response.history)):
+                            cookie_state.request_refresh(f"HTTP {response.status} for {url}")
+                            raise AuthExpiredError(f"Session rejected with status {response.status} for {url}")
+                        status = response.status
+                        body = await response.read()
+                        metrics.count("http_response_bytes_total", len(body), endpoint=endpoint)
+                        text = body.decode(response.get_encoding()) if status != 304 else None
+                        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            except asyncio.TimeoutError:
+                slot.record_timeout()
+                metrics.count("http_timeouts_total", endpoint=endpoint)
+                raise
+
+        if status == 304 and cached is not None:
+            await asyncio.to_thread(cache.refresh, url)
+            metrics.count("http_cache_total", endpoint=endpoint, result="not_modified")
+            return 200, cached.text
+        if status == 200 and cache is not None:
+            await asyncio.to_thread(cache.put, url, text, etag, last_modified)
+            metrics.count("http_cache_total", endpoint=endpoint, result="miss")
+        return status, text
+
+
+async def retrieve_product_data_async(client, url, code, retries=RETRY_ATTEMPTS):
+    """
+    Async counterpart of `retrieve_product_data`: transient failures are retried with
+    asyncio.sleep in between, so the event loop keeps serving other products.
+    """
+    try:
+        return await RetryPolicy(attempts=retries).call_async(
+            retrieve_product_attempt_async, client, url, code, stage="product_page"
+        )
+    except REQUEST_ERRORS as e:
+        log_error(f"Failed to fetch data after {retries} attempts: {e}", url=url)
+        return empty_result()
+
+
+async def retrieve_product_attempt_async(client, url, code):
+    """
+    Async counterpart of `retrieve_product_attempt`: the PDS and search requests run concurrently.
+    The search request is skipped when the existence cache has a fresh entry for `code`.
+    SQLite lookups and parsing run in worker threads so they do not stall the event loop.
+    """
+    cache_hit, exists, min_quantity = await asyncio.to_thread(get_existence_cache().get, code)
+    if cache_hit and not exists:
+        log_debug("⏩ Cached as not found on hafele.com.tr")
+        return not_found_result()
+
+    log_debug("Requesting product page", url=url)
+    if cache_hit:
+        with metrics.span("pds_request"):
+            page = await fetch_product_page_async(client, url, code)
+    else:
+        # Both requests run concurrently, so they are timed as one stage
+        with metrics.span("pds_and_search_request"):
+            page, (exists, min_quantity) = await asyncio.gather(
+                fetch_product_page_async(client, url, code),
+                lookup_product_async(client, code),
+            )
+
+    if page.status_code != 200:
+        raise HttpStatusError(page.status_code, url)
+    if not exists:
+        return not_found_result()
+
+    summary = None
+    if not page.needs_browser:
+        with metrics.span("parse"):
+            summary = await asyncio.to_thread(parse_cached, url, page.text, "product_page", summarize_product_page)
+    if check_price_block(page, summary):
+        with metrics.span("browser_fetch"):
+            page = await asyncio.to_thread(escalate_to_browser, page, url, code, client.cookie_source())
+        with metrics.span("parse"):
+            summary = await asyncio.to_thread(parse_cached, url, page.text, "product_page", summarize_product_page)
+    if "components" in summary:
+        result = await handle_group_components_async(client, summary["components"], summary["prices"])
+    else:
+        result = summary["result"]
+        stock_cache.put(code, stock_for_cache(result))
+
+    result["minimum_alis_fiyati"] = min_quantity
+    return result
+
+
+async def fetch_product_page_async(client, url, code):
+    """
+    Async counterpart of `core.tiered_fetch.fetch_product_page`. Browser fetches run
+    in a worker thread so the blocking WebDriver calls do not stall the event loop.
+    """
+    memory = get_fetch_tier_memory()
+    tier, fresh = await asyncio.to_thread(memory.get, code)
+    if tier == BROWSER_TIER and fresh:
+        return await asyncio.to_thread(fetch_with_browser, url, client.cookie_source())
+
+    status, html = await client.get_text(url)
+    page = PageFetch(status, html, HTTP_TIER, await asyncio.to_thread(browser_reason, status, html))
+    if tier == BROWSER_TIER and status == 200 and not page.needs_browser:
+        await asyncio.to_thread(memory.put, code, HTTP_TIER)
+    return page
+
+
+async def lookup_product_async(client, code):
+    url = build_search_url(code)
+    log_debug("Checking existence of product", url=url)
+    status, html = await client.get_text(url)
+    if status != 200:
+        raise HttpStatusError(status, url)
+
+    exists, min_quantity = await asyncio.to_thread(
+        parse_cached, url, html, "search_page", lambda text: summarize_search_page(text, code)
+    )
+    await asyncio.to_thread(get_existence_cache().put, code, exists, min_quantity)
+    return exists, min_quantity
+
+
+async def handle_group_components_async(client, skus, price_info):
+    """Reads component stocks from the stock cache and fetches the misses concurrently."""
+    cached = {}
+    for sku in skus:
+        hit, stock = stock_cache.get(sku)
+        if hit:
+            cached[sku] = stock
+
+    misses = [sku for sku in skus if sku not in cached]
+    metrics.count("bom_components_total", len(skus) - len(misses), source="cache")
+    metrics.count("bom_components_total", len(misses), source="request")
+    with metrics.span("bom_requests"):
+        fetched = await asyncio.gather(*[
+            retrieve_singular_stock_async(client, build_sub_product_url(sku)) for sku in misses
+        ], return_exceptions=True)
+    errors = [stock for stock in fetched if isinstance(stock, BaseException)]
+    for sku, stock in zip(misses, fetched):
+        if not isinstance(stock, BaseException):
+            stock_cache.put(sku, stock)
+            cached[sku] = stock
+    if errors:
+        # The components that did load stay cached, so the retry only fetches the rest
+        raise errors[0]
+
+    return build_group_result(price_info, [cached[sku] for sku in skus if cached[sku] is not None])
+
+
+async def retrieve_singular_stock_async(client, url):
+    """Async counterpart of `retrieve_singular_stock`."""
+    try:
+        status, html = await client.get_text(url)
+        if status != 200:
+            raise HttpStatusError(status, url)
+        return await asyncio.to_thread(parse_cached, url, html, "component_stock", parse_singular_stock)
+    except Exception as e:
+        if classify(e) != FAIL:
+            raise
+        log_warning(f"Error fetching singular stock: {e}", url=url)
+    return None
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import threading
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OUTPUT_DIR = os.getenv("SCRAPER_OUTPUT_DIR", os.path.join(ROOT_DIR, "output"))
+EXISTENCE_CACHE_DB = os.path.join(OUTPUT_DIR, "existence_cache.db")
+
+# How long an existence / minimum quantity lookup is trusted. 0 disables the cache.
+EXISTENCE_CACHE_TTL_DAYS = float(os.getenv("EXISTENCE_CACHE_TTL_DAYS", "5"))
+
+
+class ExistenceCache:
+    """
+    Persistent cache of search-page lookups: whether a SKU exists on hafele.com.tr
+    and its minimum order quantity. Not-found SKUs are cached as well, so neither
+    kind of SKU needs a search request again until its entry expires.
+    """
+
+    def __init__(self, path=EXISTENCE_CACHE_DB, ttl_days=EXISTENCE_CACHE_TTL_DAYS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl_days * 24 * 60 * 60
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS existence (
+                stock_code TEXT PRIMARY KEY,
+                product_exists INTEGER NOT NULL,
+                min_quantity TEXT,
+                checked_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, code):
+        """Returns (hit, exists, min_quantity); stale entries are a miss."""
+        if self.ttl <= 0:
+            return False, None, None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT product_exists, min_quantity, checked_at FROM existence WHERE stock_code = ?", (code,)
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.ttl:
+            return False, None, None
+        return True, bool(row[0]), row[1]
+
+    def put(self, code, exists, min_quantity):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO existence (stock_code, product_exists, min_quantity, checked_at) VALUES (?, ?, ?, ?)",
+                (code, int(exists), min_quantity, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_existence_cache = None
+_existence_cache_lock = threading.Lock()
+
+
+def get_existence_cache():
+    """Returns the process-wide cache, opening the database on first use."""
+    global _existence_cache
+    with _existence_cache_lock:
+        if _existence_cache is None:
+            _existence_cache = ExistenceCache()
+        return _existence_cache
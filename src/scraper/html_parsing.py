@@ -0,0 +1,29 @@
+import os
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+# BeautifulSoup tree builder: "lxml" (C parser, much faster) or "html.parser" (pure Python)
+HTML_PARSER = os.getenv("HTML_PARSER", DEFAULT_PARSER)
+
+# The search results page is a full site page, but only the "not found" headline
+# (p.headlineStyle4) and the quantity input (input[data-testid=PDSQuantity]) are read
+# from it, so everything else is dropped while parsing.
+SEARCH_PAGE_STRAINER = SoupStrainer(["p", "input"])
+# A usable product page has this element; pages that only mention the ID (scripts, comments) do not count
+PRICE_BLOCK_ID = "productPriceInformation"
+
+
+def make_soup(html, parser=None):
+    """Parses a PDS fragment or stock page with the configured parser backend."""
+    return BeautifulSoup(html, parser or HTML_PARSER)
+
+
+def make_search_soup(html, parser=None):
+    """Parses only the nodes of a search results page that the scraper reads."""
+    return BeautifulSoup(html, parser or HTML_PARSER, parse_only=SEARCH_PAGE_STRAINER)
+
@@ -0,0 +1,42 @@
+from typing import NamedTuple, Optional, Union
+
+# `stok_durumu` of a product hafele.com.tr does not list
+NOT_FOUND_TEXT = "urun hafele.com.tr de bulunmuyor"
+# `stok_durumu` of a product whose scrape raised
+ERROR_STATUS = "HATA"
+# `stok_durumu` of rows without data: nothing could be read, or the scrape raised
+FAILED_STATUSES = (None, ERROR_STATUS)
+
+
+class ProductRecord(NamedTuple):
+    """
+    One scraped product, as compact as a tuple.
+
+    Prices stay in the site's Turkish format ("1.234,56") and are only normalised
+    to numbers once for the whole result set (see `core.result_files.to_typed_frame`),
+    together with the derived `minimum_alis_carpi_kdv_haric_satis` column, so a
+    missing or odd value never makes a product fail.
+    """
+
+    stock_code: str
+    kdv_haric_tavsiye_edilen_perakende_fiyat: Optional[str] = None
+    kdv_haric_net_fiyat: Optional[str] = None
+    kdv_haric_satis_fiyati: Optional[str] = None
+    stok_durumu: Optional[str] = None
+    # Text (the "not found" marker) for products hafele.com.tr does not list
+    stock_amount: Union[int, str, None] = None
+    minimum_alis_fiyati: Optional[str] = None
+
+    @classmethod
+    def from_result(cls, code, data):
+        """Builds the record from a `retrieve_product_data` result dict."""
+        return cls(code, *(data.get(field) for field in cls._fields[1:]))
+
+    @classmethod
+    def error(cls, code):
+        """Record for a product whose scrape raised."""
+        return cls(code, stok_durumu=ERROR_STATUS)
+
+    def as_row(self):
+        """Plain dict for storage (JSON) and export."""
+        return self._asdict()
@@ -1,16 +1,24 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
+from core.fetcher import DEFAULT_HEADERS
+from core.logger import log_debug, log_error, log_warning
+from core.metrics import metrics
+from core.response_cache import parse_cached
+from core.retry import FAIL, REQUEST_ERRORS, RETRY_ATTEMPTS, HttpStatusError, RetryPolicy, classify
+from core.session_manager import hafele_get
+from core.tiered_fetch import check_price_block, escalate_to_browser, fetch_product_page
+from scraper.html_parsing import PRICE_BLOCK_ID, make_search_soup, make_soup
+from scraper.product_record import NOT_FOUND_TEXT
+from scraper.stock_cache import stock_cache
+from scraper.existence_cache import get_existence_cache
 
 load_dotenv()
 
 # Define base directory and update file paths
 BASE_DIR = os.path.dirname(__file__)
 COOKIE_FILE = os.path.join(BASE_DIR, "cookies.pkl")
-INPUT_FILE = os.path.join(BASE_DIR, "input", "product_codes.xlsx")
 OUTPUT_FILE = os.path.join(BASE_DIR, "output", "product_data_results.xlsx")
 
 USER_AGENTS = [
@@ -28,54 +36,98 @@ PROXIES = [
 COOKIE_EXPIRY = 600  # 10 minutes
 LOGIN_INTERVAL = 300  # 5 min
 
+# Can be pointed at a local stand-in server (see tests/fake_hafele.py)
+HAFELE_BASE_URL = os.getenv("HAFELE_BASE_URL", "https://www.hafele.com.tr/prod-live/web/WFS/Haefele-HTR-Site/tr_TR/-/TRY")
+PDS_URL = f"{HAFELE_BASE_URL}/ViewProduct-GetPriceAndAvailabilityInformationPDS"
+SEARCH_URL = f"{HAFELE_BASE_URL}/ViewParametricSearch-SimpleOfferSearch"
+
+# Set components whose stock is not cached are fetched in parallel by this many threads.
+# The pool is shared and long-lived so its threads keep their pooled HTTP sessions.
+SET_COMPONENT_WORKERS = int(os.getenv("SET_COMPONENT_WORKERS", "8"))
+_component_executor = ThreadPoolExecutor(max_workers=SET_COMPONENT_WORKERS, thread_name_prefix="set-component")
+
 stop_refreshing = False  # Global flag to stop the hafele_login refresh loop
 
 
-def retrieve_product_data(url, code, cookie_information, retries=3):
-    """Fetch and parse the HTML to extract stock, price, group info, and min. purchase quantity."""
-    for attempt in range(retries):
-        try:
-            headers = get_random_headers()
-            print(f"Requesting URL: {url}")
+def retrieve_product_data(url, code, cookie_information, retries=RETRY_ATTEMPTS):
+    """
+    Fetch and parse the HTML to extract stock, price, group info, and min. purchase quantity.
+    Transient failures are retried (see `core.retry`), sleeping in between; the scrape
+    pipeline calls `retrieve_product_attempt` instead and defers its retries.
+    """
+    try:
+        return RetryPolicy(attempts=retries).call(
+            retrieve_product_attempt, url, code, cookie_information, stage="product_page"
+        )
+    except REQUEST_ERRORS as e:
+        log_error(f"Failed to fetch data after {retries} attempts: {e}", url=url)
+        return empty_result()
 
-            if isinstance(cookie_information, list):
-                cookie_information = {cookie['name']: cookie['value'] for cookie in cookie_information}
 
-            response = requests.get(url, headers=headers, cookies=cookie_information, timeout=60)
+def retrieve_product_attempt(url, code, cookie_information):
+    """
+    One attempt at a product. The page is fetched over plain HTTP and only escalated
+    to a browser when it needs one. Request failures are raised for the caller's retry policy.
+    """
+    cache_hit, exists, min_quantity = get_existence_cache().get(code)
+    if cache_hit and not exists:
+        log_debug("⏩ Cached as not found on hafele.com.tr")
+        return not_found_result()
 
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, "html.parser")
-                exists, search_soup = does_product_exist(code=code, cookies=cookie_information)
+    log_debug("Requesting product page", url=url)
+    with metrics.span("pds_request"):
+        page = fetch_product_page(url, code, cookie_information)
+    if page.status_code != 200:
+        raise HttpStatusError(page.status_code, url)
 
-                if exists:
-                    # 🔍 Find the min quantity input
-                    input_tag = search_soup.find("input", {"data-testid": "PDSQuantity"})
-                    min_quantity = input_tag["value"].strip() if input_tag and input_tag.has_attr("value") else None
+    summary = None
+    if not page.needs_browser:
+        with metrics.span("parse"):
+            summary = parse_cached(url, page.text, "product_page", summarize_product_page)
+    if check_price_block(page, summary):
+        # Only pay for a browser session once the product is known to exist
+        if not cache_hit:
+            with metrics.span("search_request"):
+                exists, min_quantity = lookup_product(code, cookie_information)
+            cache_hit = True
+        if not exists:
+            return not_found_result()
+        with metrics.span("browser_fetch"):
+            page = escalate_to_browser(page, url, code, cookie_information)
+        with metrics.span("parse"):
+            summary = parse_cached(url, page.text, "product_page", summarize_product_page)
 
-                    group_table = soup.find("tr", id="productBomArticlesInformation")
-                    result = handle_group_product(soup, cookie_information) if group_table else handle_singular_product(soup)
+    if not cache_hit:
+        with metrics.span("search_request"):
+            exists, min_quantity = lookup_product(code, cookie_information)
+    if not exists:
+        return not_found_result()
 
-                    # ✅ Append the new field to the result
-                    result["minimum_alis_fiyati"] = min_quantity
-                    return result
+    if "components" in summary:
+        result = handle_group_components(summary["components"], summary["prices"], cookie_information)
+    else:
+        result = summary["result"]
+        stock_cache.put(code, stock_for_cache(result))
 
-                else:
-                    return {
-                        "kdv_haric_tavsiye_edilen_perakende_fiyat": "urun hafele.com.tr de bulunmuyor",
-                        "kdv_haric_net_fiyat": "urun hafele.com.tr de bulunmuyor",
-                        "kdv_haric_satis_fiyati": "urun hafele.com.tr de bulunmuyor",
-                        "stok_durumu": "urun hafele.com.tr de bulunmuyor",
-                        "stock_amount": "urun hafele.com.tr de bulunmuyor",
-                        "minimum_alis_fiyati": None,
-                    }
-            else:
-                print(f"Request failed with status {response.status_code}. Retrying...")
-        except requests.exceptions.RequestException as e:
-            print(f"Request error: {e}. Retrying...")
+    # ✅ Append the new field to the result
+    result["minimum_alis_fiyati"] = min_quantity
+    return result
 
-        time.sleep(2 ** attempt)  # Exponential backoff
 
-    print(f"Failed to fetch data after {retries} retries for URL: {url}")
+def not_found_result():
+    """Result returned for products that hafele.com.tr does not list."""
+    return {
+        "kdv_haric_tavsiye_edilen_perakende_fiyat": NOT_FOUND_TEXT,
+        "kdv_haric_net_fiyat": NOT_FOUND_TEXT,
+        "kdv_haric_satis_fiyati": NOT_FOUND_TEXT,
+        "stok_durumu": NOT_FOUND_TEXT,
+        "stock_amount": NOT_FOUND_TEXT,
+        "minimum_alis_fiyati": None,
+    }
+
+
+def empty_result():
+    """Result returned when the product data could not be fetched at all."""
     return {
         "kdv_haric_tavsiye_edilen_perakende_fiyat": None,
         "kdv_haric_net_fiyat": None,
@@ -86,22 +138,48 @@ def retrieve_product_data(url, code, cookie_information, retries=3):
     }
 
 
-def does_product_exist(code, cookies):
-    print(f"Checking existence of product {code}...")
-    url = f"https://www.hafele.com.tr/prod-live/web/WFS/Haefele-HTR-Site/tr_TR/-/TRY/ViewParametricSearch-SimpleOfferSearch?SearchType=all&SearchTerm={code}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
+def build_search_url(code):
+    return f"{SEARCH_URL}?SearchType=all&SearchTerm={code}"
+
 
-    if isinstance(cookies, list):
-        cookies = {cookie["name"]: cookie["value"] for cookie in cookies}
+def build_product_url(code):
+    return f"{PDS_URL}?SKU={code.replace('.', '')}&ProductQuantity=20000"
 
-    response = requests.get(url, headers=headers, cookies=cookies)
-    print(f"Url for search {url}")
+
+def build_sub_product_url(sku):
+    return f"{PDS_URL}?SKU={sku}&ProductQuantity=20000&SynchronizationAjaxToken=1"
+
+
+def lookup_product(code, cookies):
+    """Runs the search request for `code` and caches whether it exists and its minimum order quantity."""
+    url = build_search_url(code)
+    exists, min_quantity = parse_cached(url, fetch_search_page(url, cookies), "search_page",
+                                        lambda html: summarize_search_page(html, code))
+    get_existence_cache().put(code, exists, min_quantity)
+    return exists, min_quantity
+
+
+def fetch_search_page(url, cookies):
+    log_debug("Checking existence of product", url=url)
+    response = hafele_get(url, cookies)
     if response.status_code != 200:
-        raise Exception(f"Failed to fetch the URL, status code: {response.status_code}")
+        raise HttpStatusError(response.status_code, url)
+    return response.text
+
+
+def does_product_exist(code, cookies):
+    return parse_search_page(fetch_search_page(build_search_url(code), cookies), code)
+
+
+def summarize_search_page(html, code):
+    """[exists, minimum order quantity] read from a search results page."""
+    exists, soup = parse_search_page(html, code)
+    return [exists, extract_min_quantity(soup) if exists else None]
+
 
-    soup = BeautifulSoup(response.text, "html.parser")
+def parse_search_page(html, code, parser=None):
+    """Parses a search results page and returns (exists, soup)."""
+    soup = make_search_soup(html, parser)
     error_message = soup.find("p", class_="headlineStyle4")
     if error_message and f"{code} için aramanız başarısız oldu." in error_message.text:
         return False, soup
@@ -109,24 +187,29 @@ def does_product_exist(code, cookies):
     return True, soup
 
 
+def extract_min_quantity(search_soup):
+    """Reads the minimum order quantity from the search results page."""
+    input_tag = search_soup.find("input", {"data-testid": "PDSQuantity"})
+    return input_tag["value"].strip() if input_tag and input_tag.has_attr("value") else None
+
+
 def handle_singular_product(soup):
     price_info = extract_price_info(soup)
     stock_rows = soup.select("tr.values-tr")
     stock_amount = None
     stock_status = None
-    print("\n🔍 DEBUG: Extracting stock data...\n")
     for row in stock_rows:
         stock_qty_element = row.select_one("td.qty-available")
         availability_element = row.select_one("td.requestedPackageStatus .availability-flag")
         if stock_qty_element and availability_element:
             stock_qty = stock_qty_element.text.strip()
             availability_text = availability_element.text.strip().lower()
-            print(f"Found stock: {stock_qty}, Status: {availability_text}")
+            log_debug("🔍 Found stock row", stock=stock_qty, status=availability_text)
             stock_qty = int(stock_qty) if stock_qty.isdigit() else None
             if "stokta mevcut" in availability_text:
                 stock_amount = stock_qty
                 stock_status = "stokta mevcut"
-                print(f"✅ Prioritizing 'stokta mevcut' stock: {stock_amount}")
+                log_debug("✅ Prioritizing 'stokta mevcut' stock", stock=stock_amount)
                 break
             if stock_amount is None:
                 stock_amount = stock_qty
@@ -134,50 +217,122 @@ def handle_singular_product(soup):
     if stock_status is None:
         stock_info_element = soup.select_one("#productAvailabilityInformation .availability-flag")
         stock_status = stock_info_element.text.strip() if stock_info_element else "Stok bilgisi bulunamadi"
-    print(f"📌 Final Stock Amount: {stock_amount}, Status: {stock_status}\n")
+    log_debug("📌 Final stock", stock=stock_amount, status=stock_status)
     return {
         **price_info,
         "stok_durumu": stock_status,
         "stock_amount": stock_amount,
     }
 
+def summarize_product_page(html):
+    """
+    Everything the pipeline reads from a PDS fragment: the result of a singular
+    product, or the component SKUs and prices of a set, and whether the page has
+    the price block at all. Plain data, so it can be kept in the response cache and
+    an unchanged page is not parsed again.
+    """
+    soup = make_soup(html)
+    price_block = soup.find(id=PRICE_BLOCK_ID) is not None
+    if soup.find("tr", id="productBomArticlesInformation"):
+        return {
+            "components": extract_sub_product_skus(soup),
+            "prices": extract_price_info(soup),
+            "price_block": price_block,
+        }
+    return {"result": handle_singular_product(soup), "price_block": price_block}
+
+
 def handle_group_product(soup, cookies):
-    base_url = "https://www.hafele.com.tr/prod-live/web/WFS/Haefele-HTR-Site/tr_TR/-/TRY/ViewProduct-GetPriceAndAvailabilityInformationPDS"
-    sub_product_rows = soup.select(".BomArticlesTable .productDataTableQty")
-    sub_product_stocks = []
-    for row in sub_product_rows:
+    return handle_group_components(extract_sub_product_skus(soup), extract_price_info(soup), cookies)
+
+
+def handle_group_components(skus, price_info, cookies):
+    cached = {}
+    misses = []
+    for sku in skus:
+        hit, stock = stock_cache.get(sku)
+        if hit:
+            cached[sku] = stock
+        else:
+            misses.append(sku)
+
+    metrics.count("bom_components_total", len(cached), source="cache")
+    metrics.count("bom_components_total", len(misses), source="request")
+    with metrics.span("bom_requests"):
+        futures = {
+            sku: _component_executor.submit(retrieve_singular_stock, build_sub_product_url(sku), cookies)
+            for sku in misses
+        }
+        wait(futures.values())
+    errors = []
+    for sku, future in futures.items():
+        if future.exception() is not None:
+            errors.append(future.exception())
+            continue
+        stock_cache.put(sku, future.result())
+        cached[sku] = future.result()
+    if errors:
+        # The components that did load stay cached, so the retry only fetches the rest
+        raise errors[0]
+
+    sub_product_stocks = [cached[sku] for sku in skus if cached[sku] is not None]
+    return build_group_result(price_info, sub_product_stocks)
+
+
+def stock_for_cache(result):
+    """Converts a singular product result to the value `retrieve_singular_stock` would return."""
+    if result.get("stok_durumu") == "stokta mevcut":
+        return result.get("stock_amount")
+    return 0
+
+
+def extract_sub_product_skus(soup):
+    """Returns the (dot-less) SKUs of every component listed in a set's BOM table."""
+    skus = []
+    for row in soup.select(".BomArticlesTable .productDataTableQty"):
         sku_element = row.find("a", class_="product-sku-title")
         if sku_element:
-            sub_product_sku = sku_element.text.strip().replace(".", "")
-            sub_url = f"{base_url}?SKU={sub_product_sku}&ProductQuantity=20000&SynchronizationAjaxToken=1"
-            sub_stock = retrieve_singular_stock(sub_url, cookies)
-            if sub_stock is not None:
-                sub_product_stocks.append(sub_stock)
+            skus.append(sku_element.text.strip().replace(".", ""))
+    return skus
+
+
+def build_group_result(price_info, sub_product_stocks):
+    """A set is only as available as its scarcest component."""
     main_product_stock = min(sub_product_stocks) if sub_product_stocks else None
-    price_info = extract_price_info(soup)
     return {
         **price_info,
         "stok_durumu": "set urun",
         "stock_amount": main_product_stock,
     }
 
+
 def retrieve_singular_stock(url, cookies):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-    }
+    """
+    Stock of one set component. Transient request failures are raised so the whole
+    product is retried; anything else counts as unknown stock (None).
+    """
     try:
-        response = requests.get(url, headers=headers, cookies=cookies, timeout=60)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            availability_flag = soup.select_one("span.availability-flag[style='color:#339C76']")
-            if availability_flag and "stokta mevcut" in availability_flag.text.strip().lower():
-                stock_amount = soup.select_one(".qty-available")
-                return int(stock_amount.text.strip()) if stock_amount and stock_amount.text.strip().isdigit() else None
-            return 0
+        response = hafele_get(url, cookies)
+        if response.status_code != 200:
+            raise HttpStatusError(response.status_code, url)
+        return parse_cached(url, response.text, "component_stock", parse_singular_stock)
     except Exception as e:
-        print(f"Error fetching singular stock: {e}")
+        if classify(e) != FAIL:
+            raise
+        log_warning(f"Error fetching singular stock: {e}", url=url)
     return None
 
+
+def parse_singular_stock(html, parser=None):
+    """Returns the available quantity of a component, 0 if it is out of stock."""
+    soup = make_soup(html, parser)
+    availability_flag = soup.select_one("span.availability-flag[style='color:#339C76']")
+    if availability_flag and "stokta mevcut" in availability_flag.text.strip().lower():
+        stock_amount = soup.select_one(".qty-available")
+        return int(stock_amount.text.strip()) if stock_amount and stock_amount.text.strip().isdigit() else None
+    return 0
+
+
 def extract_price_info(soup):
     prices = soup.select("span.price")
     return {
@@ -188,22 +343,7 @@ def extract_price_info(soup):
 
 
 def get_random_headers():
-    return {
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-    "Accept-Encoding": "gzip, deflate, br",
-    "Accept-Language": "en-GB,en;q=0.9,tr;q=0.5",
-    "Cache-Control": "no-cache",
-    "Pragma": "no-cache",
-    "Upgrade-Insecure-Requests": "1",
-    "Sec-Fetch-Dest": "document",
-    "Sec-Fetch-Mode": "navigate",
-    "Sec-Fetch-Site": "none",
-    "Sec-Fetch-User": "?1",
-    "Sec-Ch-Ua": '"Chromium";v="136", "Google Chrome";v="136", "Not.A/Brand";v="99"',
-    "Sec-Ch-Ua-Mobile": "?0",
-    "Sec-Ch-Ua-Platform": '"macOS"'
-}
+    return dict(DEFAULT_HEADERS)
 
 def is_cookie_valid(cookie_file, expiry_time):
     return (
@@ -4,6 +4,8 @@ from email.message import EmailMessage
 import os
 from dotenv import load_dotenv
 
+from core.logger import log_info
+
 load_dotenv()
 
 def send_mail_without_excel(recipient_email,subject= "Hafele Guncel Stoklar", content= r"Web kazima islemi baslatildi"):
@@ -23,11 +25,13 @@ def send_mail_without_excel(recipient_email,subject= "Hafele Guncel Stoklar", co
     with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
         smtp.login(sender_email, app_password)
         smtp.send_message(msg)
-        print("Done!")
+        log_info("📧 Mail sent", recipient=recipient_email)
 
-def send_mail_with_excel(recipient_email, excel_file):
+def send_mail_with_excel(recipient_email, excel_file, change_report=None, change_summary=None):
     subject = "Hafele Guncel Stoklar"
     content = r"Guncel stoklari iceren .xlsx dosyasini ekte bulabilirsiniz."
+    if change_summary:
+        content += f"\nOnceki calismaya gore degisiklikler: {change_summary}."
 
     sender_email = os.getenv("gmail_sender_email")
     app_password = os.getenv("gmail_app_password")
@@ -45,8 +49,13 @@ def send_mail_with_excel(recipient_email, excel_file):
     with open(excel_file, 'rb') as f:
         file_data = f.read()
     msg.add_attachment(file_data, maintype="application", subtype="xlsx", filename=filename_to_be_sent)
+    if change_report:
+        # Only the rows that changed since the previous run
+        with open(change_report, 'rb') as f:
+            msg.add_attachment(f.read(), maintype="application", subtype="xlsx",
+                               filename=f'{today_s_date} Hafele Degisiklikler.xlsx')
 
     with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
         smtp.login(sender_email, app_password)
         smtp.send_message(msg)
-        print("Done!")
+        log_info("📧 Mail sent", recipient=recipient_email)
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+
+# Seconds a cached component stock stays valid
+STOCK_CACHE_TTL = int(os.getenv("STOCK_CACHE_TTL", "900"))
+
+
+def normalize_sku(code):
+    """Hafele URLs and BOM tables use SKUs without dots (941.30.011 -> 94130011)."""
+    return str(code).replace(".", "").strip()
+
+
+class StockCache:
+    """
+    Run-scoped, thread-safe cache of stock amounts by SKU.
+
+    Single product scrapes fill it and set products read their components from it,
+    so a hinge used by twenty sets is only requested once per TTL.
+    """
+
+    def __init__(self, ttl=STOCK_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, sku):
+        """Returns (hit, stock). Expired entries are evicted and count as a miss."""
+        key = normalize_sku(sku)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            stock, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            return True, stock
+
+    def put(self, sku, stock):
+        """Caches a known stock amount; unknown (None) values are not cached."""
+        if stock is None:
+            return
+        with self._lock:
+            self._entries[normalize_sku(sku)] = (stock, time.monotonic() + self.ttl)
+
+    def evict_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, (_, expires_at) in self._entries.items() if expires_at < now]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+stock_cache = StockCache()
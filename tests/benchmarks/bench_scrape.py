@@ -0,0 +1,212 @@
+"""
+End-to-end throughput benchmark against the offline Hafele stand-in.
+
+Runs `retrieve_product_data` one product at a time and then the full
+`main.run_pipeline` (thread pool or asyncio backend, result store, Excel export)
+and reports products/s, p50/p95 latency per product and peak RSS. Every run is
+appended to a JSONL history file and compared with the previous comparable run,
+so regressions show up as soon as they land.
+
+Usage:
+    python tests/benchmarks/bench_scrape.py --products 500 --workers 16 --latency 0.05
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+TESTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC_DIR = os.path.abspath(os.path.join(TESTS_DIR, "..", "src"))
+sys.path.append(SRC_DIR)
+sys.path.append(TESTS_DIR)
+
+HISTORY_FILE = os.path.join(os.path.dirname(__file__), "history.jsonl")
+# A run is flagged when throughput drops or p95 latency grows by more than this share
+REGRESSION_TOLERANCE = 0.15
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=TESTS_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def product_codes(count):
+    """80% singular products, 10% sets and 10% products the site does not know."""
+    codes = []
+    for i in range(count):
+        if i % 10 == 8:
+            codes.append(f"562.{i // 1000:02d}.{i % 1000:03d}")
+        elif i % 10 == 9:
+            codes.append(f"999.{i // 1000:02d}.{i % 1000:03d}")
+        else:
+            codes.append(f"941.{i // 1000:02d}.{i % 1000:03d}")
+    return codes
+
+
+def summarize(name, latencies, elapsed, extra=None):
+    result = {
+        "benchmark": name,
+        "products": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "products_per_s": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    result.update(extra or {})
+    return result
+
+
+def bench_retrieve(codes):
+    """Sequential `retrieve_product_data` calls: per-request cost without concurrency."""
+    from scraper.scraping_functions import build_product_url, retrieve_product_data
+
+    cookies = [{"name": "sid", "value": "benchmark"}]
+    latencies = []
+    st = time.perf_counter()
+    for code in codes:
+        call_st = time.perf_counter()
+        retrieve_product_data(build_product_url(code), code, cookies)
+        latencies.append(time.perf_counter() - call_st)
+    return summarize("retrieve_product_data", latencies, time.perf_counter() - st)
+
+
+def bench_pipeline(codes, workers, backend, work_dir):
+    """Full pipeline as `main` runs it: concurrent scrape, per-row persistence, dead-letter retry and the export."""
+    import core.main as main
+    from core.dead_letters import DeadLetterQueue
+    from core.result_store import ResultStore
+
+    latencies = []
+    process_product, process_product_async = main.process_product, main.process_product_async
+
+    def timed_process_product(code, attempt=0):
+        call_st = time.perf_counter()
+        try:
+            return process_product(code, attempt)
+        finally:
+            latencies.append(time.perf_counter() - call_st)
+
+    async def timed_process_product_async(client, code, attempt=0):
+        call_st = time.perf_counter()
+        try:
+            return await process_product_async(client, code, attempt)
+        finally:
+            latencies.append(time.perf_counter() - call_st)
+
+    main.process_product, main.process_product_async = timed_process_product, timed_process_product_async
+    main.cookie_state.swap([{"name": "sid", "value": "benchmark"}])
+    store = ResultStore(os.path.join(work_dir, "bench_results.db"))
+    dead_letters = DeadLetterQueue(os.path.join(work_dir, f"bench_dead_letters_{backend}.db"))
+    try:
+        run_id = f"bench_{backend}_{int(time.time())}"
+        st = time.perf_counter()
+        main.run_pipeline(store, run_id, codes, main.result_path(os.path.join(work_dir, "bench_results")), workers,
+                          backend, dead_letters=dead_letters)
+        elapsed = time.perf_counter() - st
+    finally:
+        store.close()
+        dead_letters.close()
+        main.process_product, main.process_product_async = process_product, process_product_async
+
+    return summarize(f"pipeline_{backend}", latencies, elapsed, {"workers": workers})
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_regressions(result, history):
+    """Compares `result` with the latest earlier run of the same benchmark and parameters."""
+    keys = ("benchmark", "products", "workers", "latency", "error_rate")
+    previous = [entry for entry in history if all(entry.get(k) == result.get(k) for k in keys)]
+    if not previous:
+        return []
+    last = previous[-1]
+    regressions = []
+    if last.get("products_per_s") and result["products_per_s"] < last["products_per_s"] * (1 - REGRESSION_TOLERANCE):
+        regressions.append(f"throughput {last['products_per_s']} -> {result['products_per_s']} products/s")
+    if last.get("p95_ms") and result["p95_ms"] > last["p95_ms"] * (1 + REGRESSION_TOLERANCE):
+        regressions.append(f"p95 {last['p95_ms']} -> {result['p95_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against the offline Hafele stand-in.")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--backend", choices=["threads", "async", "both"], default="both")
+    parser.add_argument("--latency", type=float, default=0.05, help="Base server latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--skip-sequential", action="store_true", help="Only run the pipeline benchmarks.")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    from fake_hafele import FakeHafeleServer
+
+    with tempfile.TemporaryDirectory() as work_dir, \
+            FakeHafeleServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=1) as server:
+        # Configure the scraper before it is imported: fake site, no rate limit, throwaway caches
+        os.environ["HAFELE_BASE_URL"] = server.base_url
+        # Every database, log and report goes to the temporary directory
+        os.environ["SCRAPER_OUTPUT_DIR"] = work_dir
+        os.environ.setdefault("HAFELE_MAX_RPS", "100000")
+        os.environ.setdefault("HAFELE_MAX_CONCURRENCY", str(max(64, args.workers * 4)))
+        os.environ["EXISTENCE_CACHE_TTL_DAYS"] = "0"
+        # Every product and backend has to download its pages, not reuse the previous pass
+        os.environ["HTTP_CACHE"] = "0"
+
+        codes = product_codes(args.products)
+        results = []
+        if not args.skip_sequential:
+            results.append(bench_retrieve(codes[:max(1, args.products // 10)]))
+        backends = ["threads", "async"] if args.backend == "both" else [args.backend]
+        for backend in backends:
+            results.append(bench_pipeline(codes, args.workers, backend, work_dir))
+
+    history = load_history(args.history)
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+    }
+    with open(args.history, "a", encoding="utf-8") as f:
+        for result in results:
+            result.update(meta)
+            result.setdefault("workers", 1)
+            regressions = find_regressions(result, history)
+            print(f"📊 {result['benchmark']}: {result['products_per_s']} products/s, "
+                  f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, peak RSS {result['peak_rss_mb']} MB")
+            for regression in regressions:
+                print(f"   ⚠️ Regression vs previous run: {regression}")
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
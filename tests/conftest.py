@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+# Add src, src/input (api.py imports its siblings as top-level modules) and tests directories to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/input')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from fake_hafele import FakeHafeleServer
+
+
+@pytest.fixture
+def fake_hafele():
+    with FakeHafeleServer() as server:
+        yield server
+
+
+@pytest.fixture
+def offline_scraper(fake_hafele, tmp_path, monkeypatch):
+    """Points the scraper at the fake server, with fresh caches and no rate limit."""
+    from core import response_cache, session_manager, tiered_fetch
+    from core.circuit_breaker import hafele_breaker
+    from core.tiered_fetch import FetchTierMemory
+    from core.rate_limiter import AdaptiveLimiter
+    from core.response_cache import ResponseCache
+    from core.retry import retry_budget
+    from scraper import async_scraping_functions, scraping_functions
+    from scraper.existence_cache import ExistenceCache
+    from scraper.stock_cache import stock_cache
+
+    monkeypatch.setattr(scraping_functions, "PDS_URL", f"{fake_hafele.base_url}/ViewProduct-GetPriceAndAvailabilityInformationPDS")
+    monkeypatch.setattr(scraping_functions, "SEARCH_URL", f"{fake_hafele.base_url}/ViewParametricSearch-SimpleOfferSearch")
+    monkeypatch.setattr(session_manager, "hafele_limiter", AdaptiveLimiter(max_rps=10000, max_concurrency=64))
+    existence_cache = ExistenceCache(str(tmp_path / "existence_cache.db"))
+    monkeypatch.setattr(scraping_functions, "get_existence_cache", lambda: existence_cache)
+    monkeypatch.setattr(async_scraping_functions, "get_existence_cache", lambda: existence_cache)
+    fetch_tier_memory = FetchTierMemory(str(tmp_path / "fetch_tiers.db"))
+    monkeypatch.setattr(tiered_fetch, "get_fetch_tier_memory", lambda: fetch_tier_memory)
+    monkeypatch.setattr(async_scraping_functions, "get_fetch_tier_memory", lambda: fetch_tier_memory)
+    http_cache = ResponseCache(str(tmp_path / "http_cache.db"))
+    for module in (response_cache, session_manager, tiered_fetch, async_scraping_functions):
+        monkeypatch.setattr(module, "get_response_cache", lambda: http_cache)
+    monkeypatch.setattr(scraping_functions.time, "sleep", lambda seconds: None)
+    stock_cache.clear()
+    retry_budget.reset()
+    hafele_breaker.reset()
+
+    yield fake_hafele
+
+    stock_cache.clear()
+    hafele_breaker.reset()
+    existence_cache.close()
+    fetch_tier_memory.close()
+    http_cache.close()
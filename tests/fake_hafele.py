@@ -0,0 +1,182 @@
+"""
+Offline stand-in for the hafele.com.tr endpoints the scraper calls.
+
+Serves the recorded pages in tests/fixtures:
+    .../ViewProduct-GetPriceAndAvailabilityInformationPDS?SKU=...   PDS fragment
+    .../ViewParametricSearch-SimpleOfferSearch?SearchTerm=...       search page
+
+SKUs starting with "999" are not found, SKUs starting with "562" are sets (their
+components are served as stock pages), SKUs starting with "777" get a bot-challenge
+interstitial instead of their PDS page and every other SKU is a singular product.
+Latency and error injection are configurable so benchmarks can model a slow or
+failing site. Pages carry an ETag and conditional requests for an unchanged page
+are answered with 304 Not Modified.
+
+Run standalone:
+    python tests/fake_hafele.py --port 8765 --latency 0.05 --error-rate 0.01
+then point the scraper at it with
+    HAFELE_BASE_URL=http://127.0.0.1:8765/prod-live/web/WFS/Haefele-HTR-Site/tr_TR/-/TRY
+"""
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+BASE_PATH = "/prod-live/web/WFS/Haefele-HTR-Site/tr_TR/-/TRY"
+NOT_FOUND_FIXTURE_CODE = "999.99.999"
+OUT_OF_STOCK_COMPONENT = "31101504"
+CHALLENGE_PAGE = (
+    "<html><head><title>Just a moment...</title></head>"
+    "<body><div id=\"challenge-platform\">Checking your browser</div></body></html>"
+)
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class FakeHafeleServer:
+    """
+    Threaded HTTP server serving recorded Hafele pages.
+
+    :param latency: Base delay in seconds added to every response.
+    :param jitter: Extra random delay of up to this many seconds.
+    :param error_rate: Share of requests answered with `error_status`.
+    :param error_status: Status code used for injected errors.
+    :param etags: Send ETags and answer matching If-None-Match requests with 304.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None,
+                 etags=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.etags = etags
+        self.request_count = 0
+        self.not_modified_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = {
+            "singular": read_fixture("pds_singular.html"),
+            "set": read_fixture("pds_set.html"),
+            "stock_available": read_fixture("sub_stock_available.html"),
+            "stock_unavailable": read_fixture("sub_stock_unavailable.html"),
+            "search_found": read_fixture("search_found.html"),
+            "search_not_found": read_fixture("search_not_found.html"),
+        }
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{BASE_PATH}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _should_fail(self):
+        with self._lock:
+            self.request_count += 1
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def _delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        return self.latency + extra
+
+    def route(self, path, query):
+        """Returns (status, body) for a request path and its parsed query string."""
+        if path.endswith("/ViewParametricSearch-SimpleOfferSearch"):
+            code = query.get("SearchTerm", [""])[0]
+            if code.startswith("999"):
+                return 200, self._pages["search_not_found"].replace(NOT_FOUND_FIXTURE_CODE, code)
+            return 200, self._pages["search_found"]
+
+        if path.endswith("/ViewProduct-GetPriceAndAvailabilityInformationPDS"):
+            sku = query.get("SKU", [""])[0]
+            if "SynchronizationAjaxToken" in query:
+                key = "stock_unavailable" if sku == OUT_OF_STOCK_COMPONENT else "stock_available"
+                return 200, self._pages[key]
+            if sku.startswith("777"):
+                return 200, CHALLENGE_PAGE
+            return 200, self._pages["set" if sku.startswith("562") else "singular"]
+
+        return 404, "<html><body>Not found</body></html>"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                delay = server._delay()
+                if delay:
+                    time.sleep(delay)
+
+                url = urlparse(self.path)
+                if server._should_fail():
+                    status, body = server.error_status, "<html><body>Service unavailable</body></html>"
+                else:
+                    status, body = server.route(url.path, parse_qs(url.query))
+
+                payload = body.encode("utf-8")
+                etag = f'"{hashlib.sha1(payload).hexdigest()[:16]}"' if server.etags and status == 200 else None
+                if etag and self.headers.get("If-None-Match") == etag:
+                    with server._lock:
+                        server.not_modified_count += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded Hafele pages locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeHafeleServer(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    print(f"🧪 Fake Hafele server listening on {fake.base_url}")
+    try:
+        fake._httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
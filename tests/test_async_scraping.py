@@ -0,0 +1,77 @@
+import asyncio
+from urllib.parse import parse_qs, urlparse
+
+from core import response_cache, session_manager, tiered_fetch
+from core.rate_limiter import AdaptiveLimiter
+from scraper import async_scraping_functions
+from scraper.async_scraping_functions import AsyncHafeleClient, retrieve_product_attempt_async
+from scraper.existence_cache import ExistenceCache
+from scraper.scraping_functions import build_product_url, retrieve_product_data
+from scraper.stock_cache import stock_cache
+
+COOKIES = [{"name": "sid", "value": "offline"}]
+CODES = ["941.30.011", "562.12.345", "999.12.345"]
+
+
+class StubResponse:
+    def __init__(self, url, status, body):
+        self.url = url
+        self.status = status
+        self.history = ()
+        self.headers = {}
+        self._body = body.encode("utf-8")
+
+    async def read(self):
+        return self._body
+
+    def get_encoding(self):
+        return "utf-8"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class StubSession:
+    """Answers aiohttp-style GETs from the fake server's routes without opening a socket."""
+
+    def __init__(self, server):
+        self.server = server
+        self.urls = []
+
+    def get(self, url, cookies=None, headers=None):
+        self.urls.append(url)
+        parsed = urlparse(url)
+        return StubResponse(url, *self.server.route(parsed.path, parse_qs(parsed.query)))
+
+
+def test_async_attempt_matches_the_sync_path(offline_scraper, tmp_path, monkeypatch):
+    expected = {code: retrieve_product_data(build_product_url(code), code, COOKIES) for code in CODES}
+    requests_after_sync = offline_scraper.request_count
+
+    # Start the async run from the same empty caches the sync run had
+    stock_cache.clear()
+    existence_cache = ExistenceCache(str(tmp_path / "async_existence_cache.db"))
+    monkeypatch.setattr(async_scraping_functions, "get_existence_cache", lambda: existence_cache)
+    for module in (response_cache, session_manager, tiered_fetch, async_scraping_functions):
+        monkeypatch.setattr(module, "get_response_cache", lambda: None)
+    monkeypatch.setattr(async_scraping_functions, "hafele_limiter", AdaptiveLimiter(max_rps=10000, max_concurrency=64))
+
+    client = AsyncHafeleClient(lambda: COOKIES)
+    client.session = StubSession(offline_scraper)
+
+    async def scrape_all():
+        return await asyncio.gather(*[
+            retrieve_product_attempt_async(client, build_product_url(code), code) for code in CODES
+        ])
+
+    try:
+        results = asyncio.run(scrape_all())
+    finally:
+        existence_cache.close()
+
+    assert dict(zip(CODES, results)) == expected
+    assert client.session.urls
+    assert offline_scraper.request_count == requests_after_sync
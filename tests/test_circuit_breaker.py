@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from core.retry import FAIL, classify
+
+
+def fail(breaker, status=503):
+    with breaker.request() as call:
+        call.record_status(status)
+
+
+def test_opens_after_consecutive_outage_responses():
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=60)
+    fail(breaker)
+    fail(breaker)
+    fail(breaker, status=200)
+    fail(breaker, status=404)
+    assert breaker.state == CLOSED
+
+    fail(breaker)
+    fail(breaker)
+    with pytest.raises(requests.exceptions.ConnectTimeout):
+        with breaker.request():
+            raise requests.exceptions.ConnectTimeout()
+    assert breaker.state == OPEN
+
+
+def test_workers_wait_for_one_successful_probe():
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=0.2)
+    fail(breaker)
+    entered = []
+
+    def worker():
+        with breaker.request() as call:
+            entered.append((time.monotonic(), call.probe))
+            time.sleep(0.05)
+            call.record_status(200)
+
+    st = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert breaker.state == CLOSED
+    assert all(at - st >= 0.15 for at, _ in entered)
+    # Only the first request after the pause is a probe; the rest go through once it succeeded
+    assert [probe for _, probe in sorted(entered)] == [True, False, False, False]
+
+
+def test_failed_probe_doubles_the_pause():
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=0.05, max_open_seconds=1)
+    fail(breaker)
+    time.sleep(0.06)
+    with breaker.request() as call:
+        assert call.probe and breaker.state == HALF_OPEN
+        call.record_status(502)
+    assert breaker.state == OPEN
+    assert breaker._retry_at - time.monotonic() > 0.06
+
+
+def test_gives_up_after_max_wait():
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=60, max_wait=0.05)
+    fail(breaker)
+
+    with pytest.raises(CircuitOpenError):
+        with breaker.request():
+            pass
+
+    async def request():
+        async with breaker.request_async():
+            pass
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(request())
+    # Raised only after the site has been down for a long time, so not retried again
+    assert classify(CircuitOpenError()) == FAIL
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from core import session_manager
+from core.session_manager import CookieState, is_auth_failure
+
+
+def test_swap_publishes_a_new_snapshot_without_touching_the_old_one():
+    state = CookieState()
+    old = [{"name": "sid", "value": "1"}]
+    state.swap(old)
+    snapshot = state.snapshot()
+
+    state.swap([{"name": "sid", "value": "2"}])
+
+    assert snapshot is old
+    assert state.snapshot()[0]["value"] == "2"
+
+
+def test_refresh_is_due_before_the_earliest_cookie_expiry(monkeypatch):
+    monkeypatch.setattr(session_manager, "COOKIE_REFRESH_MARGIN", 60)
+    state = CookieState()
+    now = time.time()
+    state.swap([
+        {"name": "sid", "value": "1", "expiry": now + 600},
+        {"name": "consent", "value": "1", "expiry": now + 86400},
+        {"name": "session", "value": "1"},
+    ])
+
+    assert 530 < state.seconds_until_refresh() <= 540
+
+
+def test_short_lived_tracking_cookies_do_not_schedule_the_refresh(monkeypatch):
+    monkeypatch.setattr(session_manager, "COOKIE_REFRESH_MARGIN", 60)
+    monkeypatch.setattr(session_manager, "COOKIE_MIN_LIFETIME", 300)
+    state = CookieState()
+    now = time.time()
+    state.swap([
+        {"name": "_gat", "value": "1", "expiry": now + 60},
+        {"name": "sid", "value": "1", "expiry": now + 1800},
+    ], loaded_at=now)
+
+    assert 1730 < state.seconds_until_refresh() <= 1740
+
+
+def test_auth_failure_wakes_the_refresh_thread(monkeypatch):
+    monkeypatch.setattr(session_manager, "COOKIE_MIN_REFRESH_INTERVAL", 0)
+    state = CookieState()
+    state.swap([{"name": "sid", "value": "1"}])
+    reasons = []
+    waiter = threading.Thread(target=lambda: reasons.append(state.wait_until_refresh_due()))
+    waiter.start()
+
+    state.request_refresh("HTTP 403")
+    waiter.join(timeout=5)
+
+    assert reasons == ["HTTP 403"]
+
+
+def test_is_auth_failure():
+    assert is_auth_failure(403, "https://www.hafele.com.tr/x", False)
+    assert is_auth_failure(200, "https://www.hafele.com.tr/ViewLogin-Start", True)
+    assert not is_auth_failure(200, "https://www.hafele.com.tr/ViewProduct", True)
+    assert not is_auth_failure(500, "https://www.hafele.com.tr/x", False)
+
+
+def test_threads_open_a_new_session_after_the_pool_is_closed():
+    cookies = [{"name": "sid", "value": "1"}]
+    first = session_manager.get_http_session(cookies)
+    assert session_manager.get_http_session(cookies) is first
+
+    session_manager.close_http_sessions()
+    second = session_manager.get_http_session(cookies)
+
+    assert second is not first
+    assert second in session_manager._sessions
+    session_manager.close_http_sessions()
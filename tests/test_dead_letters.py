@@ -0,0 +1,83 @@
+from core.dead_letters import DeadLetterQueue
+from core.result_store import ResultStore
+from core.retry import HttpStatusError, RetryPolicy
+from scraper.product_record import ProductRecord
+from scraper.scraping_functions import empty_result
+
+CODES = ["100.00.001", "100.00.002", "100.00.003"]
+
+
+def test_queue_counts_failures_until_removed(tmp_path):
+    queue = DeadLetterQueue(str(tmp_path / "dead_letters.db"), max_failures=2)
+    try:
+        queue.add("run_1", {"100.00.001": "failed", "100.00.002": "error"})
+        queue.add("run_2", {"100.00.001": "failed"})
+        queue.add("run_2", {"100.00.001": "error"})
+        assert queue.failures() == {"100.00.001": 2, "100.00.002": 1}
+        assert queue.due(CODES) == ["100.00.002"]
+
+        queue.remove(["100.00.002"])
+        assert len(queue) == 1
+    finally:
+        queue.close()
+
+
+def test_failed_products_are_reprocessed_at_the_end_of_the_run(tmp_path, monkeypatch):
+    from core import main
+
+    store = ResultStore(str(tmp_path / "results.db"))
+    queue = DeadLetterQueue(str(tmp_path / "dead_letters.db"))
+    # Left over from an earlier run; this run's first pass got its data
+    queue.add("run_0", {"100.00.003": "failed"})
+    store.start_run("run_1")
+    store.save_row("run_1", 0, ProductRecord.from_result("100.00.001", empty_result()).as_row())
+    store.save_row("run_1", 1, ProductRecord.error("100.00.002").as_row())
+    store.save_row("run_1", 2, ProductRecord("100.00.003", stok_durumu="stokta mevcut", stock_amount=1).as_row())
+
+    def attempt(url, code, cookies):
+        if code == "100.00.002":
+            raise HttpStatusError(503, url)
+        return {"stok_durumu": "stokta mevcut", "stock_amount": 4}
+
+    monkeypatch.setattr(main, "retrieve_product_attempt", attempt)
+    monkeypatch.setattr(main, "product_retry_policy", RetryPolicy(attempts=1))
+    try:
+        recovered = main.retry_dead_letters(store, queue, "run_1", CODES, CODES, max_workers=2)
+
+        rows = store.load_rows("run_1")
+        assert recovered == 1
+        assert rows["100.00.001"]["stock_amount"] == 4
+        assert rows["100.00.002"]["stok_durumu"] is None
+        # Still failing: stays queued for the next run
+        assert queue.failures() == {"100.00.002": 1}
+    finally:
+        store.close()
+        queue.close()
+
+
+def test_each_run_counts_one_failure(tmp_path, monkeypatch):
+    from core import main
+
+    store = ResultStore(str(tmp_path / "results.db"))
+    queue = DeadLetterQueue(str(tmp_path / "dead_letters.db"), max_failures=3)
+    attempts = []
+
+    def attempt(url, code, cookies):
+        attempts.append(code)
+        raise HttpStatusError(503, url)
+
+    monkeypatch.setattr(main, "retrieve_product_attempt", attempt)
+    monkeypatch.setattr(main, "product_retry_policy", RetryPolicy(attempts=1))
+    try:
+        for run in range(1, 5):
+            run_id = f"run_{run}"
+            store.start_run(run_id)
+            store.save_row(run_id, 0, ProductRecord.from_result(CODES[0], empty_result()).as_row())
+            main.retry_dead_letters(store, queue, run_id, CODES[:1], CODES[:1])
+            assert queue.failures() == {CODES[0]: run}
+
+        # Reprocessed until the third run's failure reached max_failures
+        assert len(attempts) == 2
+    finally:
+        store.close()
+        queue.close()
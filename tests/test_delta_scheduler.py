@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from core.delta_scheduler import carried_row, mark_age, plan_delta
+from core.result_store import ResultStore
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def make_row(code, price="100,00", stock=50):
+    return {"stock_code": code, "kdv_haric_satis_fiyati": price, "stok_durumu": "stokta mevcut", "stock_amount": stock}
+
+
+def make_stats(code, scrapes, changes, hours_ago, stock=50):
+    return {
+        "last_row": make_row(code, stock=stock),
+        "last_scraped_at": (NOW - timedelta(hours=hours_ago)).isoformat(timespec="seconds"),
+        "last_changed_at": None,
+        "scrape_count": scrapes,
+        "change_count": changes,
+    }
+
+
+def test_store_counts_changes_between_scrapes(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    store.save_row("r1", 0, make_row("A"))
+    store.save_row("r2", 0, make_row("A"))
+    store.save_row("r3", 0, make_row("A", stock=49))
+    store.save_row("r4", 0, {**make_row("A"), "stok_durumu": "HATA"})
+    store.save_row("r5", 0, make_row("B"), track_changes=False)
+
+    stats = store.sku_stats(["A", "B"])
+    store.close()
+
+    assert set(stats) == {"A"}
+    assert stats["A"]["scrape_count"] == 3
+    assert stats["A"]["change_count"] == 1
+    assert stats["A"]["last_row"]["stock_amount"] == 49
+
+
+def test_stats_are_looked_up_for_the_requested_codes_only(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    codes = [f"100.00.{i:04d}" for i in range(1200)]
+    for i, code in enumerate(codes):
+        store.save_row("r1", i, make_row(code))
+
+    stats = store.sku_stats(codes[::2] + ["unknown"])
+    store.close()
+
+    assert set(stats) == set(codes[::2])
+
+
+def test_plan_splits_hot_cold_and_due():
+    stats = {
+        "volatile": make_stats("volatile", scrapes=10, changes=5, hours_ago=1),
+        "low_stock": make_stats("low_stock", scrapes=10, changes=0, hours_ago=1, stock=3),
+        "stable": make_stats("stable", scrapes=10, changes=0, hours_ago=1),
+        "stale": make_stats("stale", scrapes=10, changes=0, hours_ago=500),
+    }
+
+    to_scrape, carried = plan_delta(["new", "volatile", "low_stock", "stable", "stale"], stats, NOW)
+
+    assert to_scrape == ["new", "volatile", "low_stock", "stale"]
+    assert [code for code, _ in carried] == ["stable"]
+
+
+def test_carried_rows_keep_their_age():
+    stats = make_stats("stable", scrapes=10, changes=0, hours_ago=30)
+    fresh = make_row("fresh")
+
+    rows = mark_age([carried_row(stats), fresh], {"fresh": NOW.isoformat(timespec="seconds")}, NOW)
+
+    assert rows[0]["veri_yasi_saat"] == 30.0
+    assert rows[1]["veri_yasi_saat"] == 0.0
+    assert rows[0]["stock_amount"] == 50
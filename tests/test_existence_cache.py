@@ -0,0 +1,46 @@
+import pytest
+
+from core.retry import HttpStatusError
+from scraper import scraping_functions
+from scraper.existence_cache import ExistenceCache
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("scraper.existence_cache.time.time", lambda: now[0])
+    cache = ExistenceCache(str(tmp_path / "existence_cache.db"), ttl_days=1)
+    try:
+        cache.put("941.30.011", True, "6")
+        cache.put("999.12.345", False, None)
+        assert cache.get("941.30.011") == (True, True, "6")
+        assert cache.get("999.12.345") == (True, False, None)
+
+        now[0] += 24 * 60 * 60 + 1
+        assert cache.get("941.30.011") == (False, None, None)
+        assert cache.get("999.12.345") == (False, None, None)
+    finally:
+        cache.close()
+
+
+def test_zero_ttl_disables_the_cache(tmp_path):
+    cache = ExistenceCache(str(tmp_path / "existence_cache.db"), ttl_days=0)
+    try:
+        cache.put("999.12.345", False, None)
+        assert cache.get("999.12.345") == (False, None, None)
+    finally:
+        cache.close()
+
+
+def test_only_a_not_found_search_page_is_cached_as_missing(offline_scraper):
+    cookies = [{"name": "sid", "value": "offline"}]
+    cache = scraping_functions.get_existence_cache()
+
+    assert scraping_functions.lookup_product("999.12.345", cookies) == (False, None)
+    assert cache.get("999.12.345") == (True, False, None)
+
+    # A failed search says nothing about the SKU, so it must not be cached
+    offline_scraper.error_rate = 1.0
+    offline_scraper.error_status = 404
+    with pytest.raises(HttpStatusError):
+        scraping_functions.lookup_product("999.54.321", cookies)
+    assert cache.get("999.54.321") == (False, None, None)
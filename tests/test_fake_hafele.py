@@ -0,0 +1,150 @@
+import pytest
+
+from scraper.scraping_functions import build_product_url, retrieve_product_data
+
+COOKIES = [{"name": "sid", "value": "offline"}]
+
+
+def test_singular_product(offline_scraper):
+    result = retrieve_product_data(build_product_url("941.30.011"), "941.30.011", COOKIES)
+
+    assert result == {
+        "kdv_haric_tavsiye_edilen_perakende_fiyat": "1.543,20",
+        "kdv_haric_net_fiyat": "1.234,56",
+        "kdv_haric_satis_fiyati": "987,65",
+        "stok_durumu": "stokta mevcut",
+        "stock_amount": 120,
+        "minimum_alis_fiyati": "6",
+    }
+
+
+def test_set_product_uses_its_scarcest_component(offline_scraper):
+    result = retrieve_product_data(build_product_url("562.12.345"), "562.12.345", COOKIES)
+
+    assert result["stok_durumu"] == "set urun"
+    assert result["stock_amount"] == 0
+
+
+def test_not_found_product_is_cached(offline_scraper):
+    code = "999.12.345"
+    first = retrieve_product_data(build_product_url(code), code, COOKIES)
+    requests_after_first = offline_scraper.request_count
+    second = retrieve_product_data(build_product_url(code), code, COOKIES)
+
+    assert first == second
+    assert first["stok_durumu"] == "urun hafele.com.tr de bulunmuyor"
+    assert offline_scraper.request_count == requests_after_first
+
+
+def test_injected_errors_are_retried(offline_scraper):
+    offline_scraper.error_rate = 1.0
+    result = retrieve_product_data(build_product_url("941.30.011"), "941.30.011", COOKIES)
+
+    assert result["stok_durumu"] is None
+    assert offline_scraper.request_count == 3
+
+
+def test_challenge_page_is_escalated_to_browser_once(offline_scraper, monkeypatch):
+    from core import tiered_fetch
+    from fake_hafele import read_fixture
+
+    browser_urls = []
+
+    def fake_browser(url, cookies):
+        browser_urls.append(url)
+        return read_fixture("pds_singular.html")
+
+    monkeypatch.setattr(tiered_fetch, "fetch_product_page_selenium", fake_browser)
+    code = "777.00.001"
+
+    first = retrieve_product_data(build_product_url(code), code, COOKIES)
+    # The challenge page must not be replayed from the cache when HTTP is tried again
+    assert tiered_fetch.get_response_cache().get(build_product_url(code)) is None
+    requests_after_first = offline_scraper.request_count
+    second = retrieve_product_data(build_product_url(code), code, COOKIES)
+
+    assert first == second
+    assert first["stock_amount"] == 120
+    assert len(browser_urls) == 2
+    # The second run goes straight to the browser: no HTTP request at all
+    assert offline_scraper.request_count == requests_after_first
+
+
+def test_browser_only_product_is_rechecked_over_http_once_stale(offline_scraper, monkeypatch):
+    from core import tiered_fetch
+    from core.tiered_fetch import BROWSER_TIER, HTTP_TIER
+    from fake_hafele import read_fixture
+
+    now = [1000.0]
+    monkeypatch.setattr(tiered_fetch.time, "time", lambda: now[0])
+    monkeypatch.setattr(tiered_fetch, "fetch_product_page_selenium", lambda url, cookies: read_fixture("pds_singular.html"))
+    memory = tiered_fetch.get_fetch_tier_memory()
+    code = "941.30.011"
+    url = build_product_url(code)
+    memory.put(code, BROWSER_TIER)
+
+    # Browser hits within the recheck window do not push the recheck back
+    now[0] += 6.9 * 24 * 60 * 60
+    assert tiered_fetch.fetch_product_page(url, code, COOKIES).tier == BROWSER_TIER
+    now[0] += 0.2 * 24 * 60 * 60
+    assert memory.get(code) == (BROWSER_TIER, False)
+
+    page = tiered_fetch.fetch_product_page(url, code, COOKIES)
+    assert page.tier == HTTP_TIER and not page.needs_browser
+    assert offline_scraper.request_count == 1
+    assert memory.get(code) == (HTTP_TIER, True)
+
+
+def test_not_found_product_is_never_escalated(offline_scraper, monkeypatch):
+    from core import tiered_fetch
+
+    monkeypatch.setattr(tiered_fetch, "fetch_product_page_selenium", lambda url, cookies: pytest.fail("browser used"))
+    code = "999.00.001"
+    monkeypatch.setattr(offline_scraper, "route", lambda path, query: (
+        (200, "<html><body>Checking</body></html>") if "PDS" in path
+        else type(offline_scraper).route(offline_scraper, path, query)
+    ))
+
+    result = retrieve_product_data(build_product_url(code), code, COOKIES)
+
+    assert result["stok_durumu"] == "urun hafele.com.tr de bulunmuyor"
+
+
+def test_page_that_only_mentions_the_price_block_is_escalated():
+    from core.tiered_fetch import HTTP_TIER, PRICE_BLOCK_MISSING, PageFetch, check_price_block
+    from fake_hafele import read_fixture
+    from scraper.scraping_functions import summarize_product_page
+
+    script_only = '<html><script>var target = \'id="productPriceInformation"\';</script></html>'
+    page = PageFetch(200, script_only, HTTP_TIER)
+
+    assert check_price_block(page, summarize_product_page(script_only))
+    assert page.escalation_reason == PRICE_BLOCK_MISSING
+    assert not check_price_block(PageFetch(200, "", HTTP_TIER), summarize_product_page(read_fixture("pds_singular.html")))
+
+
+def test_escalation_reuses_the_product_page_parse(offline_scraper, monkeypatch):
+    from scraper import scraping_functions
+
+    parsed = []
+    summarize = scraping_functions.summarize_product_page
+    monkeypatch.setattr(scraping_functions, "summarize_product_page", lambda html: parsed.append(html) or summarize(html))
+
+    retrieve_product_data(build_product_url("941.30.011"), "941.30.011", COOKIES)
+
+    assert len(parsed) == 1
+
+
+def test_rejected_session_is_not_escalated_to_browser(offline_scraper, monkeypatch):
+    from core import session_manager, tiered_fetch
+    from core.session_manager import AuthExpiredError
+    from scraper.scraping_functions import retrieve_product_attempt
+
+    monkeypatch.setattr(tiered_fetch, "fetch_product_page_selenium", lambda url, cookies: pytest.fail("browser used"))
+    monkeypatch.setattr(session_manager.cookie_state, "request_refresh", lambda reason: None)
+    monkeypatch.setattr(offline_scraper, "route", lambda path, query: (403, "<html><body>Forbidden</body></html>"))
+    code = "941.30.011"
+
+    with pytest.raises(AuthExpiredError):
+        retrieve_product_attempt(build_product_url(code), code, COOKIES)
+    assert tiered_fetch.get_fetch_tier_memory().get(code) == (None, False)
@@ -0,0 +1,106 @@
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from scraper import scraping_functions
+from scraper.html_parsing import make_search_soup, make_soup
+from scraper.stock_cache import stock_cache
+from scraper.scraping_functions import (
+    extract_min_quantity,
+    extract_price_info,
+    extract_sub_product_skus,
+    handle_group_product,
+    handle_singular_product,
+    parse_search_page,
+    parse_singular_stock,
+)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+try:
+    import lxml  # noqa: F401
+    PARSERS = ["html.parser", "lxml"]
+except ImportError:
+    PARSERS = ["html.parser"]
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def reference_soup(name):
+    """The full html.parser tree the scraper used to build for every page."""
+    return BeautifulSoup(read_fixture(name), "html.parser")
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("fixture", ["pds_singular.html", "pds_set.html"])
+def test_price_info_matches_reference(parser, fixture):
+    soup = make_soup(read_fixture(fixture), parser)
+    assert extract_price_info(soup) == extract_price_info(reference_soup(fixture))
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_singular_product_matches_reference(parser):
+    result = handle_singular_product(make_soup(read_fixture("pds_singular.html"), parser))
+
+    assert result == handle_singular_product(reference_soup("pds_singular.html"))
+    assert result == {
+        "kdv_haric_tavsiye_edilen_perakende_fiyat": "1.543,20",
+        "kdv_haric_net_fiyat": "1.234,56",
+        "kdv_haric_satis_fiyati": "987,65",
+        "stok_durumu": "stokta mevcut",
+        "stock_amount": 120,
+    }
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_group_product_matches_reference(parser, monkeypatch):
+    stock_cache.clear()
+    stocks = {"34226110": 14, "31101504": 3}
+    monkeypatch.setattr(
+        scraping_functions, "retrieve_singular_stock",
+        lambda url, cookies: stocks[url.split("SKU=")[1].split("&")[0]],
+    )
+
+    soup = make_soup(read_fixture("pds_set.html"), parser)
+    assert soup.find("tr", id="productBomArticlesInformation") is not None
+    assert extract_sub_product_skus(soup) == ["34226110", "31101504"]
+    assert handle_group_product(soup, []) == handle_group_product(reference_soup("pds_set.html"), [])
+    assert handle_group_product(soup, [])["stock_amount"] == 3
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("fixture, expected", [
+    ("sub_stock_available.html", 350),
+    ("sub_stock_unavailable.html", 0),
+])
+def test_singular_stock_matches_reference(parser, fixture, expected):
+    assert parse_singular_stock(read_fixture(fixture), parser) == expected
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_search_page_found(parser):
+    exists, soup = parse_search_page(read_fixture("search_found.html"), "941.30.011", parser)
+
+    assert exists is True
+    assert extract_min_quantity(soup) == extract_min_quantity(reference_soup("search_found.html")) == "6"
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_search_page_not_found(parser):
+    exists, soup = parse_search_page(read_fixture("search_not_found.html"), "999.99.999", parser)
+
+    assert exists is False
+    assert extract_min_quantity(soup) is None
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_search_soup_keeps_only_needed_nodes(parser):
+    html = read_fixture("search_found.html")
+    strained = len(make_search_soup(html, parser).find_all(True))
+    full = len(reference_soup("search_found.html").find_all(True))
+
+    assert strained * 10 < full
@@ -0,0 +1,192 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import api
+from core.rate_limiter import AdaptiveLimiter
+
+
+class FakeIdeaSoft:
+    """
+    Serves `catalogues` ({brand: [sku, ...]}) like /admin-api/products. `failures`
+    maps (brand, page) to a list of statuses returned before the page succeeds.
+    `updated_at` ({sku: "YYYY-MM-DD HH:MM:SS"}) backs the updatedAtStart filter.
+    """
+
+    def __init__(self, catalogues, failures=None, updated_at=None):
+        self.catalogues = catalogues
+        self.updated_at = updated_at or {}
+        self.failures = {key: list(statuses) for key, statuses in (failures or {}).items()}
+        self.requests = []
+        # Added to the total_count header, to fake products that disappear during the export
+        self.extra_total = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                brand, page, limit = int(query["brand"][0]), int(query["page"][0]), int(query["limit"][0])
+                with fake._lock:
+                    fake.requests.append((brand, page))
+                    pending = fake.failures.get((brand, page))
+                    status = pending.pop(0) if pending else 200
+
+                skus = fake.catalogues[brand]
+                if "updatedAtStart" in query:
+                    since = query["updatedAtStart"][0]
+                    skus = [sku for sku in skus if fake.updated_at.get(sku, "2000-01-01 00:00:00") >= since]
+                body = json.dumps([{"sku": sku} for sku in skus[(page - 1) * limit:page * limit]]).encode("utf-8")
+                self.send_response(status)
+                self.send_header("total_count", str(len(skus) + fake.extra_total))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/admin-api/products"
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def export(monkeypatch):
+    monkeypatch.setattr(api.time, "sleep", lambda seconds: None)
+    servers = []
+
+    def run(catalogues, failures=None, **kwargs):
+        fake = FakeIdeaSoft(catalogues, failures)
+        servers.append(fake)
+        monkeypatch.setattr(api, "PRODUCTS_URL", fake.url)
+        client = api.IdeaSoftClient("token", limiter=AdaptiveLimiter(max_rps=10000, max_concurrency=8))
+        pages = []
+        skus = api.get_all_products(list(catalogues), on_page=lambda position, page: pages.append((position, page)),
+                                    client=client, refetch_delay=0, **kwargs)
+        return skus, pages, fake
+
+    yield run
+    for fake in servers:
+        fake.stop()
+
+
+def test_pages_come_back_ordered_and_deduplicated(export):
+    catalogue = [f"100.00.{i:03d}" for i in range(250)]
+    skus, pages, _ = export({38: catalogue, 40: ["200.00.001", catalogue[5]]})
+
+    assert skus == catalogue + ["200.00.001"]
+    assert sorted(position for position, _ in pages) == [0, 100, 200, 300]
+
+
+def test_429_and_failed_pages_are_retried(export):
+    catalogue = [f"100.00.{i:03d}" for i in range(300)]
+    # Page 2 is throttled once; page 3 fails every attempt of the first pass
+    failures = {(38, 2): [429], (38, 3): [503] * api.IDEASOFT_RETRIES}
+
+    skus, _, fake = export({38: catalogue}, failures)
+
+    assert skus == catalogue
+    assert fake.requests.count((38, 3)) == api.IDEASOFT_RETRIES + 1
+
+
+def test_missing_pages_fail_the_export(export):
+    catalogue = [f"100.00.{i:03d}" for i in range(150)]
+
+    with pytest.raises(api.IdeaSoftExportError):
+        export({38: catalogue}, {(38, 2): [500] * (2 * api.IDEASOFT_RETRIES)})
+
+
+def test_incremental_sync_only_requests_changed_products(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from sku_index import SkuIndex
+
+    monkeypatch.setattr(api.time, "sleep", lambda seconds: None)
+    catalogue = [f"100.00.{i:03d}" for i in range(250)]
+    fake = FakeIdeaSoft({38: catalogue})
+    monkeypatch.setattr(api, "PRODUCTS_URL", fake.url)
+    client = api.IdeaSoftClient("token", limiter=AdaptiveLimiter(max_rps=10000, max_concurrency=8))
+    index = SkuIndex(str(tmp_path / "index.db"))
+    first_sync = datetime(2025, 6, 1, 8, 0, 0)
+
+    try:
+        assert api.sync_sku_index([38], index, client, now=first_sync) == catalogue
+        full_sync_requests = len(fake.requests)
+
+        fake.catalogues[38] = catalogue + ["100.00.999"]
+        fake.updated_at["100.00.999"] = "2025-06-02 07:00:00"
+        skus = api.sync_sku_index([38], index, client, now=first_sync + timedelta(days=1))
+
+        assert skus == catalogue + ["100.00.999"]
+        assert len(fake.requests) - full_sync_requests == 1
+
+        # The weekly full sync notices products that disappeared
+        fake.catalogues[38] = catalogue[1:] + ["100.00.999"]
+        skus = api.sync_sku_index([38], index, client, now=first_sync + timedelta(days=8))
+
+        assert skus == catalogue[1:] + ["100.00.999"]
+        assert [change[2] for change in index.changes_since("2025-06-02")] == ["added", "removed"]
+    finally:
+        index.close()
+        client.close()
+        fake.stop()
+
+
+def test_token_is_refreshed_once_per_run_of_401s(export, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(api, "refresh_access_token", lambda: refreshed.append(1) or f"token-{len(refreshed)}")
+    catalogue = [f"100.00.{i:03d}" for i in range(150)]
+
+    # The token expires again later in the export: a second refresh is allowed after a success
+    skus, _, _ = export({38: catalogue}, {(38, 1): [401], (38, 2): [401]})
+    assert skus == catalogue
+    assert len(refreshed) == 2
+
+    # A refreshed token that is rejected as well is not refreshed again
+    with pytest.raises(api.IdeaSoftExportError):
+        export({38: catalogue}, {(38, 1): [401, 401]})
+    assert len(refreshed) == 3
+
+
+def test_short_export_is_flagged_and_removes_nothing(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from sku_index import SkuIndex
+
+    monkeypatch.setattr(api.time, "sleep", lambda seconds: None)
+    catalogue = [f"100.00.{i:03d}" for i in range(150)]
+    fake = FakeIdeaSoft({38: catalogue})
+    monkeypatch.setattr(api, "PRODUCTS_URL", fake.url)
+    client = api.IdeaSoftClient("token", limiter=AdaptiveLimiter(max_rps=10000, max_concurrency=8))
+    index = SkuIndex(str(tmp_path / "index.db"))
+    first_sync = datetime(2025, 6, 1, 8, 0, 0)
+    incomplete = []
+
+    try:
+        api.sync_sku_index([38], index, client, now=first_sync)
+        # A product vanishes mid-export and shifts another one off the pages that were read
+        fake.catalogues[38] = catalogue[:100] + catalogue[101:]
+        fake.extra_total = 1
+        skus = api.sync_sku_index([38], index, client, full=True, now=first_sync + timedelta(days=1),
+                                  on_incomplete=lambda *details: incomplete.append(details))
+
+        assert incomplete == [(38, 150, 149)]
+        assert skus == catalogue
+        # The full sync did not count, so the next run is a full one again
+        assert index.sync_state(38)[1] == first_sync
+    finally:
+        index.close()
+        client.close()
+        fake.stop()
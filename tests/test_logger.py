@@ -0,0 +1,60 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from core import logger as scraper_logger
+from core.logger import log_context, log_debug, log_exception, log_info
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "scraper.log"
+    scraper_logger.start_logging(str(path), "json")
+    yield path
+    scraper_logger.start_logging()
+
+
+def read_entries(path):
+    scraper_logger.stop_logging()
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_lines_carry_the_sku_of_their_worker(log_file):
+    def work(code):
+        with log_context(sku=code):
+            log_info("✅ Processed", status="stokta mevcut")
+            log_debug("per-row noise")
+
+    threads = [threading.Thread(target=work, args=(f"100.00.00{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    entries = read_entries(log_file)
+
+    assert sorted(entry["sku"] for entry in entries) == [f"100.00.00{i}" for i in range(4)]
+    assert all(entry["level"] == "info" and entry["status"] == "stokta mevcut" for entry in entries)
+
+
+def test_context_is_per_task_and_exceptions_are_kept(log_file):
+    async def work(code):
+        with log_context(sku=code):
+            await asyncio.sleep(0)
+            log_info("done")
+
+    async def run():
+        await asyncio.gather(work("a"), work("b"))
+
+    asyncio.run(run())
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log_exception("failed", run_id="r1")
+
+    entries = read_entries(log_file)
+
+    assert [entry.get("sku") for entry in entries[:2]] == ["a", "b"]
+    assert entries[2]["run_id"] == "r1" and "ValueError: boom" in entries[2]["exception"]
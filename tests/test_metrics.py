@@ -0,0 +1,76 @@
+import json
+import urllib.request
+
+import pytest
+
+from core.metrics import Metrics, endpoint_label, start_metrics_server, write_run_summary
+
+
+def test_spans_and_counters_are_summarised_and_merged(tmp_path):
+    registry = Metrics()
+    registry.observe("parse", 0.02)
+    registry.observe("parse", 0.04)
+    with pytest.raises(ValueError):
+        with registry.span("pds_request"):
+            raise ValueError("timed anyway")
+    registry.count("http_requests_total", endpoint="PDS", status=200)
+
+    worker = Metrics()
+    worker.observe("parse", 0.1)
+    worker.count("http_requests_total", 2, endpoint="PDS", status=200)
+    registry.merge(worker.snapshot())
+
+    summary = json.loads(open(write_run_summary("run_1", 0, str(tmp_path), registry)).read())
+
+    assert summary["run_id"] == "run_1"
+    assert summary["stages"]["parse"]["count"] == 3
+    assert summary["stages"]["parse"]["max_ms"] == 100.0
+    assert summary["stages"]["pds_request"]["count"] == 1
+    assert summary["counters"]["http_requests_total"] == {"endpoint=PDS,status=200": 3}
+
+
+def test_prometheus_endpoint():
+    registry = Metrics()
+    registry.observe("parse", 0.5)
+    registry.count("products_total", outcome="ok")
+    assert start_metrics_server(port=0, registry=registry) is None
+    server = start_metrics_server(port=_free_port(), registry=registry)
+    try:
+        port = server.server_address[1]
+        text = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'scraper_stage_seconds_sum{stage="parse"} 0.500000' in text
+    assert 'scraper_stage_seconds_count{stage="parse"} 1' in text
+    assert "# TYPE scraper_products_total counter" in text
+    assert 'scraper_products_total{outcome="ok"} 1' in text
+
+
+def test_scrape_is_instrumented(offline_scraper, monkeypatch):
+    from scraper.scraping_functions import build_product_url, retrieve_product_data
+
+    registry = Metrics()
+    for module in ("core.session_manager", "scraper.scraping_functions"):
+        monkeypatch.setattr(f"{module}.metrics", registry)
+
+    retrieve_product_data(build_product_url("562.12.345"), "562.12.345", [{"name": "sid", "value": "offline"}])
+    summary = registry.summary()
+
+    assert {"pds_request", "search_request", "parse", "bom_requests", "http_request", "rate_limit_wait"} <= set(summary["stages"])
+    requests_by_endpoint = summary["counters"]["http_requests_total"]
+    assert requests_by_endpoint["endpoint=ViewParametricSearch-SimpleOfferSearch,status=200"] == 1
+    assert summary["counters"]["http_response_bytes_total"]
+
+
+def test_endpoint_label():
+    assert endpoint_label("https://host/a/b/ViewProduct-GetPriceAndAvailabilityInformationPDS?SKU=1") == \
+        "ViewProduct-GetPriceAndAvailabilityInformationPDS"
+
+
+def _free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
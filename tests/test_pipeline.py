@@ -0,0 +1,67 @@
+import random
+import threading
+import time
+
+from core import main
+from core.dead_letters import DeadLetterQueue
+from core.result_files import read_frame
+from core.result_store import ResultStore
+from core.retry import HttpStatusError, RetryPolicy, retry_budget
+
+
+def test_products_run_in_parallel_and_keep_input_order(monkeypatch):
+    codes = [f"100.00.{i:03d}" for i in range(8)]
+    # Only passes once 4 workers are inside the fetch at the same time
+    all_started = threading.Barrier(4, timeout=5)
+    in_flight = peak = 0
+    lock = threading.Lock()
+
+    def attempt(url, code, cookies):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        if codes.index(code) < 4:
+            all_started.wait()
+        # Finish out of order
+        time.sleep(random.uniform(0, 0.05))
+        with lock:
+            in_flight -= 1
+        return {"stok_durumu": "stokta mevcut", "stock_amount": codes.index(code)}
+
+    monkeypatch.setattr(main, "retrieve_product_attempt", attempt)
+    retry_budget.reset()
+
+    records = main.scrape_products(codes, max_workers=4)
+
+    assert [record.stock_code for record in records] == codes
+    assert [record.stock_amount for record in records] == list(range(8))
+    assert peak == 4
+
+
+def test_pipeline_reprocesses_failed_products_before_exporting(tmp_path, monkeypatch):
+    codes = ["100.00.001", "100.00.002", "100.00.003"]
+    calls = []
+
+    def attempt(url, code, cookies):
+        calls.append(code)
+        if code == "100.00.002" and calls.count(code) == 1:
+            raise HttpStatusError(503, url)
+        return {"stok_durumu": "stokta mevcut", "stock_amount": 1}
+
+    monkeypatch.setattr(main, "retrieve_product_attempt", attempt)
+    monkeypatch.setattr(main, "product_retry_policy", RetryPolicy(attempts=1))
+    retry_budget.reset()
+    store = ResultStore(str(tmp_path / "results.db"))
+    dead_letters = DeadLetterQueue(str(tmp_path / "dead_letters.db"))
+    try:
+        output_file = str(tmp_path / "results.csv")
+        assert main.run_pipeline(store, "run_1", codes, output_file, max_workers=2, dead_letters=dead_letters) == 3
+
+        assert calls.count("100.00.002") == 2
+        assert len(dead_letters) == 0
+        assert read_frame(output_file)["stock_code"].tolist() == codes
+        assert store.latest_unfinished_run() is None
+    finally:
+        store.close()
+        dead_letters.close()
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from core.price_history import PriceHistory, change_summary, write_change_report
+from core.result_files import to_typed_frame
+from scraper.product_record import ProductRecord
+from scraper.product_record import NOT_FOUND_TEXT
+
+
+def record(code, price, stock, status="stokta mevcut"):
+    return ProductRecord(code, "1.000,00", "900,00", price, status, stock, "1").as_row()
+
+
+YESTERDAY = [
+    record("100.00.001", "100,00", 5),
+    record("100.00.002", "200,00", 3),
+    record("100.00.003", "300,00", 0),
+    record("100.00.004", "400,00", 7),
+    record("100.00.005", "500,00", 2),
+]
+TODAY = [
+    record("100.00.001", "110,00", 5),
+    record("100.00.002", "180,00", 0),
+    record("100.00.003", "300,00", 4),
+    ProductRecord.error("100.00.004").as_row(),
+    record("100.00.005", NOT_FOUND_TEXT, NOT_FOUND_TEXT, status=NOT_FOUND_TEXT),
+    record("100.00.006", "600,00", 1),
+]
+
+
+def test_changes_between_runs(tmp_path):
+    history = PriceHistory(str(tmp_path / "history.db"))
+    try:
+        history.append_run("run_1", to_typed_frame(YESTERDAY), datetime(2025, 6, 1, 8))
+        history.append_run("run_2", to_typed_frame(TODAY), datetime(2025, 6, 2, 8))
+
+        changes = history.changes_since("run_1")
+
+        assert list(zip(changes["stock_code"], changes["degisiklik"])) == [
+            ("100.00.001", "fiyat artisi"),
+            ("100.00.002", "fiyat dususu"),
+            ("100.00.002", "stok tukendi"),
+            ("100.00.003", "stoga girdi"),
+            ("100.00.006", "yeni urun"),
+            ("100.00.005", "kaldirilan urun"),
+        ]
+        assert changes["fiyat_degisimi_yuzde"].tolist()[:2] == [10.0, -10.0]
+        assert change_summary(changes) == (
+            "1 fiyat artisi, 1 fiyat dususu, 1 stok tukendi, 1 stoga girdi, 1 yeni urun, 1 kaldirilan urun"
+        )
+    finally:
+        history.close()
+
+
+def test_reexport_replaces_run_and_report_needs_a_previous_run(tmp_path):
+    history = PriceHistory(str(tmp_path / "history.db"))
+    try:
+        history.append_run("run_1", to_typed_frame(YESTERDAY[:1]))
+        assert write_change_report(history, "run_1", str(tmp_path / "changes.csv")) == (None, None)
+
+        history.append_run("run_1", to_typed_frame(YESTERDAY))
+
+        assert history.snapshot("run_1")["stock_code"].tolist() == [row["stock_code"] for row in YESTERDAY]
+        assert history.runs()[0][0] == "run_1" and len(history.runs()) == 1
+    finally:
+        history.close()
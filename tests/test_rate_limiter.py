@@ -0,0 +1,39 @@
+from core.rate_limiter import AdaptiveLimiter
+
+
+def make_limiter():
+    return AdaptiveLimiter(max_rps=1000, min_rps=1, max_concurrency=8, min_concurrency=1, target_latency=5)
+
+
+def test_throttled_response_halves_rate_and_concurrency():
+    limiter = make_limiter()
+    rate, concurrency = limiter.bucket.rate, limiter.concurrency
+
+    with limiter.request() as slot:
+        slot.record_status(429)
+
+    assert limiter.concurrency == concurrency // 2
+    assert limiter.bucket.rate == rate / 2
+
+
+def test_timeout_backs_off():
+    limiter = make_limiter()
+    concurrency = limiter.concurrency
+
+    with limiter.request() as slot:
+        slot.record_timeout()
+
+    assert limiter.concurrency == concurrency // 2
+
+
+def test_healthy_responses_ramp_up_to_the_maximum():
+    limiter = make_limiter()
+
+    for _ in range(200):
+        with limiter.request() as slot:
+            slot.record_status(200)
+
+    stats = limiter.stats()
+    assert stats["concurrency"] == 8
+    assert stats["in_flight"] == 0
+    assert stats["rps"] > 0
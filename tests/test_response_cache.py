@@ -0,0 +1,115 @@
+import asyncio
+import os
+
+from core import response_cache
+from core.metrics import metrics
+from core.response_cache import ResponseCache
+from scraper.async_scraping_functions import AsyncHafeleClient
+from scraper.scraping_functions import build_product_url, retrieve_product_data
+from scraper.stock_cache import stock_cache
+
+COOKIES = [{"name": "sid", "value": "offline"}]
+
+
+def scrape(code):
+    return retrieve_product_data(build_product_url(code), code, COOKIES)
+
+
+def test_fresh_pages_are_not_requested_again(offline_scraper):
+    first = scrape("941.30.011")
+    requests_after_first = offline_scraper.request_count
+
+    assert scrape("941.30.011") == first
+    assert offline_scraper.request_count == requests_after_first
+
+
+def test_stale_pages_are_revalidated_and_not_parsed_again(offline_scraper):
+    cache = response_cache.get_response_cache()
+    cache.ttl = 0
+    first = scrape("562.12.345")
+    stock_cache.clear()
+    metrics.reset()
+
+    assert scrape("562.12.345") == first
+    # The set page and its two component pages came back as 304s
+    assert offline_scraper.not_modified_count == 3
+    counters = metrics.summary()["counters"]
+    assert counters["http_cache_total"]["endpoint=ViewProduct-GetPriceAndAvailabilityInformationPDS,result=not_modified"] == 3
+    assert counters["parse_cache_total"]["kind=product_page,result=hit"] == 1
+    assert counters["parse_cache_total"]["kind=component_stock,result=hit"] == 2
+
+
+def test_changed_page_is_parsed_again(tmp_path):
+    cache = ResponseCache(str(tmp_path / "http_cache.db"))
+    try:
+        cache.put("u", "<p>1</p>", etag='"a"')
+        assert cache.parsed("u", "<p>1</p>", "kind", len) == 8
+        assert cache.parsed("u", "<p>1</p>", "kind", lambda text: 0) == 8
+
+        cache.put("u", "<p>22</p>", etag='"b"')
+        assert cache.parsed("u", "<p>22</p>", "kind", len) == 9
+        assert cache.get("u").validators() == {"If-None-Match": '"b"'}
+    finally:
+        cache.close()
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "http_cache.db"), max_bytes=2000, touch_interval=0)
+    try:
+        for i in range(3):
+            cache.put(f"u{i}", os.urandom(500).hex())
+        cache.get("u0")
+        cache.put("u3", os.urandom(500).hex())
+
+        assert cache.get("u1") is None
+        assert cache.get("u0") is not None and cache.get("u3") is not None
+    finally:
+        cache.close()
+
+
+def test_hits_only_write_their_use_time_once_per_interval(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path / "http_cache.db"), touch_interval=60)
+    try:
+        cache.put("u", "<p>1</p>")
+        writes = cache._conn.total_changes
+        now[0] += 30
+        assert cache.get("u") is not None
+        assert cache._conn.total_changes == writes
+
+        now[0] += 31
+        assert cache.get("u") is not None
+        assert cache._conn.total_changes == writes + 1
+    finally:
+        cache.close()
+
+
+def test_overwriting_a_url_counts_only_the_new_body(tmp_path):
+    cache = ResponseCache(str(tmp_path / "http_cache.db"))
+    try:
+        cache.put("u", os.urandom(500).hex())
+        cache.put("u", os.urandom(300).hex())
+        cache.put("v", "<p>1</p>")
+        assert cache._bytes == cache._total_size()
+
+        cache.discard("u")
+        assert cache.get("u") is None
+        assert cache._bytes == cache._total_size()
+    finally:
+        cache.close()
+
+
+def test_async_client_uses_the_cache(offline_scraper):
+    url = build_product_url("941.30.011")
+
+    async def fetch_twice():
+        async with AsyncHafeleClient(lambda: COOKIES) as client:
+            first = await client.get_text(url)
+            response_cache.get_response_cache().ttl = 0
+            return first, await client.get_text(url)
+
+    first, second = asyncio.run(fetch_twice())
+    assert first == second
+    assert offline_scraper.request_count == 2
+    assert offline_scraper.not_modified_count == 1
@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+from core.result_files import read_frame, to_typed_frame, write_excel_attachment, write_frame
+from scraper.product_record import ProductRecord
+
+NOT_FOUND_TEXT = "urun hafele.com.tr de bulunmuyor"
+
+ROWS = [
+    {
+        "stock_code": "941.30.011",
+        "kdv_haric_tavsiye_edilen_perakende_fiyat": "1.543,20",
+        "kdv_haric_net_fiyat": "1.234,56",
+        "kdv_haric_satis_fiyati": "987,65",
+        "stok_durumu": "stokta mevcut",
+        "stock_amount": 120,
+        "minimum_alis_fiyati": "6",
+    },
+    {
+        "stock_code": "999.12.345",
+        "kdv_haric_tavsiye_edilen_perakende_fiyat": NOT_FOUND_TEXT,
+        "kdv_haric_net_fiyat": NOT_FOUND_TEXT,
+        "kdv_haric_satis_fiyati": NOT_FOUND_TEXT,
+        "stok_durumu": NOT_FOUND_TEXT,
+        "stock_amount": NOT_FOUND_TEXT,
+        "minimum_alis_fiyati": None,
+    },
+]
+
+try:
+    import pyarrow  # noqa: F401
+    FORMATS = ["csv", "parquet"]
+except ImportError:
+    FORMATS = ["csv"]
+
+
+def test_sku_columns_keep_leading_zeros(tmp_path):
+    path = tmp_path / "product_codes.csv"
+    path.write_text("stockCode\n00123\n941.30.011\n", encoding="utf-8")
+
+    assert read_frame(str(path))["stockCode"].tolist() == ["00123", "941.30.011"]
+
+
+def test_columns_are_typed():
+    frame = to_typed_frame(ROWS)
+
+    assert frame["kdv_haric_net_fiyat"].tolist()[0] == 1234.56
+    assert frame["kdv_haric_satis_fiyati"].isna().tolist() == [False, True]
+    assert frame["stock_amount"].dtype == "Int64"
+    assert frame["stock_amount"].tolist()[0] == 120 and frame["stock_amount"].isna().tolist()[1]
+    assert frame["minimum_alis_fiyati"].tolist()[0] == 6
+    assert frame["stok_durumu"].tolist()[1] == NOT_FOUND_TEXT
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip_keeps_values(tmp_path, fmt):
+    frame = to_typed_frame(ROWS)
+    path = write_frame(frame, str(tmp_path / f"results.{fmt}"))
+
+    loaded = read_frame(path)
+
+    assert loaded["stock_code"].tolist() == ["941.30.011", "999.12.345"]
+    assert loaded["kdv_haric_tavsiye_edilen_perakende_fiyat"].tolist()[0] == 1543.2
+    assert int(loaded["stock_amount"].tolist()[0]) == 120
+
+
+def test_excel_attachment_is_built_from_result_file(tmp_path):
+    result_file = write_frame(to_typed_frame(ROWS), str(tmp_path / "results.csv"))
+
+    attachment = write_excel_attachment(result_file, str(tmp_path / "results.xlsx"))
+
+    assert pd.read_excel(attachment)["kdv_haric_net_fiyat"].tolist()[0] == 1234.56
+
+
+def test_minimum_order_price_is_derived_for_the_whole_table():
+    rows = [ProductRecord.from_result(row["stock_code"], row).as_row() for row in ROWS]
+    rows.append(ProductRecord("941.30.012", kdv_haric_satis_fiyati="10,00").as_row())
+
+    frame = to_typed_frame(rows)
+
+    assert frame.columns.get_loc("minimum_alis_carpi_kdv_haric_satis") == frame.columns.get_loc("minimum_alis_fiyati") + 1
+    assert frame["minimum_alis_carpi_kdv_haric_satis"].tolist()[0] == pytest.approx(5925.9)
+    # A missing minimum quantity leaves the derived price empty instead of failing the product
+    assert frame["minimum_alis_carpi_kdv_haric_satis"].isna().tolist()[1:] == [True, True]
+
+
+def test_error_record_marks_the_product():
+    assert ProductRecord.error("941.30.011").as_row()["stok_durumu"] == "HATA"
@@ -0,0 +1,58 @@
+from core import main
+from core.result_store import ResultStore
+from core.retry import retry_budget
+from scraper.product_record import ProductRecord
+
+CODES = [f"100.00.{i:03d}" for i in range(5)]
+
+
+def test_resume_picks_the_latest_unfinished_run(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    try:
+        for run_id in ("run_a", "run_b", "run_c"):
+            store.start_run(run_id)
+        store.finish_run("run_c")
+
+        assert main.resolve_run_id(store, resume=True) == "run_b"
+        assert main.resolve_run_id(store, resume=True, run_id="run_x") == "run_x"
+        assert main.resolve_run_id(store) not in ("run_a", "run_b", "run_c")
+
+        store.finish_run("run_a")
+        store.finish_run("run_b")
+        # Nothing left to resume: a new run is started
+        assert main.resolve_run_id(store, resume=True) not in ("run_a", "run_b", "run_c")
+    finally:
+        store.close()
+
+
+def test_killed_run_resumes_with_only_the_pending_products(tmp_path, monkeypatch):
+    path = str(tmp_path / "results.db")
+    store = ResultStore(path)
+    assert main.prepare_run(store, "run_1", CODES) == CODES
+    # The first run is killed after saving two rows
+    store.save_row("run_1", 0, ProductRecord("100.00.000", stok_durumu="stokta mevcut", stock_amount=0).as_row())
+    store.save_row("run_1", 3, ProductRecord("100.00.003", stok_durumu="stokta mevcut", stock_amount=3).as_row())
+    store.close()
+
+    scraped = []
+
+    def attempt(url, code, cookies):
+        scraped.append(code)
+        return {"stok_durumu": "stokta mevcut", "stock_amount": CODES.index(code)}
+
+    monkeypatch.setattr(main, "retrieve_product_attempt", attempt)
+    retry_budget.reset()
+    store = ResultStore(path)
+    try:
+        run_id = main.resolve_run_id(store, resume=True)
+        pending = main.prepare_run(store, run_id, CODES)
+        main.scrape_into_store(store, run_id, CODES, pending, max_workers=2, backend="threads")
+
+        assert run_id == "run_1"
+        assert pending == ["100.00.001", "100.00.002", "100.00.004"]
+        assert sorted(scraped) == pending
+        rows = store.load_rows("run_1")
+        assert list(rows) == CODES
+        assert [row["stock_amount"] for row in rows.values()] == list(range(5))
+    finally:
+        store.close()
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from core.retry import (
+    FAIL,
+    REFRESH,
+    RETRY,
+    DeferredRetryExecutor,
+    HttpStatusError,
+    RetryBudget,
+    RetryLater,
+    RetryPolicy,
+    classify,
+)
+from core.session_manager import AuthExpiredError
+from scraper.product_record import ERROR_STATUS, ProductRecord
+
+
+def test_errors_are_classified():
+    assert classify(HttpStatusError(503, "u")) == RETRY
+    assert classify(HttpStatusError(404, "u")) == FAIL
+    assert classify(requests.exceptions.ReadTimeout()) == RETRY
+    assert classify(asyncio.TimeoutError()) == RETRY
+    assert classify(AuthExpiredError("login")) == REFRESH
+    assert classify(KeyError("price")) == FAIL
+
+
+def test_budget_caps_retries_per_run():
+    budget = RetryBudget(ratio=0.5, min_retries=1)
+    for _ in range(4):
+        budget.record_call()
+
+    assert [budget.try_spend() for _ in range(4)] == [True, True, True, False]
+    assert budget.stats() == {"calls": 4, "retries": 3, "denied": 1}
+
+
+def test_policy_retries_transient_errors_only():
+    policy = RetryPolicy(attempts=3, base_delay=0, budget=RetryBudget())
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise HttpStatusError(503, "u")
+        return "ok"
+
+    assert policy.call(flaky) == "ok"
+    with pytest.raises(HttpStatusError):
+        policy.call(lambda: (_ for _ in ()).throw(HttpStatusError(404, "u")))
+    assert len(calls) == 3
+
+
+def test_async_policy_gives_up_after_the_last_attempt():
+    policy = RetryPolicy(attempts=2, base_delay=0, budget=RetryBudget())
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.call_async(failing))
+    assert len(calls) == 2
+
+
+def test_waiting_retry_does_not_hold_the_worker():
+    finished = []
+    lock = threading.Lock()
+
+    def task(name, attempt):
+        if name == "slow" and attempt == 0:
+            raise RetryLater(0.2, 1, HttpStatusError(503, "u"))
+        return name, attempt
+
+    def done(result):
+        with lock:
+            finished.append(result)
+
+    st = time.monotonic()
+    with DeferredRetryExecutor(max_workers=1) as executor:
+        for name in ["slow", "a", "b"]:
+            executor.submit(task, name, done)
+
+    assert finished == [("a", 0), ("b", 0), ("slow", 1)]
+    assert time.monotonic() - st >= 0.2
+
+
+def test_unexpected_task_errors_are_not_dropped():
+    def task(name, attempt):
+        if name == "bad":
+            raise KeyError(name)
+        return name
+
+    finished = []
+    with DeferredRetryExecutor(max_workers=2) as executor:
+        for name in ["a", "bad"]:
+            executor.submit(task, name, finished.append, on_error=lambda name, e: f"{name} failed")
+    assert sorted(finished) == ["a", "bad failed"]
+
+    finished = []
+    with pytest.raises(KeyError):
+        with DeferredRetryExecutor(max_workers=2) as executor:
+            for name in ["a", "bad"]:
+                executor.submit(task, name, finished.append)
+    assert finished == ["a"]
+
+
+def test_pipeline_retries_products_without_sleeping_in_workers(monkeypatch):
+    from core import main
+    from core.retry import retry_budget
+
+    attempts = {}
+
+    def attempt(url, code, cookies):
+        attempts[code] = attempts.get(code, 0) + 1
+        if attempts[code] == 1:
+            raise HttpStatusError(503, url)
+        return {"stok_durumu": "stokta mevcut", "stock_amount": 3}
+
+    monkeypatch.setattr(main, "retrieve_product_attempt", attempt)
+    monkeypatch.setattr(main, "product_retry_policy", RetryPolicy(base_delay=0.01))
+    retry_budget.reset()
+
+    records = main.scrape_products(["100.00.001", "100.00.002"], max_workers=1)
+
+    assert [record.stock_amount for record in records] == [3, 3]
+    assert attempts == {"100.00.001": 2, "100.00.002": 2}
+
+
+def test_pipeline_keeps_a_row_when_a_task_raises_unexpectedly(monkeypatch):
+    from core import main
+    from core.retry import retry_budget
+
+    def process_product(code, attempt=0):
+        if code == "100.00.002":
+            raise RuntimeError("metrics backend down")
+        return ProductRecord(code, stok_durumu="stokta mevcut", stock_amount=3)
+
+    monkeypatch.setattr(main, "process_product", process_product)
+    retry_budget.reset()
+
+    records = main.scrape_products(["100.00.001", "100.00.002"], max_workers=2)
+
+    assert [record.stock_code for record in records] == ["100.00.001", "100.00.002"]
+    assert records[1].stok_durumu == ERROR_STATUS
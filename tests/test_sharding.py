@@ -0,0 +1,50 @@
+import pytest
+
+from core.result_store import ResultStore
+from core.sharding import shard_codes, shard_of, split_into_shards
+
+CODES = [f"941.{i // 1000:02d}.{i % 1000:03d}" for i in range(500)]
+
+
+def test_shards_partition_the_codes_in_input_order():
+    shards = split_into_shards(CODES, 4)
+
+    assert sorted(code for shard in shards for code in shard) == sorted(CODES)
+    for shard in shards:
+        assert shard == [code for code in CODES if code in set(shard)]
+        assert 80 < len(shard) < 170
+
+
+def test_shard_assignment_is_stable():
+    # crc32 of the code, so these must never change between processes, hosts or Python versions
+    assert [shard_of(code, 4) for code in ("941.30.011", "562.12.345", "999.12.345", "100.00.001", "342.26.110")] \
+        == [0, 1, 0, 1, 2]
+    assert [shard_of(code, 7) for code in ("941.30.011", "562.12.345", "999.12.345")] == [4, 4, 3]
+
+
+def test_sharded_run_rolls_over_once_finished(tmp_path):
+    from core import main
+
+    store = ResultStore(str(tmp_path / "results.db"))
+    try:
+        assert main.sharded_run_id(store, "20260101_sharded") == "20260101_sharded"
+        store.start_run("20260101_sharded")
+        # Shards starting while the run is in progress join it
+        assert main.sharded_run_id(store, "20260101_sharded") == "20260101_sharded"
+
+        store.finish_run("20260101_sharded")
+        assert main.sharded_run_id(store, "20260101_sharded") == "20260101_sharded_2"
+        store.start_run("20260101_sharded_2")
+        store.finish_run("20260101_sharded_2")
+        assert main.sharded_run_id(store, "20260101_sharded") == "20260101_sharded_3"
+    finally:
+        store.close()
+
+
+def test_single_shard_keeps_everything():
+    assert shard_codes(CODES, 1, 0) == CODES
+
+
+def test_out_of_range_shard_index_is_rejected():
+    with pytest.raises(ValueError):
+        shard_codes(CODES, 3, 3)
@@ -0,0 +1,74 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from core import main
+from core.result_store import ResultStore
+from input.sku_queue import SkuQueue, run_start_cutoff, stream_batch, wait_for_batch
+from scraper.product_record import ProductRecord
+
+
+def produce(queue, batch_id, pages):
+    """Writes pages out of order with a pause in between, like the threaded IdeaSoft export."""
+    for page, skus in pages:
+        queue.put(batch_id, skus, (page - 1) * 2)
+        time.sleep(0.05)
+    queue.close_batch(batch_id)
+
+
+def test_stream_yields_pages_as_they_arrive(tmp_path):
+    queue = SkuQueue(str(tmp_path / "queue.db"))
+    batch_id = queue.open_batch("b1")
+    producer = threading.Thread(target=produce, args=(queue, batch_id, [(2, ["C", "D"]), (1, ["A", "B"])]))
+    producer.start()
+
+    arrivals = list(stream_batch(queue, wait_for_batch(queue), poll_interval=0.01))
+    producer.join()
+    queue.close()
+
+    assert [code for arrived in arrivals for _, code in arrived] == ["C", "D", "A", "B"]
+    assert sorted(pair for arrived in arrivals for pair in arrived) == [(0, "A"), (1, "B"), (2, "C"), (3, "D")]
+
+
+def test_consumed_batch_is_not_picked_again(tmp_path):
+    queue = SkuQueue(str(tmp_path / "queue.db"))
+    queue.open_batch("b1")
+    queue.mark_consumed("b1")
+
+    assert queue.find_batch() is None
+    queue.close()
+
+
+def test_batch_left_over_from_an_earlier_export_is_ignored(tmp_path):
+    queue = SkuQueue(str(tmp_path / "queue.db"))
+    try:
+        queue.open_batch("old")
+        queue._conn.execute("UPDATE batches SET started_at = ? WHERE batch_id = 'old'",
+                            ((datetime.now() - timedelta(hours=3)).isoformat(timespec="seconds"),))
+        queue._conn.commit()
+        cutoff = run_start_cutoff()
+
+        assert queue.find_batch() == "old"
+        assert queue.find_batch(cutoff) is None
+        queue.open_batch("new")
+        assert wait_for_batch(queue, cutoff, poll_interval=0.01) == "new"
+    finally:
+        queue.close()
+
+
+def test_scrape_stream_stores_rows_in_catalogue_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "process_product", lambda code, attempt=0: ProductRecord(code, stok_durumu="stokta mevcut"))
+    queue = SkuQueue(str(tmp_path / "queue.db"))
+    store = ResultStore(str(tmp_path / "results.db"))
+    batch_id = queue.open_batch("b1")
+    producer = threading.Thread(target=produce, args=(queue, batch_id, [(2, ["C", "D"]), (1, ["A", "B", "C"])]))
+    producer.start()
+
+    codes, scraped = main.scrape_stream(store, "run", stream_batch(queue, batch_id, poll_interval=0.01), max_workers=2)
+    producer.join()
+
+    assert codes == ["A", "B", "C", "D"]
+    assert scraped == 4
+    assert list(store.load_rows("run")) == ["A", "B", "C", "D"]
+    store.close()
+    queue.close()
@@ -0,0 +1,47 @@
+import os
+
+from scraper import scraping_functions
+from scraper.html_parsing import make_soup
+from scraper.stock_cache import StockCache, stock_cache
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("scraper.stock_cache.time.monotonic", lambda: now[0])
+    cache = StockCache(ttl=60)
+
+    cache.put("342.26.110", 14)
+    assert cache.get("34226110") == (True, 14)
+
+    now[0] += 61
+    assert cache.get("34226110") == (False, None)
+    assert len(cache) == 0
+
+
+def test_unknown_stock_is_not_cached():
+    cache = StockCache(ttl=60)
+    cache.put("34226110", None)
+    assert cache.get("34226110") == (False, None)
+
+
+def test_group_product_only_fetches_uncached_components(monkeypatch):
+    stock_cache.clear()
+    stock_cache.put("342.26.110", 14)
+    requested = []
+
+    def fake_stock(url, cookies):
+        requested.append(url.split("SKU=")[1].split("&")[0])
+        return 3
+
+    monkeypatch.setattr(scraping_functions, "retrieve_singular_stock", fake_stock)
+    with open(os.path.join(FIXTURE_DIR, "pds_set.html"), encoding="utf-8") as f:
+        soup = make_soup(f.read())
+
+    assert scraping_functions.handle_group_product(soup, [])["stock_amount"] == 3
+    assert requested == ["31101504"]
+
+    scraping_functions.handle_group_product(soup, [])
+    assert requested == ["31101504"]
+    stock_cache.clear()
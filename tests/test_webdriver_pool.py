@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from core import fetcher
+from core.fetcher import WebDriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.visited = []
+        self.cookies = []
+        self.alive = True
+        self.quit_called = False
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def add_cookie(self, cookie):
+        self.cookies.append(cookie)
+
+    def delete_all_cookies(self):
+        self.cookies = []
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise WebDriverException("session deleted")
+        return "complete"
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(fetcher.time, "sleep", lambda seconds: None)
+    drivers = []
+
+    def factory():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    pool = WebDriverPool(size=2, driver_factory=factory)
+    pool.drivers = drivers
+    return pool
+
+
+COOKIES = [{"name": "sid", "value": "abc"}, {"name": "__Host-token", "value": "xyz"}]
+
+
+def test_session_is_reused_and_cookies_injected_once(pool):
+    for _ in range(3):
+        with pool.session(COOKIES) as driver:
+            driver.get("https://www.hafele.com.tr/product")
+
+    assert len(pool.drivers) == 1
+    driver = pool.drivers[0]
+    assert driver.visited.count(fetcher.HAFELE_HOME_URL) == 1
+    assert [c["name"] for c in driver.cookies] == ["sid", "__Host-token"]
+    assert "domain" not in driver.cookies[1]
+
+
+def test_new_cookie_snapshot_replaces_cookies(pool):
+    with pool.session(COOKIES):
+        pass
+    with pool.session([{"name": "sid", "value": "fresh"}]) as driver:
+        assert driver.cookies == [{"name": "sid", "value": "fresh", "path": "/", "secure": True,
+                                   "domain": ".hafele.com.tr"}]
+
+
+def test_unhealthy_session_is_replaced(pool):
+    with pool.session(COOKIES):
+        pass
+    pool.drivers[0].alive = False
+
+    with pool.session(COOKIES) as driver:
+        assert driver is pool.drivers[1]
+    assert pool.drivers[0].quit_called
+
+
+def test_session_broken_during_use_is_discarded(pool):
+    with pytest.raises(WebDriverException):
+        with pool.session(COOKIES):
+            raise WebDriverException("tab crashed")
+
+    assert pool.drivers[0].quit_called
+    with pool.session(COOKIES) as driver:
+        assert driver is pool.drivers[1]
+
+
+def test_page_timeout_returns_the_session_to_the_pool(pool):
+    with pytest.raises(TimeoutException):
+        with pool.session(COOKIES):
+            raise TimeoutException("price block never appeared")
+
+    assert not pool.drivers[0].quit_called
+    with pool.session(COOKIES) as driver:
+        assert driver is pool.drivers[0]
+
+
+def test_driver_is_quit_when_the_first_page_load_fails(pool):
+    class UnreachableDriver(FakeDriver):
+        def get(self, url):
+            raise WebDriverException("grid node gone")
+
+    def failing_factory():
+        pool.drivers.append(UnreachableDriver())
+        return pool.drivers[-1]
+
+    pool.driver_factory = failing_factory
+    with pytest.raises(WebDriverException):
+        with pool.session(COOKIES):
+            pass
+
+    assert pool.drivers[0].quit_called
+    assert pool._created == 0
+
+
+def test_waiting_worker_gets_a_slot_freed_by_a_discarded_session(pool, monkeypatch):
+    monkeypatch.setattr(fetcher, "POOL_POLL_SECONDS", 0.05)
+    pool.size = 1
+    holding = threading.Event()
+    acquired = []
+
+    def waiter():
+        holding.wait()
+        with pool.session(COOKIES) as driver:
+            acquired.append(driver)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    with pytest.raises(WebDriverException):
+        with pool.session(COOKIES):
+            holding.set()
+            # Let the waiter block on the empty pool before this session is thrown away
+            threading.Event().wait(0.1)
+            raise WebDriverException("tab crashed")
+    thread.join(timeout=5)
+
+    assert acquired == [pool.drivers[1]]